@@ -0,0 +1,150 @@
+import hashlib
+import json
+from contextlib import nullcontext
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+
+from bankx import sharding
+from .models import ApiToken
+
+SAFE_METHODS = ('GET', 'HEAD')
+# Avoid a write per request: only refresh last_used_at when it is this stale
+TOKEN_TOUCH_INTERVAL = timedelta(minutes=5)
+
+
+class ApiError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def error_response(message: str, status: int) -> HttpResponse:
+    return HttpResponse(_dumps({'error': message}), content_type='application/json', status=status)
+
+
+def json_response(request, data, status: int = 200) -> HttpResponse:
+    body = _dumps(data)
+    response = HttpResponse(body, content_type='application/json', status=status)
+    if request.method in SAFE_METHODS and status == 200:
+        response['ETag'] = '"%s"' % hashlib.md5(body.encode(), usedforsecurity=False).hexdigest()
+        response['Cache-Control'] = 'private, no-cache'
+        return get_conditional_response(request, etag=response['ETag'], response=response) or response
+    return response
+
+
+def _authenticate(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Token '):
+        token = ApiToken.objects.select_related('user').filter(key=header[6:].strip(), user__is_active=True).first()
+        if token is None:
+            return None
+        now = timezone.now()
+        if token.last_used_at is None or now - token.last_used_at > TOKEN_TOUCH_INTERVAL:
+            ApiToken.objects.filter(pk=token.pk).update(last_used_at=now)
+        return token.user
+    # Session auth is only honoured for reads; writes are CSRF-exempt and must use a token
+    if request.method in SAFE_METHODS and request.user.is_authenticated:
+        return request.user
+    return None
+
+
+def api_view(*methods, auth: bool = True):
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                response = error_response('Method not allowed.', 405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            if auth:
+                user = _authenticate(request)
+                if user is None:
+                    return error_response('Authentication credentials were not provided or are invalid.', 401)
+                request.user = user
+            try:
+                # Token clients bypass the session, so ShardMiddleware has not entered their shard
+                with sharding.for_user(request.user.pk) if auth else nullcontext():
+                    return view(request, *args, **kwargs)
+            except ApiError as exc:
+                return error_response(str(exc), exc.status)
+        return csrf_exempt(wrapped)
+    return decorator
+
+
+def parse_body(request) -> dict:
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError('Malformed JSON body.')
+        if not isinstance(data, dict):
+            raise ApiError('JSON body must be an object.')
+        return data
+    return request.POST.dict()
+
+
+def require(data: dict, field: str) -> str:
+    value = data.get(field)
+    if value in (None, ''):
+        raise ApiError(f"'{field}' is required.")
+    return str(value).strip()
+
+
+def parse_amount(data: dict, field: str = 'amount') -> Decimal:
+    try:
+        amount = Decimal(require(data, field))
+    except InvalidOperation:
+        amount = None
+    # NaN and Infinity parse but cannot be compared or quantized
+    if amount is None or not amount.is_finite():
+        raise ApiError(f"'{field}' must be a decimal number.")
+    if amount <= 0 or amount.as_tuple().exponent < -2 or amount >= Decimal('1e10'):
+        raise ApiError(f"'{field}' must be positive with at most 2 decimal places.")
+    return amount
+
+
+def parse_int(data: dict, field: str):
+    value = data.get(field)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"'{field}' must be an integer.")
+
+
+def parse_choice(data: dict, field: str, choices, default=None) -> str:
+    value = data.get(field) or default
+    if value not in dict(choices):
+        raise ApiError(f"'{field}' must be one of: {', '.join(dict(choices))}.")
+    return value
+
+
+def parse_date_param(value):
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ApiError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+    return parsed
+
+
+def parse_datetime_param(value):
+    parsed = parse_datetime(value or '')
+    if parsed is None:
+        raise ApiError(f"Invalid datetime '{value}', expected ISO 8601.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
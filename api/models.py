@@ -0,0 +1,19 @@
+import secrets
+
+from django.db import models
+from django.contrib.auth.models import User
+
+
+def generate_token_key() -> str:
+    return secrets.token_hex(20)
+
+
+class ApiToken(models.Model):
+    key = models.CharField(max_length=40, unique=True, default=generate_token_key)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"ApiToken({self.user.username}, {self.name or self.key[:8]})"
@@ -0,0 +1,79 @@
+"""Compact serializers built on ``.values()`` rows so no model instances are created."""
+
+ACCOUNT_FIELDS = ('id', 'account_number', 'account_type', 'balance', 'interest_rate', 'created_at')
+
+TRANSACTION_FIELDS = (
+    'id',
+    'transaction_type',
+    'category',
+    'amount',
+    'description',
+    'created_at',
+    'account__account_number',
+    'related_account__account_number',
+)
+
+BENEFICIARY_FIELDS = ('id', 'name', 'nickname', 'account_number', 'email', 'created_at')
+
+SCHEDULED_FIELDS = (
+    'id',
+    'from_account__account_number',
+    'to_identifier',
+    'amount',
+    'category',
+    'description',
+    'frequency',
+    'interval',
+    'month_day',
+    'week_of_month',
+    'weekday',
+    'business_day',
+    'end_date',
+    'max_occurrences',
+    'next_run',
+    'last_run',
+    'is_active',
+)
+
+BUDGET_FIELDS = ('category', 'monthly_limit')
+
+LOAN_FIELDS = ('id', 'amount', 'purpose', 'status', 'term_months', 'annual_rate', 'disbursed_at', 'created_at', 'updated_at')
+
+
+def accounts(qs) -> list:
+    return list(qs.values(*ACCOUNT_FIELDS))
+
+
+def transactions(qs) -> list:
+    return [
+        {
+            'id': pk,
+            'type': ttype,
+            'category': category,
+            'amount': amount,
+            'description': description,
+            'created_at': created_at,
+            'account': account,
+            'related_account': related,
+        }
+        for pk, ttype, category, amount, description, created_at, account, related in qs.values_list(*TRANSACTION_FIELDS)
+    ]
+
+
+def beneficiaries(qs) -> list:
+    return list(qs.values(*BENEFICIARY_FIELDS))
+
+
+def scheduled_transfers(qs) -> list:
+    rows = list(qs.values(*SCHEDULED_FIELDS))
+    for row in rows:
+        row['from_account'] = row.pop('from_account__account_number')
+    return rows
+
+
+def loans(qs) -> list:
+    return list(qs.values(*LOAN_FIELDS))
+
+
+def budgets(qs) -> list:
+    return list(qs.values(*BUDGET_FIELDS))
@@ -0,0 +1,22 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('auth/token/', views.token_view, name='api_token'),
+    path('accounts/', views.accounts_view, name='api_accounts'),
+    path('accounts/<str:number>/', views.account_detail_view, name='api_account_detail'),
+    path('summary/', views.summary_view, name='api_summary'),
+    path('forecast/', views.forecast_view, name='api_forecast'),
+    path('insights/', views.insights_view, name='api_insights'),
+    path('budgets/', views.budgets_view, name='api_budgets'),
+    path('budgets/<str:category>/', views.budget_detail_view, name='api_budget_detail'),
+    path('transactions/', views.transactions_view, name='api_transactions'),
+    path('transactions/deposit/', views.deposit_view, name='api_deposit'),
+    path('transactions/withdraw/', views.withdraw_view, name='api_withdraw'),
+    path('transactions/transfer/', views.transfer_view, name='api_transfer'),
+    path('beneficiaries/', views.beneficiaries_view, name='api_beneficiaries'),
+    path('beneficiaries/<int:pk>/', views.beneficiary_detail_view, name='api_beneficiary_detail'),
+    path('scheduled/', views.scheduled_transfers_view, name='api_scheduled_transfers'),
+    path('scheduled/upcoming/', views.upcoming_payments_view, name='api_upcoming_payments'),
+    path('loans/', views.loans_view, name='api_loans'),
+]
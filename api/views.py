@@ -0,0 +1,288 @@
+from datetime import timedelta
+
+from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from bank.dashboard import account_breakdown, monthly_series, monthly_series_queryset, transaction_totals
+from bank.forecast import DEFAULT_DAYS as DEFAULT_FORECAST_DAYS, forecast
+from bank.models import Account, Loan
+from bankx import sharding
+from bankx.routers import replica_reads
+from transactions import recurrence, search, services
+from transactions.insights import insights
+from transactions.models import Budget, Transaction, Beneficiary, ScheduledTransfer
+from transactions.outbox import record_loan
+from users import metrics, ratelimit
+from . import serializers
+from .auth import (
+    ApiError,
+    api_view,
+    error_response,
+    json_response,
+    parse_amount,
+    parse_body,
+    parse_choice,
+    parse_date_param,
+    parse_datetime_param,
+    parse_int,
+    require,
+)
+from .models import ApiToken
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+UPCOMING_DAYS = 90
+UPCOMING_MAX_DAYS = 366
+INSIGHTS_MONTHS = 6
+INSIGHTS_MAX_MONTHS = 24
+
+
+def _own_account(request, number: str) -> Account:
+    account = Account.objects.filter(user=request.user, account_number=number).first()
+    if account is None:
+        raise ApiError(f"Account '{number}' not found.", 404)
+    return account
+
+
+def _created(request, serializer, qs):
+    return json_response(request, serializer(qs)[0], status=201)
+
+
+@api_view('POST', auth=False)
+def token_view(request):
+    data = parse_body(request)
+    ip, username = ratelimit.client_ip(request), require(data, 'username')
+    with metrics.timed('api_token') as result:
+        wait = ratelimit.retry_after({'login:ip': ip, 'login:user': username})
+        if wait:
+            result['outcome'] = 'throttled'
+            response = error_response('Too many login attempts.', 429)
+            response['Retry-After'] = str(wait)
+            return response
+        ratelimit.hit('login:ip', ip)
+        user = authenticate(request, username=username, password=require(data, 'password'))
+        if user is None:
+            ratelimit.hit('login:user', username)
+            raise ApiError('Invalid credentials.', 401)
+        result['outcome'] = 'success'
+    token = ApiToken.objects.create(user=user, name=str(data.get('name', ''))[:100])
+    return json_response(request, {'token': token.key}, status=201)
+
+
+@api_view('GET')
+def accounts_view(request):
+    qs = Account.objects.filter(user=request.user).order_by('id')
+    return json_response(request, {'results': serializers.accounts(qs)})
+
+
+@api_view('GET')
+def account_detail_view(request, number: str):
+    qs = Account.objects.filter(user=request.user, account_number=number)
+    rows = serializers.accounts(qs)
+    if not rows:
+        raise ApiError(f"Account '{number}' not found.", 404)
+    return json_response(request, rows[0])
+
+
+@api_view('GET')
+@replica_reads
+def summary_view(request):
+    return json_response(request, {
+        'totals': transaction_totals(request.user),
+        'accounts': account_breakdown(request.user),
+        'monthly': monthly_series(monthly_series_queryset(request.user)),
+    })
+
+
+@api_view('GET')
+@replica_reads
+def forecast_view(request):
+    return json_response(request, forecast(request.user, parse_int(request.GET, 'days') or DEFAULT_FORECAST_DAYS))
+
+
+@api_view('GET')
+@replica_reads
+def insights_view(request):
+    months = parse_int(request.GET, 'months') or INSIGHTS_MONTHS
+    if not 1 <= months <= INSIGHTS_MAX_MONTHS:
+        raise ApiError(f"'months' must be between 1 and {INSIGHTS_MAX_MONTHS}.")
+    return json_response(request, insights(request.user, months))
+
+
+@api_view('GET', 'POST')
+def budgets_view(request):
+    qs = Budget.objects.filter(user=request.user)
+    if request.method == 'POST':
+        data = parse_body(request)
+        category = parse_choice(data, 'category', Transaction.CATEGORY_CHOICES)
+        Budget.objects.update_or_create(user=request.user, category=category, defaults={'monthly_limit': parse_amount(data, 'monthly_limit')})
+        return _created(request, serializers.budgets, qs.filter(category=category))
+    return json_response(request, {'results': serializers.budgets(qs.order_by('category'))})
+
+
+@api_view('DELETE')
+def budget_detail_view(request, category: str):
+    get_object_or_404(Budget, user=request.user, category=category).delete()
+    return HttpResponse(status=204)
+
+
+@api_view('GET')
+@replica_reads
+def transactions_view(request):
+    params = request.GET
+    qs = search.search_transactions(Transaction.objects.filter(user=request.user), params.get('q')).order_by('-id')
+    if params.get('type'):
+        qs = qs.filter(transaction_type=parse_choice(params, 'type', Transaction.TRANSACTION_TYPE_CHOICES))
+    if params.get('category'):
+        qs = qs.filter(category=parse_choice(params, 'category', Transaction.CATEGORY_CHOICES))
+    if params.get('account'):
+        qs = qs.filter(account__account_number=params['account'])
+    start = parse_date_param(params.get('start_date'))
+    if start:
+        qs = qs.filter(created_at__date__gte=start)
+    end = parse_date_param(params.get('end_date'))
+    if end:
+        qs = qs.filter(created_at__date__lte=end)
+    if params.get('before', '').isdigit():
+        qs = qs.filter(id__lt=int(params['before']))
+    try:
+        limit = max(1, min(int(params.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE))
+    except ValueError:
+        raise ApiError("'limit' must be an integer.")
+    # Fetch one extra row to know whether another page exists without a COUNT(*)
+    results = serializers.transactions(qs[:limit + 1])
+    next_before = results[limit - 1]['id'] if len(results) > limit else None
+    return json_response(request, {'results': results[:limit], 'next_before': next_before})
+
+
+def _money_request(request):
+    data = parse_body(request)
+    return data, {
+        'category': parse_choice(data, 'category', Transaction.CATEGORY_CHOICES, Transaction.CATEGORY_OTHER),
+        'description': str(data.get('description', ''))[:255],
+    }
+
+
+def _transaction_response(request, t: Transaction):
+    return _created(request, serializers.transactions, Transaction.objects.filter(pk=t.pk))
+
+
+@api_view('POST')
+def deposit_view(request):
+    data, extra = _money_request(request)
+    account = _own_account(request, require(data, 'account'))
+    t = services.deposit(request.user, account, parse_amount(data), **extra)
+    return _transaction_response(request, t)
+
+
+@api_view('POST')
+def withdraw_view(request):
+    data, extra = _money_request(request)
+    account = _own_account(request, require(data, 'account'))
+    try:
+        t = services.withdraw(request.user, account, parse_amount(data), **extra)
+    except services.TransactionError as exc:
+        raise ApiError(str(exc), 409)
+    return _transaction_response(request, t)
+
+
+@api_view('POST')
+def transfer_view(request):
+    data, extra = _money_request(request)
+    from_account = _own_account(request, require(data, 'from_account'))
+    to_account = services.resolve_recipient(require(data, 'to'))
+    try:
+        t = services.transfer(request.user, from_account, to_account, parse_amount(data), **extra)
+    except services.TransactionError as exc:
+        raise ApiError(str(exc), 409)
+    return _transaction_response(request, t)
+
+
+@api_view('GET', 'POST')
+def beneficiaries_view(request):
+    qs = Beneficiary.objects.filter(user=request.user)
+    if request.method == 'POST':
+        data = parse_body(request)
+        b = Beneficiary.objects.create(
+            user=request.user,
+            name=require(data, 'name')[:100],
+            nickname=str(data.get('nickname', ''))[:50],
+            account_number=str(data.get('account_number', ''))[:20],
+            email=str(data.get('email', ''))[:254],
+        )
+        return _created(request, serializers.beneficiaries, qs.filter(pk=b.pk))
+    qs = search.search_beneficiaries(qs, request.GET.get('q'))
+    return json_response(request, {'results': serializers.beneficiaries(qs.order_by('name'))})
+
+
+@api_view('DELETE')
+def beneficiary_detail_view(request, pk: int):
+    get_object_or_404(Beneficiary, pk=pk, user=request.user).delete()
+    return HttpResponse(status=204)
+
+
+@api_view('GET', 'POST')
+def scheduled_transfers_view(request):
+    qs = ScheduledTransfer.objects.filter(user=request.user)
+    if request.method == 'POST':
+        data = parse_body(request)
+        st = ScheduledTransfer(
+            user=request.user,
+            from_account=_own_account(request, require(data, 'from_account')),
+            to_identifier=require(data, 'to')[:255],
+            amount=parse_amount(data),
+            category=parse_choice(data, 'category', Transaction.CATEGORY_CHOICES, Transaction.CATEGORY_OTHER),
+            description=str(data.get('description', ''))[:255],
+            frequency=parse_choice(data, 'frequency', ScheduledTransfer.FREQ_CHOICES, ScheduledTransfer.FREQ_MONTHLY),
+            interval=parse_int(data, 'interval') or 1,
+            month_day=parse_int(data, 'month_day'),
+            week_of_month=parse_int(data, 'week_of_month'),
+            weekday=parse_int(data, 'weekday'),
+            business_day=parse_choice(data, 'business_day', ScheduledTransfer.ADJUST_CHOICES, ScheduledTransfer.ADJUST_NONE),
+            end_date=parse_date_param(data.get('end_date')),
+            max_occurrences=parse_int(data, 'max_occurrences'),
+            next_run=parse_datetime_param(require(data, 'next_run')),
+        )
+        try:
+            recurrence.validate(st)
+        except ValidationError as exc:
+            raise ApiError('; '.join(f'{field}: {" ".join(msgs)}' for field, msgs in exc.message_dict.items()))
+        recurrence.initialize(st)
+        st.save()
+        return _created(request, serializers.scheduled_transfers, qs.filter(pk=st.pk))
+    return json_response(request, {'results': serializers.scheduled_transfers(qs.order_by('next_run'))})
+
+
+@api_view('GET')
+def upcoming_payments_view(request):
+    days = min(parse_int(request.GET, 'days') or UPCOMING_DAYS, UPCOMING_MAX_DAYS)
+    schedules = ScheduledTransfer.objects.filter(user=request.user, is_active=True).select_related('from_account')
+    results = [
+        {
+            'scheduled_transfer': s.id,
+            'date': when,
+            'from_account': s.from_account.account_number,
+            'to': s.to_identifier,
+            'amount': s.amount,
+            'category': s.category,
+        }
+        for when, s in recurrence.upcoming(schedules, timezone.now() + timedelta(days=days))
+    ]
+    return json_response(request, {'days': days, 'results': results})
+
+
+@api_view('GET', 'POST')
+def loans_view(request):
+    qs = Loan.objects.filter(user=request.user)
+    if request.method == 'POST':
+        data = parse_body(request)
+        amount, purpose = parse_amount(data), require(data, 'purpose')
+        term = int(parse_choice({'term_months': str(data.get('term_months', 12))}, 'term_months', [(str(t), label) for t, label in Loan.TERM_CHOICES]))
+        with sharding.atomic():
+            loan = Loan.objects.create(user=request.user, amount=amount, purpose=purpose, term_months=term)
+            record_loan(loan)
+        return _created(request, serializers.loans, qs.filter(pk=loan.pk))
+    return json_response(request, {'results': serializers.loans(qs.order_by('-created_at'))})
@@ -1,15 +1,65 @@
-from django.contrib import admin
-from .models import Account, Loan
+from django.contrib import admin, messages
+from .admin_tools import LargeTableAdmin, csv_export_action
+from .loans import LoanError, disburse_loans
+from .models import Account, InterestAccrual, Loan, LoanInstallment
 
 
 @admin.register(Account)
-class AccountAdmin(admin.ModelAdmin):
-    list_display = ('account_number', 'user', 'account_type', 'balance', 'interest_rate', 'created_at')
-    search_fields = ('account_number', 'user__username', 'user__email')
+class AccountAdmin(LargeTableAdmin):
+    list_display = ('account_number', 'user', 'account_type', 'balance', 'interest_rate', 'interest_accrued_through', 'created_at')
+    list_select_related = ('user',)
+    # Exact/prefix lookups can use the unique and username indexes; '%x%' cannot
+    search_fields = ('=account_number', '^user__username', '=user__email')
     list_filter = ('account_type',)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('user',)
+    actions = [csv_export_action([
+        ('Account', 'account_number'),
+        ('User', 'user__username'),
+        ('Type', 'account_type'),
+        ('Balance', 'balance'),
+        ('Interest rate', 'interest_rate'),
+        ('Created', 'created_at'),
+    ], 'accounts.csv')]
+
+
+@admin.register(InterestAccrual)
+class InterestAccrualAdmin(admin.ModelAdmin):
+    list_display = ('account', 'date', 'balance', 'amount', 'posted')
+    list_filter = ('posted',)
+    list_select_related = ('account',)
+    raw_id_fields = ('account',)
+
+
+class LoanInstallmentInline(admin.TabularInline):
+    model = LoanInstallment
+    extra = 0
+    can_delete = False
+    readonly_fields = ('sequence', 'due_date', 'principal', 'interest', 'amount', 'status', 'paid_at')
 
 
 @admin.register(Loan)
 class LoanAdmin(admin.ModelAdmin):
-    list_display = ('user', 'amount', 'status', 'created_at')
+    list_display = ('user', 'amount', 'term_months', 'annual_rate', 'status', 'disbursed_at', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    raw_id_fields = ('user', 'account')
+    readonly_fields = ('document_sha256', 'document_size', 'document_content_type', 'document_preview', 'document_preview_attempts')
+    inlines = [LoanInstallmentInline]
+    actions = ['approve_and_disburse']
+
+    @admin.action(description='Approve and disburse selected loans')
+    def approve_and_disburse(self, request, queryset):
+        try:
+            disbursed = disburse_loans(list(queryset.select_related('user', 'account')))
+        except LoanError as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return
+        self.message_user(request, f'Disbursed {len(disbursed)} loans.')
+
+
+@admin.register(LoanInstallment)
+class LoanInstallmentAdmin(admin.ModelAdmin):
+    list_display = ('loan', 'sequence', 'due_date', 'amount', 'status', 'paid_at')
     list_filter = ('status',)
+    raw_id_fields = ('loan',)
@@ -0,0 +1,87 @@
+"""Async variants of the read-heavy bank views, routed when ``ASYNC_READ_VIEWS`` is on (see README)."""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import connections
+from django.shortcuts import render
+
+from bank.caching import ledger_version
+from bank.models import Account, Loan
+from bankx.routers import replica_reads
+from transactions.models import Transaction
+from .dashboard import monthly_series_json, monthly_series_queryset, transaction_totals
+from .forecast import DASHBOARD_DAYS, forecast
+from .loans import next_installment_prefetch
+
+arender = sync_to_async(render)
+
+
+async def alist(qs) -> list:
+    return [obj async for obj in qs]
+
+
+async def current_user(request):
+    # Resolve once and pin it so templates/context processors don't reload it synchronously
+    request.user = await request.auser()
+    return request.user
+
+
+def _on_own_connection(fn):
+    @wraps(fn)
+    def run(*args):
+        try:
+            return fn(*args)
+        finally:
+            # Worker threads are pooled; don't leave a connection open on one between requests
+            connections.close_all()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def gather_reads(*calls) -> list:
+    """Run independent ``(fn, *args)`` reads concurrently.
+
+    The async ORM sends every query through one thread-sensitive executor, so
+    awaiting them in turn (or gathering them) runs them one at a time. Each call
+    here gets its own worker thread and therefore its own database connection.
+    """
+    return await asyncio.gather(*(_on_own_connection(fn)(*args) for fn, *args in calls))
+
+
+@login_required
+@replica_reads
+async def dashboard_view(request):
+    user = await current_user(request)
+    accounts, transactions, totals, loans, monthly, projection, version = await gather_reads(
+        (list, Account.objects.filter(user=user)),
+        (list, Transaction.objects.filter(user=user).select_related('account').order_by('-created_at')[:10]),
+        (transaction_totals, user),
+        (list, Loan.objects.filter(user=user).order_by('-created_at')[:5]),
+        (list, monthly_series_queryset(user)),
+        (forecast, user, DASHBOARD_DAYS),
+        (ledger_version, user.pk),
+    )
+    return await arender(
+        request,
+        'bank/dashboard.html',
+        {
+            'accounts': accounts,
+            'transactions': transactions,
+            'totals': totals,
+            'total_deposits': totals['deposits'],
+            'total_withdrawals': totals['withdrawals'],
+            'loans': loans,
+            'monthly_json': monthly_series_json(monthly),
+            'forecast': projection,
+            'ledger_version': version,
+            'live_events': True,
+        },
+    )
+
+
+@login_required
+async def loans_view(request):
+    user = await current_user(request)
+    loans = await alist(Loan.objects.filter(user=user).select_related('account').prefetch_related(next_installment_prefetch()).order_by('-created_at'))
+    return await arender(request, 'bank/loans.html', {'loans': loans})
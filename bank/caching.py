@@ -0,0 +1,31 @@
+"""Per-user cache versions.
+
+Cached values embed the user's current version in their key, so bumping the
+version (from the signal handlers in ``bank/signals.py``) invalidates every
+entry for that user without having to know which keys exist.
+"""
+import time
+
+from django.core.cache import cache
+
+# Namespaces. FORECAST changes whenever any of the user's accounts is saved (so
+# on every ledger movement) or a schedule touching them changes; it also keys the
+# dashboard and history template fragments.
+FORECAST = 'forecast'
+
+
+def _key(namespace: str, user_id) -> str:
+    return f'{namespace}:version:{user_id}'
+
+
+def user_version(namespace: str, user_id) -> int:
+    return cache.get_or_set(_key(namespace, user_id), time.time_ns, None)
+
+
+def ledger_version(user_id) -> int:
+    return user_version(FORECAST, user_id)
+
+
+def bump_user_version(namespace: str, *user_ids) -> None:
+    version = time.time_ns()
+    cache.set_many({_key(namespace, user_id): version for user_id in set(user_ids) if user_id is not None}, None)
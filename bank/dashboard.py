@@ -0,0 +1,140 @@
+"""Dashboard query service shared by the HTML dashboards and the JSON API."""
+import json
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from bank.models import Account
+from transactions.models import AccountCarryForward, Transaction
+
+ZERO = Decimal('0.00')
+CARRY_FORWARD_FIELDS = [
+    f'{kind}{suffix}'
+    for kind in ('deposits', 'withdrawals', 'transfers_out', 'transfers_in')
+    for suffix in ('', '_count')
+]
+
+
+def _money(value) -> Decimal:
+    # SQLite returns unscaled sums (e.g. 140.5); normalise to cents
+    return (value or ZERO).quantize(ZERO)
+
+
+def _own_accounts(user):
+    return Account.objects.filter(user=user).values('id')
+
+
+def _summary_queryset(user):
+    return Transaction.objects.filter(Q(user=user) | Q(related_account__in=_own_accounts(user)))
+
+
+def _summary_expressions(user) -> dict:
+    sent = Q(user=user)
+    incoming = Q(transaction_type=Transaction.TYPE_TRANSFER, related_account__in=_own_accounts(user))
+    expressions = {
+        'deposits': Sum('amount', filter=sent & Q(transaction_type=Transaction.TYPE_DEPOSIT)),
+        'deposits_count': Count('id', filter=sent & Q(transaction_type=Transaction.TYPE_DEPOSIT)),
+        'withdrawals': Sum('amount', filter=sent & Q(transaction_type=Transaction.TYPE_WITHDRAW)),
+        'withdrawals_count': Count('id', filter=sent & Q(transaction_type=Transaction.TYPE_WITHDRAW)),
+        'transfers_out': Sum('amount', filter=sent & Q(transaction_type=Transaction.TYPE_TRANSFER)),
+        'transfers_out_count': Count('id', filter=sent & Q(transaction_type=Transaction.TYPE_TRANSFER)),
+        'transfers_in': Sum('amount', filter=incoming),
+        'transfers_in_count': Count('id', filter=incoming),
+    }
+    for category, _ in Transaction.CATEGORY_CHOICES:
+        expressions[f'category_{category}'] = Sum('amount', filter=sent & Q(category=category))
+        expressions[f'category_{category}_count'] = Count('id', filter=sent & Q(category=category))
+    return expressions
+
+
+def _shape_totals(row: dict) -> dict:
+    totals = {key: row[key] if key.endswith('_count') else _money(row[key]) for key in row if not key.startswith('category_')}
+    totals['categories'] = {
+        category: {'total': _money(row[f'category_{category}']), 'count': row[f'category_{category}_count']}
+        for category, _ in Transaction.CATEGORY_CHOICES
+    }
+    return totals
+
+
+def _add_carry_forward(totals: dict, rows) -> dict:
+    # Archived history is folded into per-account carry-forward rows (see transactions.archive)
+    for row in rows:
+        for field in CARRY_FORWARD_FIELDS:
+            totals[field] += row[field]
+        for category, values in row['categories'].items():
+            if category in totals['categories']:
+                totals['categories'][category]['total'] += Decimal(values['total'])
+                totals['categories'][category]['count'] += values['count']
+    return totals
+
+
+def _carry_forward_queryset(user):
+    return AccountCarryForward.objects.filter(account__user=user).values(*CARRY_FORWARD_FIELDS, 'categories')
+
+
+def transaction_totals(user) -> dict:
+    """Deposits, withdrawals, transfers in/out and per-category totals in a single ledger query."""
+    totals = _shape_totals(_summary_queryset(user).aggregate(**_summary_expressions(user)))
+    return _add_carry_forward(totals, _carry_forward_queryset(user))
+
+
+def account_breakdown(user) -> list:
+    """Per-account totals: one grouped query for each direction of money flow."""
+    outgoing = {
+        row['account_id']: row
+        for row in Transaction.objects.filter(account__user=user)
+        .values('account_id')
+        .annotate(
+            deposits=Sum('amount', filter=Q(transaction_type=Transaction.TYPE_DEPOSIT)),
+            withdrawals=Sum('amount', filter=Q(transaction_type=Transaction.TYPE_WITHDRAW)),
+            transfers_out=Sum('amount', filter=Q(transaction_type=Transaction.TYPE_TRANSFER)),
+            count=Count('id'),
+        )
+        .order_by()
+    }
+    incoming = {
+        row['related_account_id']: row['transfers_in']
+        for row in Transaction.objects.filter(transaction_type=Transaction.TYPE_TRANSFER, related_account__user=user)
+        .values('related_account_id')
+        .annotate(transfers_in=Sum('amount'))
+        .order_by()
+    }
+    breakdown = []
+    for account in Account.objects.filter(user=user).order_by('id').values('id', 'account_number', 'account_type', 'balance'):
+        row = outgoing.get(account['id'], {})
+        breakdown.append({
+            **account,
+            'deposits': _money(row.get('deposits')),
+            'withdrawals': _money(row.get('withdrawals')),
+            'transfers_out': _money(row.get('transfers_out')),
+            'transfers_in': _money(incoming.get(account['id'])),
+            'count': row.get('count', 0),
+        })
+    return breakdown
+
+
+def monthly_series_queryset(user):
+    # Analytics: group by month for chart (simple)
+    return (
+        Transaction.objects.filter(user=user)
+        .annotate(month=TruncMonth('created_at'))
+        .values('month', 'transaction_type')
+        .annotate(total=Sum('amount'))
+        .order_by('month')
+    )
+
+
+def monthly_series(rows) -> list:
+    return [
+        {
+            'month': (row['month'].strftime('%Y-%m') if row['month'] else ''),
+            'transaction_type': row['transaction_type'],
+            'total': float(row['total'] or 0),
+        }
+        for row in rows
+    ]
+
+
+def monthly_series_json(rows) -> str:
+    return json.dumps(monthly_series(rows))
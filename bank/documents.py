@@ -0,0 +1,127 @@
+"""Loan document uploads and previews.
+
+:class:`LoanDocumentUploadHandler` streams the upload to a temporary file chunk by
+chunk, rejecting it as soon as it exceeds the size limit or its leading bytes are
+not an accepted type, and hashes it on the way through. Previews are rendered
+later by ``manage.py render_loan_previews`` so requests never decode documents.
+"""
+import hashlib
+import shutil
+import subprocess
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+PREVIEW_SIZE = (320, 320)
+# Leading bytes of each accepted format -> the content type we record
+SIGNATURES = {
+    b'%PDF-': 'application/pdf',
+    b'\x89PNG\r\n\x1a\n': 'image/png',
+    b'\xff\xd8\xff': 'image/jpeg',
+}
+
+
+def max_bytes() -> int:
+    return getattr(settings, 'LOAN_DOCUMENT_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+
+def sniff(head: bytes) -> str:
+    for signature, content_type in SIGNATURES.items():
+        if head.startswith(signature):
+            return content_type
+    return ''
+
+
+class LoanDocumentUploadHandler(TemporaryFileUploadHandler):
+    """Writes uploads straight to disk; validation failures end up in ``errors``."""
+
+    def __init__(self, request=None, limit: int = None):
+        super().__init__(request)
+        self.limit = limit or max_bytes()
+        self.errors = {}
+
+    def _reject(self, message: str):
+        self.errors[self.field_name] = message
+        raise SkipFile(message)
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        self.field_name = field_name
+        if content_length and content_length > self.limit:
+            self._reject(f'File is larger than {self.limit // (1024 * 1024)} MB.')
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.digest = hashlib.sha256()
+        self.detected_type = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.limit:
+            self._reject(f'File is larger than {self.limit // (1024 * 1024)} MB.')
+        if self.detected_type is None:
+            self.detected_type = sniff(raw_data)
+            if not self.detected_type:
+                self._reject('Upload a PDF, PNG or JPEG document.')
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.digest.hexdigest()
+        if self.detected_type:
+            file.content_type = self.detected_type
+        return file
+
+
+def _image_preview(fh):
+    from PIL import Image
+
+    with Image.open(fh) as image:
+        # Lets the JPEG decoder downscale while reading instead of decoding full size
+        image.draft('RGB', PREVIEW_SIZE)
+        image = image.convert('RGB')
+        image.thumbnail(PREVIEW_SIZE)
+        out = BytesIO()
+        image.save(out, 'JPEG', quality=80, optimize=True)
+    return out.getvalue()
+
+
+def can_render_pdf() -> bool:
+    return shutil.which('pdftoppm') is not None
+
+
+def _pdf_preview(fh):
+    pdftoppm = shutil.which('pdftoppm')
+    if pdftoppm is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'document.pdf'
+        with source.open('wb') as out:
+            shutil.copyfileobj(fh, out)
+        subprocess.run(
+            [pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-jpeg', '-scale-to', str(max(PREVIEW_SIZE)), str(source), str(Path(tmp) / 'page')],
+            check=True,
+            capture_output=True,
+            timeout=60,
+        )
+        return (Path(tmp) / 'page.jpg').read_bytes()
+
+
+def render_preview(loan) -> bool:
+    """Store a JPEG thumbnail of the loan's document; False if this type cannot be rendered here."""
+    with loan.document.open('rb') as fh:
+        # Documents uploaded before types were recorded are sniffed here
+        content_type = loan.document_content_type or sniff(fh.read(16))
+        fh.seek(0)
+        if content_type == 'application/pdf':
+            data = _pdf_preview(fh)
+        else:
+            data = _image_preview(fh)
+    if data is None:
+        return False
+    name = f'{loan.document_sha256 or loan.pk}.jpg'
+    loan.document_preview.save(name, ContentFile(data), save=False)
+    loan.save(update_fields=['document_preview'])
+    return True
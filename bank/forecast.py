@@ -0,0 +1,150 @@
+"""Projected day-by-day balances from scheduled transfers and savings interest.
+
+All occurrences of every relevant schedule inside the horizon are expanded with
+:mod:`transactions.recurrence` and replayed once in time order, in integer cents,
+together with daily interest accrual and month-start postings. A debit the
+account cannot cover is reported as a shortfall and, like the real scheduler,
+not applied. Daily balances are then a prefix sum of per-day deltas. Results are
+cached per user until an account or schedule of theirs changes (see
+``bank/signals.py``).
+"""
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import accumulate
+
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from bank.caching import FORECAST, user_version
+from bank.interest import daily_interest
+from bank.models import Account, InterestAccrual
+from transactions import recurrence
+from transactions.models import ScheduledTransfer
+
+DEFAULT_DAYS = 90
+DASHBOARD_DAYS = 30
+MAX_DAYS = 366
+CENT = Decimal('0.01')
+
+
+def _cents(amount) -> int:
+    return int((Decimal(amount) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def _money(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+def _schedules(user, accounts: list) -> tuple:
+    numbers = [a.account_number for a in accounts]
+    incoming = Q(to_identifier__in=numbers)
+    if user.email:
+        incoming |= Q(to_identifier__iexact=user.email)
+    active = ScheduledTransfer.objects.filter(is_active=True).select_related('from_account')
+    outgoing = list(active.filter(from_account__user=user))
+    return outgoing, list(active.filter(incoming).exclude(from_account__user=user))
+
+
+def _target(schedule, user, accounts: list):
+    """Own account credited by ``schedule``, mirroring ``services.resolve_recipient``."""
+    identifier = schedule.to_identifier.strip()
+    if identifier.isdigit():
+        return next((a.pk for a in accounts if a.account_number == identifier), None)
+    if accounts and user.email and identifier.lower() == user.email.lower():
+        return min(a.pk for a in accounts)
+    return None
+
+
+def _interest_events(accounts: list, today, days: int) -> list:
+    """Daily accrual on each closing balance and the month-start posting, as in bank/interest.py."""
+    savers = [a for a in accounts if a.account_type == Account.TYPE_SAVINGS and a.interest_rate > 0]
+    if not savers:
+        return []
+    tz = timezone.get_current_timezone()
+    events = []
+    for offset in range(days):
+        day = today + timedelta(days=offset)
+        if day.day == 1 and offset:
+            when = timezone.make_aware(datetime.combine(day, time.min), tz)
+            events.extend((when, 0, 'interest', None, a.pk, None) for a in savers)
+        when = timezone.make_aware(datetime.combine(day, time.max), tz)
+        events.extend((when, 2, 'accrue', None, a.pk, None) for a in savers)
+    return events
+
+
+def project(user, days: int = DEFAULT_DAYS) -> dict:
+    today = timezone.localdate()
+    accounts = list(Account.objects.filter(user=user).order_by('created_at'))
+    until = timezone.make_aware(datetime.combine(today + timedelta(days=days - 1), time.max))
+    outgoing, incoming = _schedules(user, accounts)
+
+    events = _interest_events(accounts, today, days)
+    for s in outgoing:
+        for _, when in recurrence.occurrences(s, until=until):
+            events.append((when, 1, 'debit', s.from_account_id, _target(s, user, accounts), s))
+    for s in incoming:
+        for _, when in recurrence.occurrences(s, until=until):
+            events.append((when, 1, 'credit', None, _target(s, user, accounts), s))
+    # Interest posts before same-instant transfers; the index keeps ties comparable
+    events = [(when, order, i, kind, source, target, s) for i, (when, order, kind, source, target, s) in enumerate(events)]
+    heapq.heapify(events)
+
+    balance = {a.pk: _cents(a.balance) for a in accounts}
+    rate = {a.pk: a.interest_rate for a in accounts}
+    deltas = {a.pk: [0] * days for a in accounts}
+    interest = defaultdict(int)
+    accrued = defaultdict(Decimal, (
+        InterestAccrual.objects.filter(account__in=accounts, posted=False)
+        .values('account_id').annotate(total=Sum('amount')).values_list('account_id', 'total')
+    ))
+    shortfalls = defaultdict(list)
+    while events:
+        when, _, _, kind, source, target, s = heapq.heappop(events)
+        day = max(0, (timezone.localdate(when) - today).days)
+        if kind == 'accrue':
+            accrued[target] += daily_interest(_money(balance[target]), rate[target])
+            continue
+        if kind == 'interest':
+            cents = _cents(accrued.pop(target, 0))
+            interest[target] += cents
+        else:
+            cents = _cents(s.amount)
+        if source is not None:
+            if balance[source] < cents:
+                shortfalls[source].append({'date': when, 'amount': s.amount, 'to': s.to_identifier, 'balance': _money(balance[source])})
+                continue
+            balance[source] -= cents
+            deltas[source][day] -= cents
+        if target is not None:
+            balance[target] += cents
+            deltas[target][day] += cents
+
+    rows = []
+    for a in accounts:
+        series = list(accumulate(deltas[a.pk], initial=_cents(a.balance)))[1:]
+        low = min(range(days), key=series.__getitem__) if days else None
+        rows.append({
+            'account': a.account_number,
+            'account_type': a.account_type,
+            'balance': a.balance,
+            'end_balance': _money(series[-1]) if series else a.balance,
+            'min_balance': _money(series[low]) if series else a.balance,
+            'min_date': today + timedelta(days=low) if series else today,
+            'interest': _money(interest[a.pk]),
+            'shortfalls': shortfalls[a.pk],
+            'series': [_money(v) for v in series],
+        })
+    return {'start': today, 'days': days, 'accounts': rows}
+
+
+def forecast(user, days: int = DEFAULT_DAYS) -> dict:
+    days = max(1, min(days, MAX_DAYS))
+    key = f'{FORECAST}:{user.pk}:{user_version(FORECAST, user.pk)}:{timezone.localdate()}:{days}'
+    result = cache.get(key)
+    if result is None:
+        result = project(user, days)
+        cache.set(key, result, 24 * 60 * 60)
+    return result
@@ -0,0 +1,86 @@
+"""Form fields shared by the money-movement and admin forms."""
+from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
+
+
+def owned(user, model, **filters) -> list:
+    """``user``'s ``model`` rows, fetched once and remembered on the user object.
+
+    ``request.user`` is rebuilt for every request, so this is a per-request memo:
+    every form built while handling one request shares a single query.
+    """
+    cache = getattr(user, '_owned_cache', None)
+    if cache is None:
+        cache = user._owned_cache = {}
+    key = (model, tuple(sorted(filters.items())))
+    if key not in cache:
+        cache[key] = list(model.objects.filter(user=user, **filters).order_by('pk'))
+    return cache[key]
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.objects:
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.objects) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.objects)
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """A ``ModelChoiceField`` whose options are evaluated once and reused.
+
+    Rendering and validation both read ``objects``, so a bound form re-rendered
+    with errors costs no extra queries. Assign ``objects`` directly (for example
+    from :func:`owned`) to share one fetch between several forms.
+    """
+    iterator = CachedModelChoiceIterator
+
+    def __init__(self, queryset, *args, **kwargs):
+        super().__init__(queryset, *args, **kwargs)
+        self._objects = None
+
+    def _set_queryset(self, queryset):
+        self._objects = None
+        super()._set_queryset(queryset)
+
+    queryset = property(forms.ModelChoiceField._get_queryset, _set_queryset)
+
+    @property
+    def objects(self) -> list:
+        if self._objects is None:
+            self._objects = list(self.queryset)
+        return self._objects
+
+    @objects.setter
+    def objects(self, objects) -> None:
+        self._objects = list(objects)
+        self.widget.choices = self.choices
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        key = self.to_field_name or 'pk'
+        if isinstance(value, self.queryset.model):
+            value = getattr(value, key)
+        for obj in self.objects:
+            if str(getattr(obj, key)) == str(value):
+                return obj
+        raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+
+
+class UserLookupField(forms.ModelChoiceField):
+    """Pick a user by username in a text box backed by ``user_autocomplete`` instead of a full ``<select>``."""
+    widget = forms.TextInput
+
+    def __init__(self, queryset, *args, autocomplete_url: str = '', **kwargs):
+        kwargs.setdefault('to_field_name', 'username')
+        kwargs.setdefault('help_text', 'Start typing a username or email')
+        super().__init__(queryset, *args, **kwargs)
+        self.widget.attrs.update({'autocomplete': 'off', 'list': 'user-options', 'data-autocomplete-url': autocomplete_url})
@@ -0,0 +1,161 @@
+"""Daily interest accrual on closing balances, posted to the ledger monthly.
+
+``accrue_chunk`` handles a pk-ordered chunk of interest-bearing accounts. It
+locks them and reads their current balances, then reads net ledger movements
+per account and day since the earliest missing day in two grouped queries. Each
+missing day's closing balance comes from walking those deltas back from the
+current balance, so days missed by earlier runs are caught up exactly. The
+chunk ends with one ``bulk_create``.
+
+``post_chunk`` turns a completed month's accruals into one deposit per account.
+Sub-cent remainders are rounded half-even at posting.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from bank.caching import FORECAST, bump_user_version
+from bank.models import Account, InterestAccrual
+from bankx import sharding
+from transactions.events import publish_transaction
+from transactions.models import OutboxEvent, Transaction
+from transactions.outbox import transaction_events
+
+CENT = Decimal('0.01')
+MICRO = Decimal('0.000001')
+DAYS_PER_YEAR = Decimal(365)
+
+
+def daily_interest(balance: Decimal, annual_rate: Decimal) -> Decimal:
+    if balance <= 0:
+        return Decimal('0')
+    return (balance * annual_rate / 100 / DAYS_PER_YEAR).quantize(MICRO)
+
+
+def interest_bearing():
+    return Account.objects.filter(account_type=Account.TYPE_SAVINGS, interest_rate__gt=0)
+
+
+def _day_start(d):
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def _net_movements(account_ids: list, since) -> dict:
+    """``{account_id: {local_date: net_amount}}`` for ledger rows from ``since`` on."""
+    day = TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    net = defaultdict(lambda: defaultdict(Decimal))
+    outgoing = (
+        Transaction.objects.filter(account_id__in=account_ids, created_at__gte=since)
+        .values('account_id', day=day)
+        .annotate(
+            credit=Sum('amount', filter=Q(transaction_type=Transaction.TYPE_DEPOSIT)),
+            debit=Sum('amount', filter=~Q(transaction_type=Transaction.TYPE_DEPOSIT)),
+        )
+        .order_by()
+    )
+    for row in outgoing:
+        net[row['account_id']][row['day']] += (row['credit'] or 0) - (row['debit'] or 0)
+    incoming = (
+        Transaction.objects.filter(related_account_id__in=account_ids, transaction_type=Transaction.TYPE_TRANSFER, created_at__gte=since)
+        .values('related_account_id', day=day)
+        .annotate(credit=Sum('amount'))
+        .order_by()
+    )
+    for row in incoming:
+        net[row['related_account_id']][row['day']] += row['credit']
+    return net
+
+
+def accrue_chunk(after_id: int, chunk_size: int, through) -> tuple:
+    """Accrue up to ``through`` (inclusive) for the next chunk. Returns ``(last_id, rows)`` or None when done."""
+    today = timezone.localdate()
+    pending = interest_bearing().filter(Q(interest_accrued_through__isnull=True) | Q(interest_accrued_through__lt=through), pk__gt=after_id)
+    ids = list(pending.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+    if not ids:
+        return None
+    with sharding.atomic():
+        # Locking freezes balances and the ledger for these accounts while we read both
+        accounts = list(Account.objects.select_for_update().filter(pk__in=ids).order_by('pk'))
+        # Accounts that have never accrued start yesterday; earlier months were paid by the old monthly job
+        first = {a.pk: a.interest_accrued_through + timedelta(days=1) if a.interest_accrued_through else through for a in accounts}
+        net = _net_movements(ids, _day_start(min(first.values()) + timedelta(days=1)))
+        rows = []
+        for account in accounts:
+            closing, movements = account.balance, net.get(account.pk, {})
+            # Walk back from today's balance to the close of each missing day
+            d = today
+            while d > through:
+                closing -= movements.get(d, 0)
+                d -= timedelta(days=1)
+            while d >= first[account.pk]:
+                rows.append(InterestAccrual(account=account, date=d, balance=closing, amount=daily_interest(closing, account.interest_rate)))
+                closing -= movements.get(d, 0)
+                d -= timedelta(days=1)
+            account.interest_accrued_through = through
+        InterestAccrual.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        Account.objects.bulk_update(accounts, ['interest_accrued_through'])
+    return ids[-1], len(rows)
+
+
+def post_chunk(after_id: int, chunk_size: int, before) -> tuple:
+    """Post unposted accruals dated before ``before``. Returns ``(last_id, posted)`` or None when done."""
+    totals = list(
+        InterestAccrual.objects.filter(posted=False, date__lt=before, account_id__gt=after_id)
+        .values('account_id')
+        .annotate(total=Sum('amount'))
+        .order_by('account_id')[:chunk_size]
+    )
+    if not totals:
+        return None
+    ids = [row['account_id'] for row in totals]
+    month = (before - timedelta(days=1)).strftime('%B %Y')
+    with sharding.atomic():
+        accounts = {a.pk: a for a in Account.objects.select_for_update().filter(pk__in=ids).order_by('pk')}
+        today = timezone.localdate()
+        txns = []
+        for row in totals:
+            amount = row['total'].quantize(CENT)
+            account = accounts[row['account_id']]
+            account.last_interest_applied = today
+            if amount <= 0:
+                continue
+            account.balance += amount
+            txns.append(Transaction(
+                user_id=account.user_id,
+                account=account,
+                transaction_type=Transaction.TYPE_DEPOSIT,
+                category=Transaction.CATEGORY_OTHER,
+                amount=amount,
+                description=f'Interest for {month}',
+                nonce=str(uuid.uuid4()),
+            ))
+        Account.objects.bulk_update(accounts.values(), ['balance', 'last_interest_applied'])
+        InterestAccrual.objects.filter(account_id__in=ids, posted=False, date__lt=before).update(posted=True)
+        txns = Transaction.objects.bulk_create(txns)
+        OutboxEvent.objects.bulk_create([event for t in txns for event in transaction_events(t)])
+        for t in txns:
+            publish_transaction(t)
+        bump_user_version(FORECAST, *{a.user_id for a in accounts.values()})
+    return ids[-1], len(txns)
+
+
+def run(chunk_size: int = 1000, through=None, post: bool = True) -> tuple:
+    """Accrue through ``through`` (default: yesterday) and post completed months. Returns ``(accrued_rows, posted)``."""
+    today = timezone.localdate()
+    through = through or today - timedelta(days=1)
+    accrued = posted = 0
+    last_id = 0
+    while (result := accrue_chunk(last_id, chunk_size, through)) is not None:
+        last_id, rows = result
+        accrued += rows
+    if post:
+        last_id = 0
+        while (result := post_chunk(last_id, chunk_size, today.replace(day=1))) is not None:
+            last_id, count = result
+            posted += count
+    return accrued, posted
@@ -0,0 +1,176 @@
+"""Loan servicing: disbursement, amortization schedules and batch collection."""
+import calendar
+import uuid
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Min, Prefetch
+from django.utils import timezone
+
+from bank.caching import FORECAST, bump_user_version
+from bank.models import Account, Loan, LoanInstallment
+from bankx import sharding
+from transactions import services
+from transactions.events import publish_transaction
+from transactions.models import OutboxEvent, Transaction
+from transactions.outbox import record_loan, transaction_events
+
+CENT = Decimal('0.01')
+
+
+class LoanError(Exception):
+    pass
+
+
+def add_months(d: date, months: int) -> date:
+    """Same day ``months`` later, clamped to the end of shorter months."""
+    month_index = d.month - 1 + months
+    year, month = d.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(d.day, calendar.monthrange(year, month)[1]))
+
+
+def next_installment_prefetch() -> Prefetch:
+    """Attach outstanding installments as ``loan.due_installments`` for listing pages."""
+    return Prefetch(
+        'installments',
+        queryset=LoanInstallment.objects.filter(status=LoanInstallment.STATUS_DUE).order_by('sequence'),
+        to_attr='due_installments',
+    )
+
+
+def build_schedules(loans, first_due: date) -> list:
+    """Annuity schedules for many loans at once.
+
+    Loans sharing a rate and term share one annuity factor, and each group is
+    advanced a month at a time across all of its loans, so the work is
+    O(term x groups) Python iterations over column lists rather than per-loan
+    schedule objects. The final installment absorbs rounding.
+    """
+    groups = defaultdict(list)
+    for loan in loans:
+        groups[(loan.annual_rate, loan.term_months)].append(loan)
+    installments = []
+    for (annual_rate, term), group in groups.items():
+        r = Decimal(annual_rate) / Decimal('1200')
+        factor = r / (1 - (1 + r) ** -term) if r else Decimal(1) / term
+        payments = [(loan.amount * factor).quantize(CENT) for loan in group]
+        balances = [loan.amount for loan in group]
+        for sequence in range(1, term + 1):
+            due = add_months(first_due, sequence - 1)
+            for i, loan in enumerate(group):
+                interest = (balances[i] * r).quantize(CENT)
+                principal = balances[i] if sequence == term else min(payments[i] - interest, balances[i])
+                balances[i] -= principal
+                installments.append(LoanInstallment(
+                    loan=loan,
+                    sequence=sequence,
+                    due_date=due,
+                    principal=principal,
+                    interest=interest,
+                    amount=principal + interest,
+                ))
+    return installments
+
+
+def disburse_loans(loans) -> list:
+    """Approve, pay out and schedule repayments for ``loans`` in one transaction."""
+    ids = [loan.pk for loan in loans if loan.disbursed_at is None and loan.status in (Loan.STATUS_PENDING, Loan.STATUS_APPROVED)]
+    if not ids:
+        return []
+    now = timezone.now()
+    with sharding.atomic():
+        # Re-read under lock: a concurrent approval may have disbursed some of these already
+        loans = list(
+            Loan.objects.select_for_update(of=('self',))
+            .filter(pk__in=ids, disbursed_at__isnull=True, status__in=(Loan.STATUS_PENDING, Loan.STATUS_APPROVED))
+            .select_related('user', 'account')
+            .order_by('pk')
+        )
+        if not loans:
+            return []
+        for loan in loans:
+            account = loan.account or Account.objects.filter(user_id=loan.user_id).order_by('created_at').first()
+            if account is None:
+                raise LoanError(f'Loan {loan.id}: borrower has no account to disburse into.')
+            services.deposit(loan.user, account, loan.amount, description=f'Loan #{loan.id} disbursement')
+            loan.account = account
+            loan.status = Loan.STATUS_APPROVED
+            loan.disbursed_at = now
+            loan.updated_at = now
+        Loan.objects.bulk_update(loans, ['account', 'status', 'disbursed_at', 'updated_at'])
+        LoanInstallment.objects.bulk_create(build_schedules(loans, add_months(timezone.localdate(now), 1)), batch_size=1000)
+        for loan in loans:
+            record_loan(loan)
+    return loans
+
+
+def collect_chunk(after_id: int, chunk_size: int, today: date):
+    """Debit one chunk of due installments. Returns ``(last_id, paid, missed)`` or None when done.
+
+    Accounts are locked with ``select_for_update`` in primary-key order, the same
+    discipline as :func:`transactions.services.transfer`, and all writes for the
+    chunk are issued as bulk statements.
+    """
+    ids = list(
+        LoanInstallment.objects.filter(
+            status=LoanInstallment.STATUS_DUE, due_date__lte=today, id__gt=after_id,
+            loan__status=Loan.STATUS_APPROVED, loan__account__isnull=False,
+        )
+        .order_by('id')
+        .values_list('id', flat=True)[:chunk_size]
+    )
+    if not ids:
+        return None
+    now = timezone.now()
+    with sharding.atomic():
+        installments = list(
+            LoanInstallment.objects.select_for_update()
+            .filter(id__in=ids, status=LoanInstallment.STATUS_DUE, loan__status=Loan.STATUS_APPROVED)
+            .select_related('loan')
+            .order_by('loan_id', 'sequence')
+        )
+        account_ids = sorted({i.loan.account_id for i in installments})
+        accounts = {a.pk: a for a in Account.objects.select_for_update().filter(pk__in=account_ids).order_by('pk')}
+        # A loan with an earlier installment still due (missed in an earlier chunk) pays nothing here
+        first_in_chunk = {}
+        for installment in installments:
+            first_in_chunk.setdefault(installment.loan_id, installment.sequence)
+        earliest_due = dict(
+            LoanInstallment.objects.filter(loan_id__in=first_in_chunk, status=LoanInstallment.STATUS_DUE)
+            .values('loan_id').annotate(first=Min('sequence')).values_list('loan_id', 'first')
+        )
+        skipped_loans = {loan_id for loan_id, sequence in first_in_chunk.items() if earliest_due.get(loan_id, sequence) < sequence}
+        paid, txns, touched = [], [], set()
+        for installment in installments:
+            account = accounts[installment.loan.account_id]
+            if installment.loan_id in skipped_loans or account.balance < installment.amount:
+                # Keep installments of one loan in order: once one is missed, later ones wait too
+                skipped_loans.add(installment.loan_id)
+                continue
+            account.balance -= installment.amount
+            touched.add(account.pk)
+            installment.status = LoanInstallment.STATUS_PAID
+            installment.paid_at = now
+            paid.append(installment)
+            txns.append(Transaction(
+                user_id=installment.loan.user_id,
+                account=account,
+                transaction_type=Transaction.TYPE_WITHDRAW,
+                category=Transaction.CATEGORY_BILLS,
+                amount=installment.amount,
+                description=f'Loan #{installment.loan_id} installment {installment.sequence}',
+                nonce=str(uuid.uuid4()),
+            ))
+        Account.objects.bulk_update([accounts[pk] for pk in touched], ['balance'])
+        # bulk_update sends no post_save, so invalidate forecasts explicitly
+        bump_user_version(FORECAST, *{accounts[pk].user_id for pk in touched})
+        LoanInstallment.objects.bulk_update(paid, ['status', 'paid_at'])
+        txns = Transaction.objects.bulk_create(txns)
+        OutboxEvent.objects.bulk_create([event for t in txns for event in transaction_events(t)])
+        for t in txns:
+            publish_transaction(t)
+        Loan.objects.filter(id__in={i.loan_id for i in paid}, status=Loan.STATUS_APPROVED).exclude(
+            installments__status=LoanInstallment.STATUS_DUE
+        ).update(status=Loan.STATUS_CLOSED, updated_at=now)
+    return ids[-1], len(paid), len(installments) - len(paid)
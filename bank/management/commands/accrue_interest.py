@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from bank import interest
+from bankx import sharding
+
+
+class Command(BaseCommand):
+    help = 'Accrue daily interest on savings accounts (catching up missed days) and post completed months'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--through', type=date.fromisoformat, help='Last day to accrue (default: yesterday)')
+        parser.add_argument('--no-post', action='store_true', help='Only accrue; do not post interest transactions')
+
+    @sharding.per_shard
+    def handle(self, *args, **options):
+        # A day is accrued on its closing balance, so only closed days can be accrued
+        if options['through'] and options['through'] >= timezone.localdate():
+            raise CommandError('--through must be before today.')
+        accrued, posted = interest.run(options['chunk_size'], options['through'], post=not options['no_post'])
+        self.stdout.write(self.style.SUCCESS(f'Accrued {accrued} account-days; posted interest to {posted} accounts'))
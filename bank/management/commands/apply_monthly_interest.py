@@ -1,15 +1,12 @@
 from django.core.management.base import BaseCommand
-from bank.models import Account
+from bank import interest
+from bankx import sharding
 
 
 class Command(BaseCommand):
-    help = 'Apply monthly interest to all savings accounts'
+    help = 'Apply monthly interest to all savings accounts (kept for existing cron entries; see accrue_interest)'
 
+    @sharding.per_shard
     def handle(self, *args, **options):
-        count = 0
-        for account in Account.objects.filter(account_type=Account.TYPE_SAVINGS):
-            interest = account.accrue_monthly_interest()
-            if interest and interest > 0:
-                count += 1
-        self.stdout.write(self.style.SUCCESS(f'Applied interest for {count} accounts'))
-
+        _, posted = interest.run()
+        self.stdout.write(self.style.SUCCESS(f'Applied interest for {posted} accounts'))
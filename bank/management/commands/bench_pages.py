@@ -0,0 +1,77 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template.backends.django import Template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+DEFAULT_PAGES = ['dashboard', 'history', 'insights', 'loans', 'beneficiaries']
+
+
+@contextmanager
+def timed_renders(samples: list):
+    """Record the wall time of every outermost template render into ``samples``."""
+    original = Template.render
+    depth = [0]
+
+    def render(self, *args, **kwargs):
+        # Form widgets and crispy fields render nested templates; count only the page
+        depth[0] += 1
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            depth[0] -= 1
+            if not depth[0]:
+                samples.append(time.perf_counter() - start)
+
+    Template.render = render
+    try:
+        yield
+    finally:
+        Template.render = original
+
+
+class Command(BaseCommand):
+    help = 'Request pages as a user and report response time, template render time and queries per page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs='*', help=f'URL names or paths (default: {", ".join(DEFAULT_PAGES)})')
+        parser.add_argument('--user', required=True, help='Username to log in as')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request (no fragment hits)')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        client.force_login(user)
+        self.stdout.write(f"{'page':<32}{'status':>7}{'resp ms':>10}{'p95 ms':>10}{'render ms':>11}{'queries':>9}")
+        for page in options['pages'] or DEFAULT_PAGES:
+            url = page if page.startswith('/') else reverse(page)
+            client.get(url)  # warm the template loader and connection
+            responses, renders, queries = [], [], []
+            with timed_renders(renders):
+                for _ in range(options['iterations']):
+                    if options['cold']:
+                        cache.clear()
+                        client.force_login(user)
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        response = client.get(url)
+                        responses.append(time.perf_counter() - start)
+                    queries.append(len(ctx.captured_queries))
+            p95 = statistics.quantiles(responses, n=20)[-1] if len(responses) > 1 else responses[0]
+            self.stdout.write(
+                f'{url:<32}{response.status_code:>7}{statistics.mean(responses) * 1000:>10.2f}{p95 * 1000:>10.2f}'
+                f'{sum(renders) / len(responses) * 1000:>11.2f}{statistics.mean(queries):>9.1f}'
+            )
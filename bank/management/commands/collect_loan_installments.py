@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from bank.loans import collect_chunk
+from bankx import sharding
+
+
+class Command(BaseCommand):
+    help = 'Debit due loan installments from borrowers\' accounts in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    @sharding.per_shard
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        last_id = paid = missed = 0
+        while True:
+            result = collect_chunk(last_id, options['chunk_size'], today)
+            if result is None:
+                break
+            last_id, chunk_paid, chunk_missed = result
+            paid += chunk_paid
+            missed += chunk_missed
+        self.stdout.write(self.style.SUCCESS(f'Collected {paid} installments ({missed} left due: insufficient funds)'))
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from bank import rebalance
+from bankx import sharding
+
+
+class Command(BaseCommand):
+    help = 'Move customer buckets between shards (by default: spread all buckets evenly over SHARDS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bucket', type=int, action='append', help='Move only this bucket (repeatable)')
+        parser.add_argument('--to', help='Database alias to move the buckets to (default: round-robin over SHARDS)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Customers copied per database transaction')
+        parser.add_argument('--settle', type=float, default=None, help='Seconds to wait between steps (default SHARD_DIRECTORY_TTL + 1)')
+        parser.add_argument('--dry-run', action='store_true', help='Only print the moves')
+
+    def handle(self, *args, **options):
+        buckets, target = options['bucket'], options['to']
+        if target is not None and target not in sharding.databases():
+            raise CommandError(f"Unknown shard '{target}'; choose from {', '.join(sharding.databases())}")
+        if buckets and any(not 0 <= b < sharding.BUCKETS for b in buckets):
+            raise CommandError(f'Buckets are numbered 0 to {sharding.BUCKETS - 1}')
+        settle = options['settle'] if options['settle'] is not None else settings.SHARD_DIRECTORY_TTL + 1
+        if not options['dry_run']:
+            recorded = rebalance.backfill_locators()
+            if recorded:
+                self.stdout.write(f'Recorded {recorded} accounts created while sharding was off')
+        moves = rebalance.plan(buckets, target)
+        if not moves:
+            self.stdout.write(self.style.SUCCESS('Every bucket is already in place'))
+            return
+        users = rebalance.bucket_users()
+        directory = sharding.directory()
+        for b, to in sorted(moves.items()):
+            source = directory.get(b, (DEFAULT_DB_ALIAS, ''))[0]
+            self.stdout.write(f'Bucket {b}: {source} -> {to} ({len(users[b])} customers)')
+            if options['dry_run']:
+                continue
+            started = time.monotonic()
+            counts = rebalance.move_bucket(b, to, users[b], options['chunk_size'], settle)
+            self.stdout.write(f'  copied {sum(counts.values())} rows in {time.monotonic() - started:.1f}s')
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Moved {len(moves)} buckets'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from bank.documents import can_render_pdf, render_preview
+from bank.models import Loan
+from bankx import sharding
+
+
+class Command(BaseCommand):
+    help = 'Render preview thumbnails for uploaded loan documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=200)
+        parser.add_argument('--max-attempts', type=int, default=3, help='Stop retrying a document after this many failed renders')
+
+    @sharding.per_shard
+    def handle(self, *args, **options):
+        pending = (
+            Loan.objects.exclude(document='').exclude(document__isnull=True)
+            .filter(Q(document_preview='') | Q(document_preview__isnull=True))
+            # Documents that keep failing would otherwise fill every batch
+            .filter(document_preview_attempts__lt=options['max_attempts'])
+        )
+        if not can_render_pdf():
+            self.stderr.write('pdftoppm (poppler-utils) not found; PDF previews are skipped.')
+            pending = pending.exclude(document_content_type='application/pdf')
+        pending = pending.order_by('id')[:options['limit']]
+        rendered = skipped = failed = 0
+        for loan in pending.iterator():
+            try:
+                if render_preview(loan):
+                    rendered += 1
+                    continue
+                skipped += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Loan {loan.pk}: {type(exc).__name__}: {exc}')
+            Loan.objects.filter(pk=loan.pk).update(document_preview_attempts=F('document_preview_attempts') + 1)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} previews ({skipped} skipped, {failed} failed)'))
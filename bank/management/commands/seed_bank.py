@@ -0,0 +1,72 @@
+import multiprocessing
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from bank import seeding
+
+
+def _run(args):
+    step, plan, first, last = args
+    return getattr(seeding, step)(plan, first, last)
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic bank (users, accounts, ledger, beneficiaries, schedules, loans) for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--transactions', type=int, default=None, help='Approximate ledger size (default 100 per user)')
+        parser.add_argument('--days', type=int, default=365, help='History window ending today')
+        parser.add_argument('--seed', type=int, default=1, help='Same seed and scale reproduce the same data')
+        parser.add_argument('--password', default='seed-password', help='Password of every generated user')
+        parser.add_argument('--workers', type=int, default=1, help='Processes writing shards in parallel (PostgreSQL)')
+        parser.add_argument('--shard-size', type=int, default=500, help='Users per shard (one database transaction)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT')
+
+    def handle(self, *args, **options):
+        users, workers = options['users'], options['workers']
+        if users < 1 or options['shard_size'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--users, --shard-size and --batch-size must be positive')
+        if User.objects.filter(username=seeding.username(options['seed'], 0)).exists():
+            raise CommandError(f"Seed {options['seed']} is already loaded; use another --seed or a fresh database")
+        if workers > 1 and connection.vendor == 'sqlite':
+            # SQLite has a single writer; parallel shards would only wait on its lock
+            self.stderr.write('SQLite allows one writer at a time; using --workers 1')
+            workers = 1
+        transactions = options['transactions'] if options['transactions'] is not None else users * 100
+
+        started = time.monotonic()
+        plan = seeding.plan(users, transactions, options['seed'], options['days'], options['password'], options['batch_size'])
+        shards = [(lo, min(lo + options['shard_size'], users)) for lo in range(0, users, options['shard_size'])]
+        totals = {}
+        pool = None
+        if workers > 1:
+            # Forked workers must open their own connections
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers)
+        try:
+            # All accounts exist before any shard's ledger refers to them
+            for step in ('seed_users', 'seed_activity'):
+                tasks = [(step, plan, first, last) for first, last in shards]
+                for counts in pool.imap_unordered(_run, tasks) if pool else map(_run, tasks):
+                    self._progress(totals, counts, started)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        seeding.finalize(plan)
+        summary = ', '.join(f'{count} {name}' for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary} in {time.monotonic() - started:.1f}s'))
+        self.stdout.write('Run refresh_spending_insights --rebuild to aggregate the new ledger.')
+
+    def _progress(self, totals: dict, counts: dict, started: float) -> None:
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+        if 'transactions' not in counts:
+            self.stdout.write(f"{totals['users']} users...")
+            return
+        rate = totals['transactions'] / max(time.monotonic() - started, 1e-9)
+        self.stdout.write(f"{totals['transactions']} transactions ({rate:,.0f}/s)...")
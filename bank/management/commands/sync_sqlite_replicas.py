@@ -0,0 +1,39 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bankx.routers import replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the SQLite primary database into each local SQLite replica (BANKX_SQLITE_REPLICAS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep copying, simulating replication lag of --interval seconds')
+        parser.add_argument('--interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        databases = [settings.DATABASES[alias] for alias in ['default', *replicas()]]
+        if not replicas():
+            raise CommandError('No replicas configured; set BANKX_SQLITE_REPLICAS')
+        if any(db['ENGINE'] != 'django.db.backends.sqlite3' for db in databases):
+            raise CommandError('Only SQLite primaries and replicas can be copied; real replicas replicate themselves')
+        while True:
+            started = time.monotonic()
+            source = sqlite3.connect(databases[0]['NAME'])
+            try:
+                for db in databases[1:]:
+                    target = sqlite3.connect(db['NAME'])
+                    try:
+                        # Online backup: a consistent snapshot even while the primary is being written
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+            self.stdout.write(f'Copied primary to {", ".join(replicas())} in {time.monotonic() - started:.2f}s')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:36
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0002_loan_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='account',
+            field=models.ForeignKey(blank=True, help_text='Disbursement and repayment account', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loans', to='bank.account'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='annual_rate',
+            field=models.DecimalField(decimal_places=2, default=Decimal('10.00'), max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='disbursed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='term_months',
+            field=models.PositiveSmallIntegerField(choices=[(6, '6 months'), (12, '12 months'), (24, '24 months'), (36, '36 months'), (60, '60 months')], default=12),
+        ),
+        migrations.AlterField(
+            model_name='loan',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('closed', 'Repaid')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='LoanInstallment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveSmallIntegerField()),
+                ('due_date', models.DateField()),
+                ('principal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('interest', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('due', 'Due'), ('paid', 'Paid')], default='due', max_length=10)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='bank.loan')),
+            ],
+            options={
+                'ordering': ['loan', 'sequence'],
+                'indexes': [models.Index(fields=['status', 'due_date'], name='bank_loanin_status_c9e66d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('loan', 'sequence'), name='unique_loan_installment')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0003_loan_account_loan_annual_rate_loan_disbursed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='document_content_type',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='document_preview',
+            field=models.ImageField(blank=True, null=True, upload_to='loan_previews/'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='document_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='document_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
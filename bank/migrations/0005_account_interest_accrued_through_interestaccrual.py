@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0004_loan_document_content_type_loan_document_preview_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='interest_accrued_through',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='InterestAccrual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount', models.DecimalField(decimal_places=6, max_digits=14)),
+                ('posted', models.BooleanField(default=False)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interest_accruals', to='bank.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['posted', 'account'], name='bank_intere_posted_dfe055_idx')],
+                'constraints': [models.UniqueConstraint(fields=('account', 'date'), name='unique_interest_accrual')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0005_account_interest_accrued_through_interestaccrual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['created_at'], name='bank_accoun_created_47ff1a_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import migrations, models
+
+
+def backfill_locators(apps, schema_editor):
+    # Locators are global and only kept on default
+    if schema_editor.connection.alias != 'default':
+        return
+    Account = apps.get_model('bank', 'Account')
+    AccountLocator = apps.get_model('bank', 'AccountLocator')
+    rows = Account.objects.using('default').values_list('pk', 'account_number', 'user_id').order_by('pk')
+    AccountLocator.objects.using('default').bulk_create(
+        [AccountLocator(pk=pk, account_number=number, user_id=user_id) for pk, number, user_id in rows.iterator()],
+        batch_size=1000,
+    )
+    # New accounts take their ids from the locator sequence from now on
+    for sql in schema_editor.connection.ops.sequence_reset_sql(no_style(), [AccountLocator]):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0006_account_bank_accoun_created_47ff1a_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardBucket',
+            fields=[
+                ('bucket', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('alias', models.CharField(max_length=50)),
+                ('moving_to', models.CharField(blank=True, help_text='Set while rebalance_shards moves the bucket; its writes are refused meanwhile', max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AccountLocator',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_number', models.CharField(max_length=20, unique=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_locators, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0007_shardbucket_accountlocator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='document_preview_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, router
 from django.contrib.auth.models import User
-from django.utils import timezone
 from decimal import Decimal
 
+from bankx import sharding
+
 
 class Account(models.Model):
     TYPE_SAVINGS = 'savings'
@@ -19,44 +20,126 @@ class Account(models.Model):
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     last_interest_applied = models.DateField(blank=True, null=True)
+    # Last day whose closing balance has an InterestAccrual row (see bank/interest.py)
+    interest_accrued_through = models.DateField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at'])]
 
     def __str__(self) -> str:
         return f"{self.account_number} ({self.get_account_type_display()})"
 
-    def accrue_monthly_interest(self) -> Decimal:
-        if self.account_type != self.TYPE_SAVINGS or self.interest_rate <= 0:
-            return Decimal('0.00')
+    def save(self, *args, **kwargs):
+        if not (sharding.shards() and self._state.adding and self.pk is None):
+            return super().save(*args, **kwargs)
+        # Ids come from the global locator so they stay unique across shards
+        using = kwargs.get('using') or router.db_for_write(Account, instance=self)
+        locator = AccountLocator.objects.using(DEFAULT_DB_ALIAS).create(account_number=self.account_number, user_id=self.user_id)
+        self.pk = locator.pk
+        try:
+            sharding.replicate_users([self.user_id], using)
+            super().save(*args, **{**kwargs, 'force_insert': True})
+        except Exception:
+            # The locator is not part of the shard's transaction
+            self.pk = None
+            locator.delete()
+            raise
+
 
-        today = timezone.now().date()
-        if self.last_interest_applied and self.last_interest_applied.month == today.month and self.last_interest_applied.year == today.year:
-            return Decimal('0.00')
+class InterestAccrual(models.Model):
+    """Interest earned on one account's closing balance for one day, posted monthly."""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='interest_accruals')
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = models.DecimalField(max_digits=14, decimal_places=6)
+    posted = models.BooleanField(default=False)
 
-        interest = (self.balance * self.interest_rate) / Decimal('1200')
-        self.balance += interest
-        self.last_interest_applied = today
-        self.save(update_fields=['balance', 'last_interest_applied'])
-        return interest
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['account', 'date'], name='unique_interest_accrual')]
+        indexes = [models.Index(fields=['posted', 'account'])]
+
+    def __str__(self) -> str:
+        return f"Interest {self.amount} on {self.account_id} for {self.date}"
 
 
 class Loan(models.Model):
     STATUS_PENDING = 'pending'
     STATUS_APPROVED = 'approved'
     STATUS_REJECTED = 'rejected'
+    STATUS_CLOSED = 'closed'
     STATUS_CHOICES = [
         (STATUS_PENDING, 'Pending'),
         (STATUS_APPROVED, 'Approved'),
         (STATUS_REJECTED, 'Rejected'),
+        (STATUS_CLOSED, 'Repaid'),
     ]
+    TERM_CHOICES = [(6, '6 months'), (12, '12 months'), (24, '24 months'), (36, '36 months'), (60, '60 months')]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='loans')
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     purpose = models.TextField()
     document = models.FileField(upload_to='loan_docs/', null=True, blank=True)
+    document_sha256 = models.CharField(max_length=64, blank=True)
+    document_size = models.PositiveBigIntegerField(null=True, blank=True)
+    document_content_type = models.CharField(max_length=50, blank=True)
+    document_preview = models.ImageField(upload_to='loan_previews/', null=True, blank=True)
+    # Failed or unsupported renders by `manage.py render_loan_previews`, which gives up after --max-attempts
+    document_preview_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    term_months = models.PositiveSmallIntegerField(choices=TERM_CHOICES, default=12)
+    annual_rate = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('10.00'))
+    account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='loans', help_text='Disbursement and repayment account')
+    disbursed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return f"Loan({self.user.username}, {self.amount}, {self.status})"
 
-# Create your models here.
+
+class LoanInstallment(models.Model):
+    STATUS_DUE = 'due'
+    STATUS_PAID = 'paid'
+    STATUS_CHOICES = [
+        (STATUS_DUE, 'Due'),
+        (STATUS_PAID, 'Paid'),
+    ]
+
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='installments')
+    sequence = models.PositiveSmallIntegerField()
+    due_date = models.DateField()
+    principal = models.DecimalField(max_digits=12, decimal_places=2)
+    interest = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_DUE)
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['loan', 'sequence']
+        constraints = [models.UniqueConstraint(fields=['loan', 'sequence'], name='unique_loan_installment')]
+        indexes = [models.Index(fields=['status', 'due_date'])]
+
+    def __str__(self) -> str:
+        return f"Installment {self.sequence} of loan {self.loan_id}: {self.amount} due {self.due_date}"
+
+
+class ShardBucket(models.Model):
+    """Database holding the customers of one placement bucket (see bankx/sharding.py). No row: ``default``."""
+    bucket = models.PositiveSmallIntegerField(primary_key=True)
+    alias = models.CharField(max_length=50)
+    moving_to = models.CharField(max_length=50, blank=True, help_text='Set while rebalance_shards moves the bucket; its writes are refused meanwhile')
+
+    def __str__(self) -> str:
+        return f"Bucket {self.bucket} on {self.alias}{f' (moving to {self.moving_to})' if self.moving_to else ''}"
+
+
+class AccountLocator(models.Model):
+    """Global id, number and owner of every account, whichever shard holds it.
+
+    Kept on ``default``. Account ids are allocated here so they stay unique across shards.
+    """
+    account_number = models.CharField(max_length=20, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    def __str__(self) -> str:
+        return f"{self.account_number} -> user {self.user_id}"
@@ -0,0 +1,175 @@
+"""Moving placement buckets between shards, run by ``manage.py rebalance_shards``.
+
+A move goes through the directory in steps. Each step waits ``settle`` seconds
+(longer than ``SHARD_DIRECTORY_TTL``) so that every process has reloaded the
+directory before the next one:
+
+1. Mark the bucket ``moving_to`` the target. Writes for its customers now fail
+   with ``BucketMoving`` (a 503 asking to retry), and background jobs skip both
+   databases.
+2. Copy the customers' rows to the target in chunks, parents first. Accounts
+   keep their global ids; other rows get new ids on the target, and foreign
+   keys between them are remapped.
+3. Point the bucket at the target. Reads follow at once; writes stay refused.
+4. Delete the customers' rows everywhere except the target, then clear
+   ``moving_to``.
+
+Every step can be re-run. A chunk is cleared from the target before it is
+copied, so a move interrupted at any point is finished by running the command
+again.
+
+Spending aggregates are not copied: the target's next ``refresh_spending_insights``
+folds the moved ledger rows in, and moved archive rows are folded right away.
+"""
+import time
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction as db_transaction
+
+from bankx import sharding
+from transactions import insights
+from transactions.models import (
+    AccountCarryForward,
+    ArchivedTransaction,
+    Beneficiary,
+    Budget,
+    MerchantSpending,
+    MonthlySpending,
+    OutboxEvent,
+    RiskDecision,
+    ScheduledTransfer,
+    Transaction,
+    TransferSaga,
+)
+from .models import Account, AccountLocator, InterestAccrual, Loan, LoanInstallment, ShardBucket
+from .seeding import explicit_timestamps
+
+# Sharded tables in copy order (parents first), with the lookup to the owner's user id
+PLACEMENT = (
+    (Account, 'user_id'),
+    (InterestAccrual, 'account__user_id'),
+    (Loan, 'user_id'),
+    (LoanInstallment, 'loan__user_id'),
+    (Transaction, 'user_id'),
+    (TransferSaga, 'debit__user_id'),
+    (ArchivedTransaction, 'user_id'),
+    (AccountCarryForward, 'account__user_id'),
+    (RiskDecision, 'account__user_id'),
+    (Beneficiary, 'user_id'),
+    (ScheduledTransfer, 'user_id'),
+    (Budget, 'user_id'),
+    (OutboxEvent, 'user_id'),
+)
+# Rebuilt on the target from the moved ledger instead of copied
+AGGREGATES = ((MonthlySpending, 'user_id'), (MerchantSpending, 'user_id'))
+BATCH_SIZE = 1000
+
+
+def backfill_locators() -> int:
+    """Give accounts created while sharding was off their locators; returns how many."""
+    rows = (
+        Account.objects.using(DEFAULT_DB_ALIAS).exclude(pk__in=AccountLocator.objects.using(DEFAULT_DB_ALIAS).values('pk'))
+        .values_list('pk', 'account_number', 'user_id').order_by('pk')
+    )
+    missing = [AccountLocator(pk=pk, account_number=number, user_id=user_id) for pk, number, user_id in rows]
+    if missing:
+        connection = connections[DEFAULT_DB_ALIAS]
+        with db_transaction.atomic(using=DEFAULT_DB_ALIAS), connection.cursor() as cursor:
+            AccountLocator.objects.using(DEFAULT_DB_ALIAS).bulk_create(missing, batch_size=BATCH_SIZE)
+            # New accounts take their ids from the locator sequence
+            for sql in connection.ops.sequence_reset_sql(no_style(), [AccountLocator]):
+                cursor.execute(sql)
+    return len(missing)
+
+
+def plan(buckets=None, target: str = None) -> dict:
+    """``{bucket: target}`` for buckets not already there. By default buckets are spread round-robin over SHARDS."""
+    shards = sharding.shards()
+    current = sharding.directory(refresh=True)
+    if buckets is None:
+        buckets = range(sharding.BUCKETS)
+    moves = {}
+    for b in buckets:
+        to = target or (shards[b % len(shards)] if shards else DEFAULT_DB_ALIAS)
+        alias, moving_to = current.get(b, (DEFAULT_DB_ALIAS, ''))
+        if alias != to or moving_to:
+            moves[b] = to
+    return moves
+
+
+def bucket_users() -> dict:
+    users = defaultdict(list)
+    for pk in User.objects.using(DEFAULT_DB_ALIAS).order_by('pk').values_list('pk', flat=True).iterator():
+        users[sharding.bucket(pk)].append(pk)
+    return users
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _delete(user_ids: list, alias: str) -> None:
+    # Raw deletes, children first: no signals and no ORM cascades, which would
+    # also null other customers' references to the moved accounts
+    for model, owner in reversed(PLACEMENT + AGGREGATES):
+        model.objects.using(alias).filter(**{f'{owner}__in': user_ids})._raw_delete(alias)
+
+
+def _copy(user_ids: list, source: str, target: str) -> dict:
+    """Copy the customers' rows; returns ``{model label: rows}``."""
+    sharding.replicate_users(user_ids, target)
+    new_ids, counts = {}, {}
+    for model, owner in PLACEMENT:
+        rows = list(model.objects.using(source).filter(**{f'{owner}__in': user_ids}).order_by('pk'))
+        old = [row.pk for row in rows]
+        for row in rows:
+            for field in model._meta.concrete_fields:
+                if field.is_relation and field.related_model in new_ids:
+                    setattr(row, field.attname, new_ids[field.related_model][getattr(row, field.attname)])
+            if model is not Account:
+                row.pk = None
+        model.objects.using(target).bulk_create(rows, batch_size=BATCH_SIZE)
+        if model is not Account:
+            new_ids[model] = dict(zip(old, (row.pk for row in rows)))
+        counts[model._meta.label] = len(rows)
+    moved = list(new_ids[ArchivedTransaction].values())
+    if moved:
+        with sharding.using(target):
+            insights.fold_range(ArchivedTransaction, min(moved) - 1, max(moved))
+    return counts
+
+
+def _set(b: int, **fields) -> None:
+    ShardBucket.objects.using(DEFAULT_DB_ALIAS).update_or_create(bucket=b, defaults=fields)
+
+
+def move_bucket(b: int, target: str, users: list, chunk_size: int, settle: float) -> dict:
+    """Move bucket ``b`` and its ``users`` onto ``target``; returns rows copied per model."""
+    alias, moving_to = sharding.directory(refresh=True).get(b, (DEFAULT_DB_ALIAS, ''))
+    if moving_to and moving_to not in (alias, target):
+        # An interrupted move to somewhere else: drop its partial copy
+        for chunk in _chunks(users, chunk_size):
+            with db_transaction.atomic(using=moving_to):
+                _delete(chunk, moving_to)
+    counts = defaultdict(int)
+    if alias != target:
+        _set(b, alias=alias, moving_to=target)
+        time.sleep(settle)
+        with explicit_timestamps(*[model for model, _ in PLACEMENT]):
+            for chunk in _chunks(users, chunk_size):
+                with db_transaction.atomic(using=target):
+                    _delete(chunk, target)
+                    for label, rows in _copy(chunk, alias, target).items():
+                        counts[label] += rows
+        _set(b, alias=target, moving_to=target)
+        time.sleep(settle)
+    for other in sharding.databases():
+        if other != target:
+            for chunk in _chunks(users, chunk_size):
+                with db_transaction.atomic(using=other):
+                    _delete(chunk, other)
+    _set(b, alias=target, moving_to='')
+    return dict(counts)
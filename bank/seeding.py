@@ -0,0 +1,423 @@
+"""Deterministic synthetic bank data for scale testing, written by ``manage.py seed_bank``.
+
+User ``n`` of a run (0-based) gets primary key ``user_base + n`` and accounts
+``account_base + n * MAX_ACCOUNTS + k``. The primary account is ``k = 0``.
+Everything about that user is drawn from a ``random.Random`` seeded with
+``(seed, n)``: accounts, ledger, beneficiaries, schedules and loans. Any user's
+primary account and name can be derived without touching the database. So the
+data does not depend on how users are split into shards or how many processes
+write them.
+
+Rows go in with ``bulk_create`` in batches and bypass model signals and the
+outbox, so account locators are written here too. Account balances are set from
+the ledger by :func:`finalize` once every shard is written. Everything is
+written to ``default``; ``manage.py rebalance_shards`` then spreads the
+customers over the ``SHARDS`` databases.
+"""
+import math
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction as db_transaction
+from django.db.models import DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from bank.loans import add_months, build_schedules
+from bank.models import Account, AccountLocator, Loan, LoanInstallment
+from transactions import recurrence
+from transactions.models import Beneficiary, ScheduledTransfer, Transaction
+from users.models import UserProfile
+from users.passwords import hash_passwords
+
+MAX_ACCOUNTS = 3
+# Distinct salted hashes of the shared password, reused round-robin
+PASSWORD_VARIANTS = 16
+BALANCE_CHUNK = 10000
+ZERO = Decimal('0.00')
+MAX_AMOUNT = Decimal('9999999.99')
+
+FIRST_NAMES = (
+    'Amara', 'Ben', 'Chen', 'Dana', 'Elif', 'Farid', 'Grace', 'Hugo', 'Ines', 'Jonas', 'Kofi', 'Lena',
+    'Mateo', 'Nadia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sven', 'Tara', 'Umar', 'Vera', 'Wei', 'Yusuf',
+)
+LAST_NAMES = (
+    'Adeyemi', 'Bauer', 'Costa', 'Dubois', 'Evans', 'Fischer', 'Garcia', 'Haddad', 'Ivanova', 'Jensen',
+    'Kim', 'Larsen', 'Moreau', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Silva', 'Tanaka', 'Weber',
+)
+MERCHANTS = {
+    Transaction.CATEGORY_SHOPPING: ('Grocer Mart', 'Corner Cafe', 'BookBarn', 'Style Outlet', 'TechHub', 'Pharmacy Plus', 'Fresh Market'),
+    Transaction.CATEGORY_BILLS: ('City Power', 'Metro Water', 'FiberNet', 'Mobile One', 'Home Insurance'),
+    Transaction.CATEGORY_OTHER: ('ATM withdrawal', 'Gym Club', 'Cinema', 'City Taxi', 'Charity Fund'),
+}
+# Everyday activity besides salary, schedules and loans:
+# (weight, transaction type, category, median amount, lognormal sigma)
+ACTIVITY = (
+    (45, Transaction.TYPE_WITHDRAW, Transaction.CATEGORY_SHOPPING, 35, 0.9),
+    (12, Transaction.TYPE_WITHDRAW, Transaction.CATEGORY_BILLS, 90, 0.6),
+    (15, Transaction.TYPE_WITHDRAW, Transaction.CATEGORY_OTHER, 50, 1.0),
+    (18, Transaction.TYPE_TRANSFER, Transaction.CATEGORY_OTHER, 120, 1.1),
+    (10, Transaction.TYPE_DEPOSIT, Transaction.CATEGORY_OTHER, 150, 1.0),
+)
+ACTIVITY_WEIGHTS = [row[0] for row in ACTIVITY]
+# Card and transfer activity by hour of day
+HOUR_WEIGHTS = (1, 1, 1, 1, 1, 2, 4, 7, 9, 9, 9, 10, 12, 11, 9, 9, 10, 11, 12, 11, 9, 6, 4, 2)
+LOAN_STATUS_WEIGHTS = ((Loan.STATUS_PENDING, 3), (Loan.STATUS_REJECTED, 2), (Loan.STATUS_APPROVED, 5))
+
+
+def plan(users: int, transactions: int, seed: int, days: int, password: str, batch_size: int) -> dict:
+    """Everything a shard worker needs. Picklable, so it can be sent to other processes."""
+    end = timezone.now().astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    last_user = User.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    # Account ids are global (see bankx/sharding.py), so the locator holds the highest one
+    last_account = max(
+        AccountLocator.objects.order_by('-pk').values_list('pk', flat=True).first() or 0,
+        Account.objects.order_by('-pk').values_list('pk', flat=True).first() or 0,
+    )
+    return {
+        'seed': seed,
+        'users': users,
+        'per_user': transactions / users if users else 0,
+        'start': end - timedelta(days=days),
+        'end': end,
+        'user_base': last_user + 1,
+        'account_base': last_account + 1,
+        'password_hashes': hash_passwords([password] * min(users, PASSWORD_VARIANTS)),
+        'batch_size': batch_size,
+    }
+
+
+def username(seed: int, n: int) -> str:
+    return f'seed{seed}_{n}'
+
+
+def full_name(seed: int, n: int) -> tuple:
+    rng = random.Random(f'{seed}:{n}:name')
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def account_id(p: dict, n: int, k: int = 0) -> int:
+    return p['account_base'] + n * MAX_ACCOUNTS + k
+
+
+def account_number(pk: int) -> str:
+    # 14 digits, so never equal to the 12-digit numbers the app generates
+    return f'7{pk:013d}'
+
+
+def _amount(rng: random.Random, median: float, sigma: float) -> Decimal:
+    value = Decimal(f'{rng.lognormvariate(math.log(median), sigma):.2f}')
+    return min(max(value, Decimal('1.00')), MAX_AMOUNT)
+
+
+def _moment(rng: random.Random, start: datetime, end: datetime) -> datetime:
+    day = start + timedelta(days=rng.randrange(max((end - start).days, 1)))
+    when = day + timedelta(hours=rng.choices(range(24), HOUR_WEIGHTS)[0], seconds=rng.randrange(3600))
+    return min(when, end - timedelta(seconds=1))
+
+
+def _other_user(rng: random.Random, p: dict, n: int) -> int:
+    if p['users'] < 2:
+        return n
+    j = rng.randrange(p['users'] - 1)
+    return j + 1 if j >= n else j
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let ``bulk_create`` keep the ``created_at``/``updated_at`` values set on the objects."""
+    fields = [
+        f for model in models for f in model._meta.concrete_fields
+        if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)
+    ]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _user(p: dict, n: int, rng: random.Random):
+    first, last = full_name(p['seed'], n)
+    joined = p['start'] - timedelta(days=1 + rng.randrange(3 * 365), seconds=rng.randrange(86400))
+    user = User(
+        pk=p['user_base'] + n,
+        username=username(p['seed'], n),
+        email=f'{first}.{last}.{n}@example.com'.lower(),
+        first_name=first,
+        last_name=last,
+        password=p['password_hashes'][n % len(p['password_hashes'])],
+        date_joined=joined,
+    )
+    accounts = [Account(
+        pk=account_id(p, n), user=user, account_number=account_number(account_id(p, n)),
+        account_type=Account.TYPE_SAVINGS, interest_rate=Decimal('2.50'), created_at=joined,
+    )]
+    if rng.random() < 0.6:
+        accounts.append(Account(
+            pk=account_id(p, n, 1), user=user, account_number=account_number(account_id(p, n, 1)),
+            account_type=Account.TYPE_CURRENT, created_at=joined + (p['start'] - joined) * rng.random(),
+        ))
+    if rng.random() < 0.15:
+        accounts.append(Account(
+            pk=account_id(p, n, 2), user=user, account_number=account_number(account_id(p, n, 2)),
+            account_type=Account.TYPE_SAVINGS, interest_rate=Decimal('3.00'), created_at=joined + (p['start'] - joined) * rng.random(),
+        ))
+    return user, accounts
+
+
+def _spending_account(accounts: list) -> Account:
+    """Salary comes in and card spending goes out through the current account, if there is one."""
+    return next((a for a in accounts if a.account_type == Account.TYPE_CURRENT), accounts[0])
+
+
+def _beneficiaries(p: dict, n: int, user, rng: random.Random) -> list:
+    rows = []
+    for j in {_other_user(rng, p, n) for _ in range(rng.choices(range(7), (20, 25, 20, 15, 10, 6, 4))[0])} - {n}:
+        first, last = full_name(p['seed'], j)
+        rows.append(Beneficiary(
+            user=user,
+            name=f'{first} {last}',
+            nickname=first if rng.random() < 0.5 else '',
+            account_number=account_number(account_id(p, j)),
+            email=f'{first}.{last}.{j}@example.com'.lower(),
+            created_at=p['start'] - timedelta(days=rng.randrange(30)),
+        ))
+    return rows
+
+
+def _schedules(p: dict, user, spending, beneficiaries: list, rng: random.Random) -> list:
+    if rng.random() >= 0.15:
+        return []
+    payee = rng.choice(beneficiaries) if beneficiaries else None
+    if payee is None:
+        j = _other_user(rng, p, user.pk - p['user_base'])
+        payee_number = account_number(account_id(p, j))
+    else:
+        payee_number = payee.account_number
+    start = p['start'] + timedelta(days=rng.randrange(28), hours=9)
+    s = ScheduledTransfer(
+        user=user,
+        from_account=spending,
+        to_identifier=payee_number,
+        amount=_amount(rng, 800, 0.4),
+        category=Transaction.CATEGORY_BILLS,
+        description=rng.choice(('Rent', 'Savings', 'Allowance', 'Loan to family')),
+        frequency=ScheduledTransfer.FREQ_MONTHLY,
+        start_at=start,
+        next_run=start,
+        month_day=start.day,
+        business_day=rng.choice((ScheduledTransfer.ADJUST_NONE, ScheduledTransfer.ADJUST_FOLLOWING)),
+        created_at=start - timedelta(days=1),
+    )
+    following = recurrence.first_after(s, p['end'])
+    s.occurrence_index, s.next_run = following
+    s.last_run = recurrence.occurrence(s, following[0] - 1)
+    return [s]
+
+
+def _loans(p: dict, user, primary: Account, rng: random.Random) -> list:
+    if rng.random() >= 0.04:
+        return []
+    status = rng.choices([s for s, _ in LOAN_STATUS_WEIGHTS], [w for _, w in LOAN_STATUS_WEIGHTS])[0]
+    requested = _moment(rng, p['start'], p['start'] + (p['end'] - p['start']) * 2 / 3)
+    loan = Loan(
+        user=user,
+        amount=max(Decimal(100), (_amount(rng, 5000, 0.8) / 100).quantize(Decimal(1)) * 100),
+        purpose=rng.choice(('Car repair', 'Home improvement', 'Education', 'Medical bills', 'Small business')),
+        status=status,
+        term_months=rng.choice([term for term, _ in Loan.TERM_CHOICES]),
+        created_at=requested,
+        updated_at=requested,
+    )
+    if status == Loan.STATUS_APPROVED:
+        loan.account = primary
+        loan.disbursed_at = loan.updated_at = requested + timedelta(days=1 + rng.randrange(5))
+    return [loan]
+
+
+def _ledger(p: dict, n: int, user, accounts: list, beneficiaries: list, schedules: list, loans: list, rng: random.Random) -> tuple:
+    """The user's transactions in time order, and the loan installments they paid.
+
+    Debits that the account's running balance cannot cover are dropped, as the
+    app would refuse them. Incoming transfers from other users are not counted,
+    so balances only end up higher than this walk assumes.
+    """
+    primary, spending = accounts[0], _spending_account(accounts)
+    events = []  # (when, account, type, category, amount, description, related account id, installment)
+
+    salary, payday = _amount(rng, 2800, 0.5), 1 + rng.randrange(28)
+    month = p['start'].replace(day=1)
+    while month < p['end']:
+        when = month.replace(day=payday, hour=6)
+        if p['start'] <= when < p['end']:
+            events.append((when, spending, Transaction.TYPE_DEPOSIT, Transaction.CATEGORY_SALARY, salary, 'Salary', None, None))
+        month = (month + timedelta(days=32)).replace(day=1)
+
+    for s in schedules:
+        for _, when in recurrence.occurrences(s, 0, until=p['end'] - timedelta(seconds=1)):
+            related = int(s.to_identifier[1:])
+            events.append((when, spending, Transaction.TYPE_TRANSFER, s.category, s.amount, f'Scheduled: {s.description}', related, None))
+
+    installments = []
+    for loan in loans:
+        if loan.disbursed_at is None:
+            continue
+        events.append((loan.disbursed_at, primary, Transaction.TYPE_DEPOSIT, Transaction.CATEGORY_OTHER, loan.amount, f'Loan #{loan.pk} disbursement', None, None))
+        first_due = add_months(loan.disbursed_at.date(), 1)
+        for installment in build_schedules([loan], first_due):
+            installments.append(installment)
+            when = datetime.combine(installment.due_date, time(8), tzinfo=dt_timezone.utc)
+            if when < p['end']:
+                description = f'Loan #{loan.pk} installment {installment.sequence}'
+                events.append((when, primary, Transaction.TYPE_WITHDRAW, Transaction.CATEGORY_BILLS, installment.amount, description, None, installment))
+
+    # Heavy-tailed activity: most users are light, a few are very busy
+    target = round(rng.lognormvariate(math.log(p['per_user']) - 0.5, 1.0)) if p['per_user'] else 0
+    for _ in range(max(0, target - len(events))):
+        _, kind, category, median, sigma = rng.choices(ACTIVITY, ACTIVITY_WEIGHTS)[0]
+        when, amount = _moment(rng, p['start'], p['end']), _amount(rng, median, sigma)
+        if kind == Transaction.TYPE_TRANSFER:
+            if beneficiaries and rng.random() < 0.7:
+                payee = rng.choice(beneficiaries)
+                related, name = int(payee.account_number[1:]), payee.nickname or payee.name
+            else:
+                j = _other_user(rng, p, n)
+                related, name = account_id(p, j), ' '.join(full_name(p['seed'], j))
+            if related == spending.pk:
+                continue
+            events.append((when, spending, kind, category, amount, f'Transfer to {name}', related, None))
+        elif kind == Transaction.TYPE_WITHDRAW:
+            merchant = rng.choice(MERCHANTS[category])
+            reference = f' #{rng.randrange(10000, 99999)}' if rng.random() < 0.3 else ''
+            events.append((when, spending, kind, category, amount, f'{merchant}{reference}', None, None))
+        else:
+            account = rng.choice(accounts)
+            events.append((when, account, kind, category, amount, rng.choice(('Cash deposit', 'Refund', 'Gift')), None, None))
+
+    events.sort(key=lambda e: e[0])
+    balances = dict.fromkeys((a.pk for a in accounts), ZERO)
+    missed_loans, rows = set(), []
+    for i, (when, account, kind, category, amount, description, related, installment) in enumerate(events):
+        if kind != Transaction.TYPE_DEPOSIT:
+            if installment is not None and installment.loan.pk in missed_loans:
+                continue
+            if balances[account.pk] < amount:
+                if installment is not None:
+                    # Later installments of the loan wait, as in collect_chunk
+                    missed_loans.add(installment.loan.pk)
+                continue
+            balances[account.pk] -= amount
+        else:
+            balances[account.pk] += amount
+        if installment is not None:
+            installment.status, installment.paid_at = LoanInstallment.STATUS_PAID, when
+        rows.append(Transaction(
+            user=user,
+            account=account,
+            related_account_id=related,
+            transaction_type=kind,
+            category=category,
+            amount=amount,
+            description=description,
+            created_at=when,
+            nonce=f"seed-{p['seed']}-{n}-{i}",
+        ))
+    for loan in loans:
+        if loan.disbursed_at and all(i.status == LoanInstallment.STATUS_PAID for i in installments if i.loan is loan):
+            loan.status = Loan.STATUS_CLOSED
+    return rows, installments
+
+
+def _people(p: dict, first: int, last: int) -> list:
+    """``(n, rng, user, accounts)`` for users ``first`` to ``last - 1``; ``rng`` continues after the accounts."""
+    people = []
+    for n in range(first, last):
+        rng = random.Random(f"{p['seed']}:{n}")
+        people.append((n, rng, *_user(p, n, rng)))
+    return people
+
+
+def seed_users(p: dict, first: int, last: int) -> dict:
+    """Write users ``first`` to ``last - 1`` of the plan with their profiles and accounts.
+
+    Every shard must have gone through this before :func:`seed_activity` runs,
+    because transfers and beneficiaries point at accounts in other shards.
+    """
+    people = _people(p, first, last)
+    with explicit_timestamps(Account), db_transaction.atomic():
+        User.objects.bulk_create([person[2] for person in people], batch_size=p['batch_size'])
+        UserProfile.objects.bulk_create([UserProfile(user=person[2]) for person in people], batch_size=p['batch_size'])
+        accounts = [a for person in people for a in person[3]]
+        AccountLocator.objects.bulk_create(
+            [AccountLocator(pk=a.pk, account_number=a.account_number, user=a.user) for a in accounts], batch_size=p['batch_size'],
+        )
+        Account.objects.bulk_create(accounts, batch_size=p['batch_size'])
+    return {'users': len(people), 'accounts': sum(len(person[3]) for person in people)}
+
+
+def seed_activity(p: dict, first: int, last: int) -> dict:
+    """Write the beneficiaries, schedules, loans and ledger of users ``first`` to ``last - 1``."""
+    people = _people(p, first, last)
+    counts = dict.fromkeys(['beneficiaries', 'schedules', 'loans', 'installments', 'transactions'], 0)
+    with explicit_timestamps(Transaction, Beneficiary, ScheduledTransfer, Loan), db_transaction.atomic():
+        plans = []
+        for n, rng, user, accounts in people:
+            beneficiaries = _beneficiaries(p, n, user, rng)
+            schedules = _schedules(p, user, _spending_account(accounts), beneficiaries, rng)
+            plans.append((beneficiaries, schedules, _loans(p, user, accounts[0], rng)))
+        Beneficiary.objects.bulk_create([b for row in plans for b in row[0]], batch_size=p['batch_size'])
+        ScheduledTransfer.objects.bulk_create([s for row in plans for s in row[1]], batch_size=p['batch_size'])
+        # Loan ids are needed for the disbursement and installment descriptions
+        Loan.objects.bulk_create([loan for row in plans for loan in row[2]], batch_size=p['batch_size'])
+
+        rows, installments, closed = [], [], []
+        for (n, rng, user, accounts), (beneficiaries, schedules, loans) in zip(people, plans):
+            ledger, scheduled = _ledger(p, n, user, accounts, beneficiaries, schedules, loans, rng)
+            rows.extend(ledger)
+            counts['transactions'] += len(ledger)
+            installments.extend(scheduled)
+            closed.extend(loan.pk for loan in loans if loan.status == Loan.STATUS_CLOSED)
+            if len(rows) >= p['batch_size']:
+                Transaction.objects.bulk_create(rows, batch_size=p['batch_size'])
+                rows = []
+        Transaction.objects.bulk_create(rows, batch_size=p['batch_size'])
+        LoanInstallment.objects.bulk_create(installments, batch_size=p['batch_size'])
+        Loan.objects.filter(pk__in=closed).update(status=Loan.STATUS_CLOSED)
+
+    counts.update(
+        beneficiaries=sum(len(row[0]) for row in plans),
+        schedules=sum(len(row[1]) for row in plans),
+        loans=sum(len(row[2]) for row in plans),
+        installments=len(installments),
+    )
+    return counts
+
+
+def finalize(p: dict) -> None:
+    """Set seeded balances from the ledger and move id sequences past the explicit keys."""
+    money = DecimalField(max_digits=14, decimal_places=2)
+
+    def total(condition: Q, field: str = 'account'):
+        rows = Transaction.objects.filter(condition, **{field: OuterRef('pk')}).values(field).annotate(total=Sum('amount')).values('total')
+        return Coalesce(Subquery(rows, output_field=money), Value(ZERO), output_field=money)
+
+    last = account_id(p, p['users'])
+    for lo in range(p['account_base'], last, BALANCE_CHUNK):
+        Account.objects.filter(pk__gte=lo, pk__lt=min(lo + BALANCE_CHUNK, last)).update(balance=(
+            total(Q(transaction_type=Transaction.TYPE_DEPOSIT))
+            - total(~Q(transaction_type=Transaction.TYPE_DEPOSIT))
+            + total(Q(transaction_type=Transaction.TYPE_TRANSFER), 'related_account')
+        ))
+    statements = connection.ops.sequence_reset_sql(no_style(), [User, Account, AccountLocator])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bankx import sharding
+from transactions.models import ScheduledTransfer
+from .caching import FORECAST, bump_user_version
+from .models import Account, AccountLocator
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def account_changed(sender, instance: Account, **kwargs):
+    bump_user_version(FORECAST, instance.user_id)
+
+
+@receiver(post_delete, sender=Account)
+def release_account_number(sender, instance: Account, **kwargs):
+    AccountLocator.objects.filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=User)
+def replicate_user(sender, instance: User, raw: bool, using: str, **kwargs):
+    # Keep the copy on the customer's shard current
+    if sharding.shards() and using == DEFAULT_DB_ALIAS and not raw:
+        sharding.replicate_users([instance.pk], sharding.shard_for_user(instance.pk))
+
+
+@receiver(post_save, sender=ScheduledTransfer)
+@receiver(post_delete, sender=ScheduledTransfer)
+def schedule_changed(sender, instance: ScheduledTransfer, **kwargs):
+    from transactions.services import resolve_recipient
+    recipient = resolve_recipient(instance.to_identifier)
+    bump_user_version(FORECAST, instance.user_id, recipient.user_id if recipient else None)
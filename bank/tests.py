@@ -1,3 +1,82 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .loans import collect_chunk, disburse_loans
+from .models import Account, Loan, LoanInstallment
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='bankx-test-media-')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class LoanServicingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('borrower', password='pw')
+        self.account = Account.objects.get(user=self.user)
+        self.loan = Loan.objects.create(user=self.user, amount=Decimal('600.00'), purpose='car', term_months=6, annual_rate=0)
+
+    def balance(self) -> Decimal:
+        return Account.objects.get(pk=self.account.pk).balance
+
+    def collect_all(self, chunk_size=2):
+        after_id, totals = 0, [0, 0]
+        # Far enough ahead that every installment is due
+        today = timezone.localdate() + timedelta(days=400)
+        while (result := collect_chunk(after_id, chunk_size, today)) is not None:
+            after_id, paid, missed = result
+            totals[0] += paid
+            totals[1] += missed
+        return tuple(totals)
+
+    def test_disbursement_pays_out_once(self):
+        self.assertEqual(disburse_loans([self.loan]), [self.loan])
+        # A second click holding the stale, still-pending instance is a no-op
+        stale = Loan.objects.get(pk=self.loan.pk)
+        stale.status, stale.disbursed_at = Loan.STATUS_PENDING, None
+        self.assertEqual(disburse_loans([stale]), [])
+        loan = Loan.objects.get(pk=self.loan.pk)
+        self.assertEqual((loan.status, loan.account_id), (Loan.STATUS_APPROVED, self.account.pk))
+        self.assertEqual(self.balance(), Decimal('600.00'))
+        self.assertEqual(loan.installments.count(), 6)
+
+    def test_disbursed_loan_cannot_be_rejected(self):
+        admin = User.objects.create_superuser('manager', password='pw')
+        self.client.force_login(admin)
+        disburse_loans([self.loan])
+        self.client.post(reverse('update_loan_status', args=[self.loan.pk, 'reject']))
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).status, Loan.STATUS_APPROVED)
+        pending = Loan.objects.create(user=self.user, amount=Decimal('50.00'), purpose='tv', term_months=3, annual_rate=0)
+        self.client.post(reverse('update_loan_status', args=[pending.pk, 'reject']))
+        self.assertEqual(Loan.objects.get(pk=pending.pk).status, Loan.STATUS_REJECTED)
+
+    def test_collection_keeps_installments_in_order(self):
+        disburse_loans([self.loan])
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('250.00'))
+        self.assertEqual(self.collect_all(), (2, 4))
+        self.assertEqual(
+            list(self.loan.installments.order_by('sequence').values_list('status', flat=True)),
+            [LoanInstallment.STATUS_PAID] * 2 + [LoanInstallment.STATUS_DUE] * 4,
+        )
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('1000.00'))
+        self.assertEqual(self.collect_all(), (4, 0))
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).status, Loan.STATUS_CLOSED)
+        self.assertEqual(self.balance(), Decimal('600.00'))
+
+    def test_only_approved_loans_are_collected(self):
+        disburse_loans([self.loan])
+        Loan.objects.filter(pk=self.loan.pk).update(status=Loan.STATUS_REJECTED)
+        self.assertEqual(self.collect_all(), (0, 0))
+        self.assertEqual(self.balance(), Decimal('600.00'))
@@ -1,43 +1,39 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
-from django.db.models.functions import TruncMonth
-import json
-from django.http import HttpResponseForbidden, HttpResponseBadRequest
+from django.db.models import Q
+from django.http import HttpResponseForbidden, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse_lazy
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django import forms
 
+from bank.caching import ledger_version
+from bank.dashboard import monthly_series_json, monthly_series_queryset, transaction_totals
+from bank.documents import LoanDocumentUploadHandler
+from bank.forecast import DASHBOARD_DAYS, forecast
+from bank.forms import UserLookupField
+from bank.loans import LoanError, disburse_loans, next_installment_prefetch
 from bank.models import Account, Loan
+from bankx import sharding
+from bankx.routers import replica_reads
 from transactions.models import Transaction
+from transactions.outbox import record_loan
 from django.contrib.auth.models import User
 
 
 @login_required
+@replica_reads
 def dashboard_view(request):
     accounts = Account.objects.filter(user=request.user)
-    transactions = Transaction.objects.filter(user=request.user).order_by('-created_at')[:10]
+    transactions = Transaction.objects.filter(user=request.user).select_related('account').order_by('-created_at')[:10]
 
-    total_deposits = Transaction.objects.filter(user=request.user, transaction_type=Transaction.TYPE_DEPOSIT).aggregate(Sum('amount'))['amount__sum'] or 0
-    total_withdrawals = Transaction.objects.filter(user=request.user, transaction_type=Transaction.TYPE_WITHDRAW).aggregate(Sum('amount'))['amount__sum'] or 0
+    totals = transaction_totals(request.user)
 
     loans = Loan.objects.filter(user=request.user).order_by('-created_at')[:5]
 
-    # Analytics: group by month for chart (simple)
-    monthly_qs = (
-        Transaction.objects.filter(user=request.user)
-        .annotate(month=TruncMonth('created_at'))
-        .values('month', 'transaction_type')
-        .annotate(total=Sum('amount'))
-        .order_by('month')
-    )
-    monthly = [
-        {
-            'month': (row['month'].strftime('%Y-%m') if row['month'] else ''),
-            'transaction_type': row['transaction_type'],
-            'total': float(row['total'] or 0),
-        }
-        for row in monthly_qs
-    ]
-    monthly_json = json.dumps(monthly)
+    monthly_json = monthly_series_json(monthly_series_queryset(request.user))
+
+    projection = forecast(request.user, DASHBOARD_DAYS)
 
     return render(
         request,
@@ -45,31 +41,61 @@ def dashboard_view(request):
         {
             'accounts': accounts,
             'transactions': transactions,
-            'total_deposits': total_deposits,
-            'total_withdrawals': total_withdrawals,
+            'totals': totals,
+            'total_deposits': totals['deposits'],
+            'total_withdrawals': totals['withdrawals'],
             'loans': loans,
             'monthly_json': monthly_json,
+            'forecast': projection,
+            'ledger_version': ledger_version(request.user.pk),
         },
     )
 
 
 class LoanRequestForm(forms.Form):
     amount = forms.DecimalField(max_digits=12, decimal_places=2, min_value=0.01)
+    term_months = forms.TypedChoiceField(choices=Loan.TERM_CHOICES, coerce=int, initial=12)
     purpose = forms.CharField(widget=forms.Textarea(attrs={'rows': 4}))
-    document = forms.FileField(required=False)
+    document = forms.FileField(required=False, help_text='PDF, PNG or JPEG')
+
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+
+    def clean_document(self):
+        if 'document' in self.upload_errors:
+            raise forms.ValidationError(self.upload_errors['document'])
+        return self.cleaned_data.get('document')
 
 
 @login_required
+@csrf_exempt
 def request_loan_view(request):
+    # Upload handlers must be swapped before anything reads request.POST, including
+    # the CSRF middleware, so the check runs in the csrf_protect'ed inner view.
+    handler = LoanDocumentUploadHandler(request)
+    request.upload_handlers = [handler]
+    return _request_loan(request, handler)
+
+
+@csrf_protect
+def _request_loan(request, handler):
     if request.method == 'POST':
-        form = LoanRequestForm(request.POST, request.FILES)
+        form = LoanRequestForm(request.POST, request.FILES, upload_errors=handler.errors)
         if form.is_valid():
-            Loan.objects.create(
-                user=request.user,
-                amount=form.cleaned_data['amount'],
-                purpose=form.cleaned_data['purpose'],
-                document=form.cleaned_data.get('document'),
-            )
+            document = form.cleaned_data.get('document')
+            with sharding.atomic():
+                loan = Loan.objects.create(
+                    user=request.user,
+                    amount=form.cleaned_data['amount'],
+                    term_months=form.cleaned_data['term_months'],
+                    purpose=form.cleaned_data['purpose'],
+                    document=document,
+                    document_sha256=getattr(document, 'sha256', ''),
+                    document_size=document.size if document else None,
+                    document_content_type=document.content_type if document else '',
+                )
+                record_loan(loan)
             from django.contrib import messages
             messages.success(request, 'Loan request submitted.')
             return redirect('loans')
@@ -80,7 +106,7 @@ def request_loan_view(request):
 
 @login_required
 def loans_view(request):
-    loans = Loan.objects.filter(user=request.user).order_by('-created_at')
+    loans = Loan.objects.filter(user=request.user).select_related('account').prefetch_related(next_installment_prefetch()).order_by('-created_at')
     return render(request, 'bank/loans.html', {'loans': loans})
 
 
@@ -112,9 +138,30 @@ def update_loan_status_view(request, loan_id: int, action: str):
     loan = get_object_or_404(Loan, id=loan_id)
     if action not in ('approve', 'reject'):
         return HttpResponseBadRequest('Invalid action')
-    loan.status = Loan.STATUS_APPROVED if action == 'approve' else Loan.STATUS_REJECTED
-    loan.save(update_fields=['status'])
     from django.contrib import messages
+    if action == 'approve':
+        try:
+            disbursed = disburse_loans([loan])
+        except LoanError as exc:
+            messages.error(request, str(exc))
+            return redirect('admin_loans')
+        if not disbursed:
+            loan.refresh_from_db(fields=['status'])
+            messages.error(request, f'Loan {loan.id} was already {loan.get_status_display().lower()}.')
+            return redirect('admin_loans')
+    else:
+        with sharding.atomic():
+            # Only a pending, undisbursed loan can be rejected; a paid-out one keeps its schedule
+            rejected = Loan.objects.filter(pk=loan.pk, status=Loan.STATUS_PENDING, disbursed_at__isnull=True).update(
+                status=Loan.STATUS_REJECTED, updated_at=timezone.now()
+            )
+            if rejected:
+                loan.status = Loan.STATUS_REJECTED
+                record_loan(loan)
+        if not rejected:
+            loan.refresh_from_db(fields=['status'])
+            messages.error(request, f'Loan {loan.id} was already {loan.get_status_display().lower()}.')
+            return redirect('admin_loans')
     messages.success(request, f'Loan {action}d.')
     return redirect('admin_loans')
 
@@ -124,13 +171,32 @@ def _generate_account_number() -> str:
     return ''.join([str(random.randint(0, 9)) for _ in range(12)])
 
 
+USER_AUTOCOMPLETE_LIMIT = 20
+
+
 class AdminCreateAccountForm(forms.Form):
-    user = forms.ModelChoiceField(queryset=User.objects.all())
+    user = UserLookupField(queryset=User.objects.all(), autocomplete_url=reverse_lazy('user_autocomplete'))
     account_type = forms.ChoiceField(choices=Account.ACCOUNT_TYPE_CHOICES)
     interest_rate = forms.DecimalField(max_digits=5, decimal_places=2, required=False, help_text='Defaults by type if left blank')
     initial_deposit = forms.DecimalField(max_digits=12, decimal_places=2, min_value=0, initial=0)
 
 
+@login_required
+def user_autocomplete_view(request):
+    if not _is_bank_admin(request.user):
+        return HttpResponseForbidden('Admins only')
+    term = request.GET.get('q', '').strip()
+    if len(term) < 2:
+        return JsonResponse({'results': []})
+    # Prefix matches can use the username index; never a '%term%' scan over every user
+    users = (
+        User.objects.filter(Q(username__startswith=term) | Q(email__istartswith=term))
+        .order_by('username')
+        .values('id', 'username', 'email')[:USER_AUTOCOMPLETE_LIMIT]
+    )
+    return JsonResponse({'results': list(users)})
+
+
 @login_required
 def admin_create_account_view(request):
     if not _is_bank_admin(request.user):
@@ -143,36 +209,23 @@ def admin_create_account_view(request):
             rate = form.cleaned_data.get('interest_rate')
             if rate is None or rate == '':
                 rate = 2.5 if account_type == Account.TYPE_SAVINGS else 0
-            # unique account number
+            # unique account number, across every shard
             number = _generate_account_number()
-            while Account.objects.filter(account_number=number).exists():
+            while sharding.account_number_taken(number):
                 number = _generate_account_number()
-            account = Account.objects.create(
-                user=user,
-                account_number=number,
-                account_type=account_type,
-                interest_rate=rate,
-            )
-            # initial deposit
-            from decimal import Decimal
-            initial = Decimal(str(form.cleaned_data['initial_deposit']))
-            if initial > 0:
-                from transactions.utils import generate_transaction_receipt_pdf
-                from django.db import transaction as dbtx
-                import uuid
-                with dbtx.atomic():
-                    account.balance += initial
-                    account.save(update_fields=['balance'])
-                    t = Transaction.objects.create(
-                        user=user,
-                        account=account,
-                        transaction_type=Transaction.TYPE_DEPOSIT,
-                        category=Transaction.CATEGORY_OTHER,
-                        amount=initial,
-                        description='Initial deposit (admin)',
-                        nonce=str(uuid.uuid4()),
-                    )
-                    t.receipt_pdf.save(f'receipt_{t.id}.pdf', generate_transaction_receipt_pdf(t))
+            with sharding.for_user(user.pk):
+                account = Account.objects.create(
+                    user=user,
+                    account_number=number,
+                    account_type=account_type,
+                    interest_rate=rate,
+                )
+                # initial deposit
+                from decimal import Decimal
+                initial = Decimal(str(form.cleaned_data['initial_deposit']))
+                if initial > 0:
+                    from transactions import services
+                    services.deposit(user, account, initial, description='Initial deposit (admin)')
             from django.contrib import messages
             messages.success(request, f'Account {account.account_number} created for {user.username}.')
             return redirect('dashboard')
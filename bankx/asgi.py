@@ -3,6 +3,11 @@ ASGI config for bankx project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Set ``BANKX_ASYNC_VIEWS=1`` when serving through this module so the read-heavy
+views use their async implementations, e.g.::
+
+    BANKX_ASYNC_VIEWS=1 uvicorn bankx.asgi:application --workers 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,139 @@
+"""Read replica routing.
+
+Reads go to a replica only inside views marked with :func:`replica_reads`
+(history, dashboards, exports, admin changelists) and only for GET/HEAD
+requests. Everything else stays on ``default``, and so does every write,
+including all money movement.
+
+Read-your-writes: the first write in a request pins the rest of that request
+to the primary. :class:`ReplicaRoutingMiddleware` then sets a short-lived cookie
+so the client's next requests also read from the primary until the replicas
+have caught up (``REPLICA_PIN_SECONDS``). Any open transaction on ``default``
+also keeps reads on the primary.
+
+Replicas are the aliases in ``DATABASE_REPLICAS``. When it is empty, the
+router does nothing.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'bankx_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Per-request routing state, set by the middleware: {'replica', 'pinned', 'wrote'}
+_state = ContextVar('replica_routing', default=None)
+
+
+def replicas() -> list:
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def reading_from_replicas():
+    """Send reads in the block to a replica unless the request is pinned to the primary."""
+    state = _state.get()
+    if state is None:
+        # Outside a request (commands, shell): give the block its own state
+        token = _state.set({'replica': True, 'pinned': False, 'wrote': False})
+        try:
+            yield
+        finally:
+            _state.reset(token)
+        return
+    previous, state['replica'] = state['replica'], True
+    try:
+        yield
+    finally:
+        state['replica'] = previous
+
+
+def replica_reads(view):
+    """Serve safe (GET/HEAD) requests to ``view`` from a replica. Works on sync and async views."""
+    if iscoroutinefunction(view):
+        async def wrapped(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return await view(request, *args, **kwargs)
+            with reading_from_replicas():
+                return await view(request, *args, **kwargs)
+    else:
+        def wrapped(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return view(request, *args, **kwargs)
+            with reading_from_replicas():
+                return view(request, *args, **kwargs)
+    return wraps(view)(wrapped)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        aliases = replicas()
+        if not aliases or state is None or not state['replica'] or state['pinned'] or state['wrote']:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction must see its own writes
+            return None
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and are never migrated themselves
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """Track writes per request and pin the client to the primary for a while after one."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _state.set(self._initial(request))
+        try:
+            response = self.get_response(request)
+            return self._pin(_state.get(), response)
+        finally:
+            _state.reset(token)
+
+    async def __acall__(self, request):
+        token = _state.set(self._initial(request))
+        try:
+            response = await self.get_response(request)
+            return self._pin(_state.get(), response)
+        finally:
+            _state.reset(token)
+
+    @staticmethod
+    def _initial(request) -> dict:
+        return {'replica': False, 'pinned': PIN_COOKIE in request.COOKIES, 'wrote': False}
+
+    @staticmethod
+    def _pin(state: dict, response):
+        if state['wrote'] and replicas():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
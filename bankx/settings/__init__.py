@@ -0,0 +1,15 @@
+"""Settings profile selected by ``BANKX_ENV``: ``dev`` (default), ``prod``, ``bench`` or ``test``."""
+import os
+
+BANKX_ENV = os.environ.get('BANKX_ENV', 'dev')
+
+if BANKX_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif BANKX_ENV == 'bench':
+    from .bench import *  # noqa: F401,F403
+elif BANKX_ENV == 'test':
+    from .test import *  # noqa: F401,F403
+elif BANKX_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ImportError(f"Unknown BANKX_ENV '{BANKX_ENV}' (expected dev, prod, bench or test)")
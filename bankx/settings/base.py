@@ -0,0 +1,246 @@
+"""
+Settings shared by every profile; ``BANKX_ENV`` picks dev, prod or bench on top.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.2/ref/settings/
+"""
+
+import os
+from pathlib import Path
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+# Development key; prod requires BANKX_SECRET_KEY
+SECRET_KEY = 'django-insecure-2)zy0ewj96w)+e-!!%v#&g-fcmi*_syt!#fiwi41ip_ct!pjlx'
+
+DEBUG = False
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    # Third-party
+    'crispy_forms',
+    'crispy_bootstrap5',
+    # Local apps
+    'users.apps.UsersConfig',
+    'bank',
+    'transactions',
+    'api',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'bankx.routers.ReplicaRoutingMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'bankx.sharding.ShardMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'bankx.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'OPTIONS': {
+            # Compiled templates are kept in memory per process; {% cache %} fragments
+            # in base.html, the dashboard and history are keyed by user and ledger version
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'users.context_processors.is_admin_user',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'bankx.wsgi.application'
+ASGI_APPLICATION = 'bankx.asgi.application'
+
+# Route dashboard/history/loans/beneficiaries to their async variants (run under ASGI)
+ASYNC_READ_VIEWS = os.environ.get('BANKX_ASYNC_VIEWS', '0') == '1'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
+}
+
+# Read replicas (bankx/routers.py): views marked @replica_reads read from one of
+# DATABASE_REPLICAS; writes and all other views use default. BANKX_SQLITE_REPLICAS=N
+# adds N local SQLite copies, refreshed by `manage.py sync_sqlite_replicas`.
+DATABASE_ROUTERS = ['bankx.sharding.ShardRouter', 'bankx.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+for _i in range(1, int(os.environ.get('BANKX_SQLITE_REPLICAS', '0')) + 1):
+    DATABASES[f'replica{_i}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.replica{_i}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_i}')
+# How long a client keeps reading from the primary after a write; keep it above replication lag
+REPLICA_PIN_SECONDS = int(os.environ.get('BANKX_REPLICA_PIN_SECONDS', '10'))
+
+# Customer shards (bankx/sharding.py): each customer's accounts and ledger live on
+# one of SHARDS, chosen through the bank.ShardBucket directory and moved with
+# `manage.py rebalance_shards`. BANKX_SQLITE_SHARDS=N adds N local SQLite shards;
+# migrate each with `manage.py migrate --database shardN`.
+SHARDS = []
+for _i in range(1, int(os.environ.get('BANKX_SQLITE_SHARDS', '0')) + 1):
+    DATABASES[f'shard{_i}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.shard{_i}.sqlite3',
+    }
+    SHARDS.append(f'shard{_i}')
+# How long processes may act on a cached bucket directory; rebalance_shards waits this long between steps
+SHARD_DIRECTORY_TTL = int(os.environ.get('BANKX_SHARD_DIRECTORY_TTL', '5'))
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Authentication goes through users/passwords.py so hashing runs on a bounded pool.
+AUTHENTICATION_BACKENDS = ['users.passwords.BoundedModelBackend']
+
+# The first hasher is used for new hashes; the rest only verify existing ones.
+# Hashes made with an older hasher or work factor are upgraded on the next login.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+]
+
+# Threads per process that may hash passwords at once (default: min(4, CPUs))
+PASSWORD_HASH_WORKERS = int(os.environ.get('BANKX_PASSWORD_HASH_WORKERS', '0')) or None
+
+# Fast hashing for tests and benchmark seeding only; never for real credentials
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher'] + PASSWORD_HASHERS
+
+# Sessions are read through the cache and written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Sliding-window limits on login and password reset (users/ratelimit.py):
+# scope -> (max attempts, window seconds)
+AUTH_RATE_LIMITS = {
+    'login:ip': (30, 300),
+    'login:user': (5, 300),
+    'reset:ip': (10, 3600),
+    'reset:email': (3, 3600),
+}
+# Reverse proxies in front of the app whose X-Forwarded-For entries are trusted
+RATE_LIMIT_PROXY_COUNT = int(os.environ.get('BANKX_RATE_LIMIT_PROXY_COUNT', '0'))
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.2/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.2/howto/static-files/
+
+STATIC_URL = 'static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Crispy Forms
+CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
+CRISPY_TEMPLATE_PACK = "bootstrap5"
+
+# Authentication
+LOGIN_REDIRECT_URL = 'dashboard'
+LOGOUT_REDIRECT_URL = 'login'
+LOGIN_URL = 'login'
+
+DEFAULT_FROM_EMAIL = 'no-reply@bankx.local'
+
+# Uploads above this are rejected; avatar/thumbnail variants come from
+# `manage.py process_profile_pictures` (see users/images.py)
+PROFILE_PICTURE_MAX_BYTES = 5 * 1024 * 1024
+
+# Loan documents are streamed to FILE_UPLOAD_TEMP_DIR and rejected past this size
+# (see bank/documents.py); previews come from `manage.py render_loan_previews`.
+LOAN_DOCUMENT_MAX_BYTES = 10 * 1024 * 1024
+
+# Transactions older than this are moved to the archive by `manage.py archive_transactions`
+TRANSACTION_ARCHIVE_DAYS = 365
+
+# Velocity rules evaluated before every withdrawal/transfer (see transactions/risk.py).
+# `action` is "review" (allow and record) or "block".
+RISK_RULES = [
+    {'name': 'burst', 'window': 60, 'max_count': 5, 'action': 'block'},
+    {'name': 'hourly_amount', 'window': 3600, 'max_amount': '5000.00', 'action': 'review'},
+    {'name': 'daily_amount', 'window': 86400, 'max_amount': '20000.00', 'action': 'block'},
+    {'name': 'new_recipient', 'new_recipient': True, 'min_amount': '1000.00', 'action': 'review'},
+]
+
+# Outbox sinks drained by `manage.py dispatch_outbox`. Others available:
+#   {'BACKEND': 'transactions.outbox.WebhookSink', 'OPTIONS': {'URL': 'http://127.0.0.1:8765/'}}
+#   {'BACKEND': 'transactions.outbox.FileSink', 'OPTIONS': {'PATH': BASE_DIR / 'outbox.jsonl'}}
+OUTBOX_SINKS = [
+    {'BACKEND': 'transactions.outbox.EmailSink'},
+]
+
+CSRF_TRUSTED_ORIGINS = []
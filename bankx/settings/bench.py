@@ -0,0 +1,28 @@
+"""Production behaviour on one machine for ``bench_pages`` and load tests.
+
+Same middleware, cache-backed sessions and non-debug templates as prod, but with
+in-process caches, the SQLite database and no HTTPS-only cookies.
+"""
+import os
+
+os.environ.setdefault('BANKX_SECRET_KEY', 'bench-only-not-secret')
+os.environ.setdefault('BANKX_ALLOWED_HOSTS', 'localhost,127.0.0.1,testserver')
+
+from .prod import *  # noqa: E402,F401,F403
+from .base import FAST_PASSWORD_HASHERS  # noqa: E402
+
+# Seeding thousands of users would otherwise be dominated by hashing
+PASSWORD_HASHERS = FAST_PASSWORD_HASHERS
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bankx-default'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bankx-sessions', 'TIMEOUT': None},
+}
+SESSION_COOKIE_SECURE = False
+CSRF_COOKIE_SECURE = False
+SECURE_PROXY_SSL_HEADER = None
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
@@ -0,0 +1,9 @@
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -0,0 +1,117 @@
+"""Production profile: no query logging, pooled connections, cache-backed sessions.
+
+Configured from the environment:
+
+- ``BANKX_SECRET_KEY`` (required) and ``BANKX_ALLOWED_HOSTS`` (comma separated)
+- ``BANKX_DB_NAME``/``_USER``/``_PASSWORD``/``_HOST``/``_PORT`` for PostgreSQL;
+  without ``BANKX_DB_NAME`` the SQLite database from ``base`` is kept
+- ``BANKX_DB_REPLICA_HOSTS`` (comma separated) for PostgreSQL read replicas
+- ``BANKX_REDIS_URL`` for the shared cache (versions, forecasts, fragments, sessions)
+- ``BANKX_EMAIL_HOST``/``_PORT``/``_USER``/``_PASSWORD`` for SMTP
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, MIDDLEWARE, PASSWORD_HASHERS
+
+
+def env(name: str, default=None):
+    value = os.environ.get(name, default)
+    if value is None:
+        raise ImproperlyConfigured(f'{name} must be set when BANKX_ENV=prod')
+    return value
+
+
+DEBUG = False
+SECRET_KEY = env('BANKX_SECRET_KEY')
+ALLOWED_HOSTS = [h.strip() for h in env('BANKX_ALLOWED_HOSTS', '').split(',') if h.strip()]
+CSRF_TRUSTED_ORIGINS = [o.strip() for o in env('BANKX_CSRF_TRUSTED_ORIGINS', '').split(',') if o.strip()]
+
+if os.environ.get('BANKX_DB_NAME'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('BANKX_DB_NAME'),
+            'USER': env('BANKX_DB_USER', ''),
+            'PASSWORD': env('BANKX_DB_PASSWORD', ''),
+            'HOST': env('BANKX_DB_HOST', ''),
+            'PORT': env('BANKX_DB_PORT', ''),
+        }
+    }
+    # Streaming replicas of the same database, one alias per host
+    DATABASE_REPLICAS = []
+    for i, host in enumerate(h.strip() for h in env('BANKX_DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+        DATABASES[f'replica{i + 1}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+        DATABASE_REPLICAS.append(f'replica{i + 1}')
+    # Customer shards, one database per host with the same name and credentials
+    SHARDS = []
+    for i, host in enumerate(h.strip() for h in env('BANKX_DB_SHARD_HOSTS', '').split(',') if h.strip()):
+        DATABASES[f'shard{i + 1}'] = {**DATABASES['default'], 'HOST': host}
+        SHARDS.append(f'shard{i + 1}')
+# Keep connections open between requests instead of reconnecting every time
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = int(env('BANKX_CONN_MAX_AGE', '60'))
+    database['CONN_HEALTH_CHECKS'] = True
+
+REDIS_URL = env('BANKX_REDIS_URL', 'redis://127.0.0.1:6379')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'{REDIS_URL}/0',
+        'KEY_PREFIX': 'bankx',
+    },
+    # Separate database so flushing page caches never logs everybody out
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'{REDIS_URL}/1',
+        'KEY_PREFIX': 'bankx',
+        'TIMEOUT': None,
+    },
+}
+
+# Sessions live in the cache: page views read them without touching the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_COOKIE_AGE = 60 * 60 * 12
+SESSION_COOKIE_SECURE = True
+SESSION_COOKIE_HTTPONLY = True
+CSRF_COOKIE_SECURE = True
+
+# GZip right after security so every later middleware sees the uncompressed response.
+# CSRF tokens are masked per request, which keeps compressed pages safe from BREACH.
+MIDDLEWARE = MIDDLEWARE[:1] + ['django.middleware.gzip.GZipMiddleware'] + MIDDLEWARE[1:]
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # collectstatic writes content-hashed copies; serve STATIC_ROOT with far-future expiry
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+}
+
+# Memory-hard hashing: Argon2 when argon2-cffi is installed, scrypt otherwise.
+# Existing PBKDF2 hashes stay valid and are upgraded at the next login.
+try:
+    import argon2  # noqa: F401
+    PREFERRED_HASHER = 'django.contrib.auth.hashers.Argon2PasswordHasher'
+except ImportError:
+    PREFERRED_HASHER = 'django.contrib.auth.hashers.ScryptPasswordHasher'
+PASSWORD_HASHERS = [PREFERRED_HASHER] + [h for h in PASSWORD_HASHERS if h != PREFERRED_HASHER]
+
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SECURE_CONTENT_TYPE_NOSNIFF = True
+SECURE_HSTS_SECONDS = int(env('BANKX_HSTS_SECONDS', '0'))
+
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = env('BANKX_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(env('BANKX_EMAIL_PORT', '25'))
+EMAIL_HOST_USER = env('BANKX_EMAIL_USER', '')
+EMAIL_HOST_PASSWORD = env('BANKX_EMAIL_PASSWORD', '')
+EMAIL_USE_TLS = env('BANKX_EMAIL_USE_TLS', '0') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'root': {'handlers': ['console'], 'level': env('BANKX_LOG_LEVEL', 'WARNING')},
+}
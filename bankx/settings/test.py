@@ -0,0 +1,13 @@
+"""Test profile: dev with fast password hashing.
+
+``manage.py test`` selects it unless ``BANKX_ENV`` is set. Other runners point
+``DJANGO_SETTINGS_MODULE`` at ``bankx.settings.test`` (or set ``BANKX_ENV=test``).
+"""
+from .dev import *  # noqa: F401,F403
+from .base import FAST_PASSWORD_HASHERS
+
+PASSWORD_HASHERS = FAST_PASSWORD_HASHERS
+
+# A second database for the sharding tests. SHARDS is left as configured, so
+# other tests run unsharded; the sharding tests opt in with override_settings.
+DATABASES.setdefault('shard1', {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.shard1.sqlite3'})
@@ -0,0 +1,274 @@
+"""Customer sharding across several databases.
+
+A customer and everything keyed by them live on one database, their shard:
+accounts, ledger and archive, schedules, beneficiaries, loans, spending insights
+and outbox rows (every model of the ``bank`` and ``transactions`` apps except
+the two directory tables below). The placement key is the user id, hashed into
+``BUCKETS`` buckets. ``bank.ShardBucket`` maps a bucket to a database alias; a
+bucket without a row lives on ``default``. Users, profiles, API tokens,
+``ShardBucket`` and ``bank.AccountLocator`` stay on ``default``. User rows are
+also copied to the customer's shard, as targets for its foreign keys.
+
+Routing follows a context. :class:`ShardMiddleware` and ``api_view`` enter the
+signed-in customer's shard. Bank admins can pick the shard the admin pages
+(``ADMIN_PATHS``) work on with ``?shard=<alias>``, which is remembered in the
+session; their other pages stay on their own shard. Background commands
+run once per database through :func:`per_shard`. Other code enters a context
+with :func:`using` or :func:`for_user`. Objects keep writing to the database
+they were read from. Outside any context, sharded models use ``default``. Money
+paths open transactions with :func:`atomic` so they cover the shard's
+connection rather than ``default``'s.
+
+Account ids are allocated from ``AccountLocator``, so they are unique across
+shards, and the locator finds any account's owner. Accounts created while
+sharding was off get their locators when ``rebalance_shards`` first runs. Transfers between customers
+on different shards run as a saga (``transactions/sagas.py``). ``manage.py
+rebalance_shards`` moves buckets between databases.
+
+Shards are the aliases in ``SHARDS``. When it is empty, nothing is routed.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, transaction as db_transaction
+from django.http import HttpResponse
+
+from .routers import replicas
+
+BUCKETS = 64
+SHARDED_APPS = ('bank', 'transactions')
+GLOBAL_MODELS = ('bank.shardbucket', 'bank.accountlocator')
+SESSION_KEY = 'admin_shard'
+# Pages where bank admins work on the shard chosen with ?shard= instead of their own
+ADMIN_PATHS = ('/admin/', '/manage/')
+
+# (alias, bucket) of the active context; bucket is None when a whole shard is entered
+_current = ContextVar('shard', default=None)
+# {bucket: (alias, moving_to)} and when to reload it
+_directory = {'buckets': {}, 'expires': 0.0}
+
+
+class BucketMoving(DatabaseError):
+    """A write reached a bucket that ``rebalance_shards`` is moving; retry in a moment."""
+
+
+def is_sharded(model) -> bool:
+    return model._meta.app_label in SHARDED_APPS and model._meta.label_lower not in GLOBAL_MODELS
+
+
+def shards() -> list:
+    return getattr(settings, 'SHARDS', [])
+
+
+def databases() -> list:
+    """Every database that can hold customer data, ``default`` first."""
+    return [DEFAULT_DB_ALIAS] + [alias for alias in shards() if alias != DEFAULT_DB_ALIAS]
+
+
+def bucket(user_id: int) -> int:
+    return user_id % BUCKETS
+
+
+def directory(refresh: bool = False) -> dict:
+    """``{bucket: (alias, moving_to)}``, cached per process for ``SHARD_DIRECTORY_TTL`` seconds."""
+    now = time.monotonic()
+    if refresh or now >= _directory['expires']:
+        from bank.models import ShardBucket
+        rows = ShardBucket.objects.using(DEFAULT_DB_ALIAS).values_list('bucket', 'alias', 'moving_to')
+        _directory['buckets'] = {b: (alias, moving_to) for b, alias, moving_to in rows}
+        _directory['expires'] = now + settings.SHARD_DIRECTORY_TTL
+    return _directory['buckets']
+
+
+def shard_for_user(user_id: int) -> str:
+    if not shards():
+        return DEFAULT_DB_ALIAS
+    return directory().get(bucket(user_id), (DEFAULT_DB_ALIAS, ''))[0]
+
+
+def account_owner(account_id: int):
+    """User id owning a global account id, or ``None``."""
+    from bank.models import AccountLocator
+    return AccountLocator.objects.using(DEFAULT_DB_ALIAS).filter(pk=account_id).values_list('user_id', flat=True).first()
+
+
+def owner_id(obj):
+    """User id of the customer a sharded row belongs to, or ``None`` when it has none."""
+    if getattr(obj, 'user_id', None) is not None:
+        return obj.user_id
+    # Installments and sagas belong to whoever owns their loan or debit
+    for parent in ('loan', 'debit'):
+        if getattr(obj, f'{parent}_id', None) is not None:
+            return owner_id(getattr(obj, parent))
+    account_id = getattr(obj, 'account_id', None)
+    return account_owner(account_id) if account_id is not None else None
+
+
+def account_number_taken(number: str) -> bool:
+    """Whether any database holds an account with this number."""
+    from bank.models import Account, AccountLocator
+    # Locators exist for every account only while sharding is on
+    model = AccountLocator if shards() else Account
+    return model.objects.using(DEFAULT_DB_ALIAS).filter(account_number=number).exists()
+
+
+def current() -> str:
+    state = _current.get()
+    return state[0] if state else DEFAULT_DB_ALIAS
+
+
+def home(obj) -> str:
+    """Database a sharded object belongs to. Rows read from a replica belong to ``default``."""
+    db = obj._state.db or current()
+    return DEFAULT_DB_ALIAS if db in replicas() else db
+
+
+@contextmanager
+def using(alias: str, user_bucket: int = None):
+    token = _current.set((alias, user_bucket))
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+def for_user(user_id: int):
+    """Enter ``user_id``'s shard. Writes raise :class:`BucketMoving` while the customer is being moved."""
+    return using(shard_for_user(user_id), bucket(user_id) if shards() else None)
+
+
+def atomic():
+    """``transaction.atomic()`` on the current shard."""
+    return db_transaction.atomic(using=current())
+
+
+def on_commit(func, robust: bool = False) -> None:
+    db_transaction.on_commit(func, using=current(), robust=robust)
+
+
+def replicate_users(user_ids, alias: str) -> None:
+    """Copy (or refresh) user rows from ``default`` onto a shard."""
+    from django.contrib.auth.models import User
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    users = list(User.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=list(user_ids)))
+    fields = [f.name for f in User._meta.concrete_fields if not f.primary_key]
+    User.objects.using(alias).bulk_create(users, update_conflicts=True, unique_fields=['id'], update_fields=fields)
+
+
+def active_databases() -> list:
+    """:func:`databases`, minus those a bucket is being moved onto or off. Background jobs skip those."""
+    if not shards():
+        return [DEFAULT_DB_ALIAS]
+    busy = {alias for entry in directory().values() if entry[1] for alias in entry}
+    return [alias for alias in databases() if alias not in busy]
+
+
+def per_shard(handle):
+    """Run a management command's ``handle`` once on every active database."""
+    @wraps(handle)
+    def wrapped(self, *args, **options):
+        if not shards():
+            return handle(self, *args, **options)
+        directory(refresh=True)
+        active = active_databases()
+        for alias in databases():
+            if alias not in active:
+                self.stderr.write(f'[{alias}] skipped: a bucket is being moved onto or off it')
+                continue
+            self.stdout.write(f'[{alias}]')
+            with using(alias):
+                handle(self, *args, **options)
+    return wrapped
+
+
+class ShardRouter:
+    """Send sharded models to the current context's shard. Must come before ReplicaRouter."""
+
+    @staticmethod
+    def _route(model, hints):
+        if not shards() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        # Related lookups from a global object (``user.accounts``) follow the context, not the user row
+        alias = home(instance) if instance is not None and instance._state.db and is_sharded(instance) else current()
+        # default is left to ReplicaRouter, so replicas keep serving it
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        alias = self._route(model, hints)
+        if not shards() or not is_sharded(model):
+            return alias
+        moving = {b for b, (_, moving_to) in directory().items() if moving_to}
+        if not moving:
+            return alias
+        state = _current.get()
+        targets = {state[1]} if state and state[1] is not None else set()
+        # Admin pages run on a whole shard (bucket None), so also check the row's own customer
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(instance) and (user_id := owner_id(instance)) is not None:
+            targets.add(bucket(user_id))
+        if targets & moving:
+            raise BucketMoving(f'Bucket {min(targets & moving)} is being moved; try again shortly.')
+        return alias
+
+
+class ShardMiddleware:
+    """Route the request to the signed-in customer's shard. Goes after AuthenticationMiddleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not shards():
+            return self.get_response(request)
+        with using(*self._target(request)):
+            return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, BucketMoving):
+            response = HttpResponse('Your accounts are being moved. Please try again in a few seconds.', status=503, content_type='text/plain')
+            response['Retry-After'] = str(settings.SHARD_DIRECTORY_TTL * 2)
+            return response
+        return None
+
+    async def __acall__(self, request):
+        if not shards():
+            return await self.get_response(request)
+        target = await sync_to_async(self._target)(request)
+        with using(*target):
+            return await self.get_response(request)
+
+    @staticmethod
+    def _target(request) -> tuple:
+        user = request.user
+        if not user.is_authenticated:
+            return DEFAULT_DB_ALIAS, None
+        # An admin's own deposits and transfers still go to their shard, with the moving-bucket guard
+        if request.path_info.startswith(ADMIN_PATHS) and _is_admin(user):
+            chosen = request.GET.get('shard')
+            if chosen in databases():
+                request.session[SESSION_KEY] = chosen
+            if SESSION_KEY in request.session:
+                return request.session[SESSION_KEY], None
+        return shard_for_user(user.pk), bucket(user.pk)
+
+
+def _is_admin(user) -> bool:
+    # Staff, superusers and bank admins (users.UserProfile role) may switch shards
+    profile = getattr(user, 'profile', None)
+    return user.is_staff or user.is_superuser or getattr(profile, 'role', None) == 'admin'
@@ -24,4 +24,5 @@ urlpatterns = [
     path('', include('bank.urls')),
     path('users/', include('users.urls')),
     path('transactions/', include('transactions.urls')),
+    path('api/v1/', include('api.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
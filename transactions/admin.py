@@ -1,21 +1,120 @@
 from django.contrib import admin
-from .models import Transaction, Beneficiary, ScheduledTransfer
+from bank.admin_tools import LargeTableAdmin, csv_export_action
+from .search import search_beneficiaries, search_transactions
+from .models import (
+    Transaction, Beneficiary, ScheduledTransfer, OutboxEvent, ArchivedTransaction, AccountCarryForward, RiskDecision,
+    MonthlySpending, MerchantSpending, Budget, AggregateCursor,
+)
+
+
+LEDGER_EXPORT = [
+    ('ID', 'id'),
+    ('Date', 'created_at'),
+    ('User', 'user__username'),
+    ('Account', 'account__account_number'),
+    ('Related', 'related_account__account_number'),
+    ('Type', 'transaction_type'),
+    ('Category', 'category'),
+    ('Amount', 'amount'),
+    ('Description', 'description'),
+]
+
+
+class IndexedSearchMixin:
+    """Admin search through ``transactions.search`` instead of LIKE over ``search_fields``; exact usernames also match."""
+    search_index = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        matches = self.search_index(queryset, search_term)
+        if hasattr(self.model, 'user'):
+            matches = matches | queryset.filter(user__username=search_term.strip())
+        return matches, False
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(IndexedSearchMixin, LargeTableAdmin):
     list_display = ('user', 'account', 'transaction_type', 'category', 'amount', 'created_at')
+    list_select_related = ('user', 'account')
     list_filter = ('transaction_type', 'category')
-    search_fields = ('account__account_number', 'user__username')
+    search_fields = ('description', 'account__account_number', 'user__username')
+    search_index = staticmethod(search_transactions)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('user', 'account', 'related_account')
+    actions = [csv_export_action(LEDGER_EXPORT, 'transactions.csv')]
 
 
 @admin.register(Beneficiary)
-class BeneficiaryAdmin(admin.ModelAdmin):
+class BeneficiaryAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'name', 'nickname', 'account_number', 'email', 'created_at')
+    list_select_related = ('user',)
     search_fields = ('name', 'nickname', 'account_number', 'email')
+    search_index = staticmethod(search_beneficiaries)
 
 
 @admin.register(ScheduledTransfer)
 class ScheduledTransferAdmin(admin.ModelAdmin):
     list_display = ('user', 'from_account', 'to_identifier', 'amount', 'frequency', 'next_run', 'is_active')
+    list_select_related = ('user', 'from_account')
+    raw_id_fields = ('user', 'from_account')
     list_filter = ('frequency', 'is_active')
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'user', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'topic')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(IndexedSearchMixin, LargeTableAdmin):
+    list_display = ('user', 'account', 'transaction_type', 'category', 'amount', 'created_at', 'archived_at')
+    list_select_related = ('user', 'account')
+    list_filter = ('transaction_type', 'category')
+    search_fields = ('description', 'account__account_number', 'user__username')
+    search_index = staticmethod(search_transactions)
+    raw_id_fields = ('user', 'account', 'related_account')
+    actions = [csv_export_action(LEDGER_EXPORT, 'archived_transactions.csv')]
+
+
+@admin.register(AccountCarryForward)
+class AccountCarryForwardAdmin(admin.ModelAdmin):
+    list_display = ('account', 'archived_through', 'deposits', 'withdrawals', 'transfers_out', 'transfers_in')
+    raw_id_fields = ('account',)
+
+
+@admin.register(RiskDecision)
+class RiskDecisionAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'account', 'transaction_type', 'amount', 'action', 'rule', 'reason', 'reviewed')
+    list_filter = ('action', 'rule', 'reviewed')
+    list_editable = ('reviewed',)
+    raw_id_fields = ('account', 'recipient')
+
+
+@admin.register(MonthlySpending)
+class MonthlySpendingAdmin(admin.ModelAdmin):
+    list_display = ('user', 'month', 'category', 'total', 'count')
+    list_filter = ('category', 'month')
+    raw_id_fields = ('user',)
+
+
+@admin.register(MerchantSpending)
+class MerchantSpendingAdmin(admin.ModelAdmin):
+    list_display = ('user', 'month', 'merchant', 'total', 'count')
+    search_fields = ('merchant',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ('user', 'category', 'monthly_limit')
+    list_filter = ('category',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(AggregateCursor)
+class AggregateCursorAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_id', 'updated_at')
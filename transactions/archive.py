@@ -0,0 +1,109 @@
+"""Hot/cold split of the ledger.
+
+``archive_transactions`` moves rows older than ``TRANSACTION_ARCHIVE_DAYS`` into
+:class:`ArchivedTransaction` and folds them into per-account
+:class:`AccountCarryForward` totals. History reads only touch the archive when the
+requested date range reaches past that horizon.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from bank.models import Account
+from bankx import sharding
+from .models import AccountCarryForward, ArchivedTransaction, Transaction, TransferSaga
+
+DEFAULT_ARCHIVE_DAYS = 365
+FIELDS = [f.attname for f in Transaction._meta.concrete_fields]
+OUTGOING_TOTALS = {
+    Transaction.TYPE_DEPOSIT: 'deposits',
+    Transaction.TYPE_WITHDRAW: 'withdrawals',
+    Transaction.TYPE_TRANSFER: 'transfers_out',
+}
+
+
+def archive_days() -> int:
+    return getattr(settings, 'TRANSACTION_ARCHIVE_DAYS', DEFAULT_ARCHIVE_DAYS)
+
+
+def archive_cutoff(days: int = None):
+    return timezone.now() - timedelta(days=archive_days() if days is None else days)
+
+
+def needs_archive(start_date) -> bool:
+    """Whether a history range starting at ``start_date`` (None = unbounded) can reach archived rows."""
+    return start_date is None or start_date < archive_cutoff().date()
+
+
+def merge_history(hot, cold):
+    """Merge two newest-first iterables of ledger rows into one newest-first stream."""
+    if cold is None:
+        return iter(hot)
+    return heapq.merge(hot, cold, key=lambda t: t.created_at, reverse=True)
+
+
+def _local_accounts(ids: set) -> set:
+    """The accounts among ``ids`` that live on the current shard."""
+    if not sharding.shards():
+        return ids
+    return set(Account.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+def _carry_forward(rows: list) -> None:
+    # A cross-shard recipient is credited by a deposit on its own shard instead
+    local = _local_accounts({row['related_account_id'] for row in rows if row['related_account_id'] is not None})
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    categories = defaultdict(lambda: defaultdict(lambda: [Decimal('0.00'), 0]))
+    through = {}
+    for row in rows:
+        account_id, amount = row['account_id'], row['amount']
+        key = OUTGOING_TOTALS[row['transaction_type']]
+        deltas[account_id][key] += amount
+        deltas[account_id][f'{key}_count'] += 1
+        categories[account_id][row['category']][0] += amount
+        categories[account_id][row['category']][1] += 1
+        through[account_id] = max(through.get(account_id, row['created_at']), row['created_at'])
+        related_id = row['related_account_id']
+        if row['transaction_type'] == Transaction.TYPE_TRANSFER and related_id in local:
+            deltas[related_id]['transfers_in'] += amount
+            deltas[related_id]['transfers_in_count'] += 1
+            through[related_id] = max(through.get(related_id, row['created_at']), row['created_at'])
+
+    existing = {cf.account_id: cf for cf in AccountCarryForward.objects.select_for_update().filter(account_id__in=deltas)}
+    created, updated = [], []
+    for account_id, delta in deltas.items():
+        cf = existing.get(account_id)
+        if cf is None:
+            cf = AccountCarryForward(account_id=account_id, archived_through=through[account_id], categories={})
+            created.append(cf)
+        else:
+            cf.archived_through = max(cf.archived_through, through[account_id])
+            updated.append(cf)
+        for field, value in delta.items():
+            setattr(cf, field, getattr(cf, field) + (int(value) if field.endswith('_count') else value))
+        for category, (total, count) in categories[account_id].items():
+            current = cf.categories.get(category, {'total': '0.00', 'count': 0})
+            cf.categories[category] = {'total': str(Decimal(current['total']) + total), 'count': current['count'] + count}
+    AccountCarryForward.objects.bulk_create(created)
+    AccountCarryForward.objects.bulk_update(
+        updated,
+        ['archived_through', 'categories'] + [f for key in OUTGOING_TOTALS.values() for f in (key, f'{key}_count')] + ['transfers_in', 'transfers_in_count'],
+    )
+
+
+def archive_chunk(cutoff, chunk_size: int) -> int:
+    """Move up to ``chunk_size`` of the oldest rows before ``cutoff``; returns how many moved."""
+    with sharding.atomic():
+        # Open sagas still need their debit to finish or refund the transfer
+        hot = Transaction.objects.filter(created_at__lt=cutoff).exclude(saga__status=TransferSaga.STATUS_DEBITED)
+        rows = list(hot.order_by('id').values(*FIELDS)[:chunk_size])
+        if not rows:
+            return 0
+        ArchivedTransaction.objects.bulk_create([ArchivedTransaction(**row) for row in rows])
+        _carry_forward(rows)
+        Transaction.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
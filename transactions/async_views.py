@@ -0,0 +1,73 @@
+"""Async variants of the read-heavy transaction views, routed when ``ASYNC_READ_VIEWS`` is on (see README)."""
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
+
+from bank.caching import ledger_version
+from bank.async_views import alist, arender, current_user, gather_reads
+from bank.models import Account
+from bankx.routers import replica_reads
+from . import search, views
+from .archive import merge_history
+from .events import get_broker
+from .models import Beneficiary
+
+# Comment lines keep proxies from closing idle streams
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+@login_required
+@replica_reads
+async def history_view(request):
+    if request.GET.get('export'):
+        # CSV/PDF generation is CPU-bound; keep it on the sync implementation
+        return await sync_to_async(views.history_view)(request)
+    user = await current_user(request)
+    form, qs, archived = await sync_to_async(views.filtered_history)(request)
+    reads = [(list, qs), (ledger_version, user.pk)]
+    if archived is not None:
+        reads.append((list, archived))
+    transactions, version, *older = await gather_reads(*reads)
+    if older:
+        transactions = list(merge_history(transactions, older[0]))
+    return await arender(request, 'transactions/history.html', {
+        'form': form,
+        'transactions': transactions,
+        'ledger_version': version,
+    })
+
+
+@login_required
+async def beneficiaries_view(request):
+    user = await current_user(request)
+    q = request.GET.get('q', '')
+    items = await alist(search.search_beneficiaries(Beneficiary.objects.filter(user=user), q).order_by('name'))
+    return await arender(request, 'transactions/beneficiaries.html', {'items': items, 'q': q})
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@login_required
+async def event_stream_view(request):
+    user = await current_user(request)
+    subscription = get_broker().subscribe(user.id)
+    accounts = await alist(Account.objects.filter(user=user).values('account_number', 'balance'))
+
+    async def stream():
+        try:
+            for account in accounts:
+                yield _sse({'type': 'balance', 'account': account['account_number'], 'balance': str(account['balance'])})
+            while True:
+                event = await subscription.get(STREAM_HEARTBEAT_SECONDS)
+                yield _sse(event) if event is not None else ': keep-alive\n\n'
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
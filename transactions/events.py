@@ -0,0 +1,137 @@
+"""In-process pub/sub feeding the per-user server-sent event stream.
+
+Money paths publish through :func:`publish_transaction`, which defers delivery to
+``on_commit`` so subscribers never see rolled-back movements. The broker is
+pluggable via ``settings.EVENT_BROKER``; the default :class:`LocalBroker` only
+reaches subscribers in the same process, so deployments that run
+``run_scheduled_transfers`` or several web workers should point it at a broker
+backed by shared infrastructure.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from bankx import sharding
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, broker, user_id: int, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, event: dict) -> None:
+        # Called from whichever thread committed the transaction
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: dict) -> None:
+        if self.queue.full():
+            # A slow client loses its oldest events rather than blocking publishers
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def publish(self, user_id: int, event: dict) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, user_id: int) -> Subscription:
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_id: int, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Event loop already closed: the client went away without unsubscribing
+                self.unsubscribe(subscription)
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+
+@lru_cache(maxsize=None)
+def get_broker() -> Broker:
+    return import_string(getattr(settings, 'EVENT_BROKER', 'transactions.events.LocalBroker'))()
+
+
+def transaction_payload(t) -> dict:
+    return {
+        'id': t.id,
+        'transaction_type': t.transaction_type,
+        'category': t.category,
+        'amount': f'{t.amount:.2f}',
+        'description': t.description,
+        'created_at': t.created_at.isoformat(),
+        'account': t.account.account_number,
+        'related_account': t.related_account.account_number if t.related_account else None,
+    }
+
+
+def _transaction_event(t) -> dict:
+    return {'type': 'transaction', **transaction_payload(t)}
+
+
+def _balance_event(account) -> dict:
+    return {'type': 'balance', 'account': account.account_number, 'balance': f'{account.balance:.2f}'}
+
+
+def publish_transaction(t, related: bool = True) -> None:
+    """Queue transaction and balance events for everyone whose accounts ``t`` touched.
+
+    ``related=False`` leaves out the other side of a transfer (a cross-shard
+    transfer publishes it when the credit lands).
+    """
+    events = defaultdict(list)
+    events[t.user_id].append(_transaction_event(t))
+    for account in (t.account, t.related_account if related else None):
+        if account is not None:
+            if account.user_id != t.user_id and not events[account.user_id]:
+                events[account.user_id].append(_transaction_event(t))
+            events[account.user_id].append(_balance_event(account))
+
+    def send():
+        broker = get_broker()
+        for user_id, user_events in events.items():
+            for event in user_events:
+                broker.publish(user_id, event)
+
+    sharding.on_commit(send)
@@ -0,0 +1,206 @@
+"""Spending insights over materialised aggregates.
+
+``refresh`` folds ledger rows past the ``spending`` cursor into
+:class:`MonthlySpending` (per category) and :class:`MerchantSpending` (per
+normalised description). Each chunk is a pair of grouped queries over an id
+range. Pages only ever read the small aggregate tables. Rows newer than
+``SETTLE_SECONDS`` are left for the next run, so a transaction that commits
+after a higher id was already folded is not skipped.
+"""
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DateField, Max, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from bankx import sharding
+from .models import (
+    AggregateCursor,
+    ArchivedTransaction,
+    Budget,
+    MerchantSpending,
+    MonthlySpending,
+    OutboxEvent,
+    Transaction,
+)
+
+CURSOR = 'spending'
+SPENDING_TYPES = (Transaction.TYPE_WITHDRAW, Transaction.TYPE_TRANSFER)
+SETTLE_SECONDS = 60
+BUDGET_WARNING = Decimal('0.8')
+ZERO = Decimal('0.00')
+
+
+def normalize_merchant(description: str) -> str:
+    """Group variants of one payee: case, spacing, reference numbers and the scheduler prefix."""
+    text = re.sub(r'^scheduled:\s*', '', description.strip().lower())
+    text = re.sub(r'[#\d]+', '', text)
+    return ' '.join(text.split())[:100]
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def add_months(d: date, months: int) -> date:
+    index = d.month - 1 + months
+    return date(d.year + index // 12, index % 12 + 1, 1)
+
+
+def _spending(model, lo: int, hi: int):
+    month = TruncMonth('created_at', output_field=DateField(), tzinfo=timezone.get_current_timezone())
+    return model.objects.filter(id__gt=lo, id__lte=hi, transaction_type__in=SPENDING_TYPES).annotate(month=month)
+
+
+def _upsert(model, key_field: str, deltas: dict) -> dict:
+    """Add ``{(user_id, month, key): [total, count]}`` into ``model``; returns previous totals."""
+    if not deltas:
+        return {}
+    existing = {
+        (row.user_id, row.month, getattr(row, key_field)): row
+        for row in model.objects.select_for_update().filter(
+            user_id__in={k[0] for k in deltas},
+            month__in={k[1] for k in deltas},
+            **{f'{key_field}__in': {k[2] for k in deltas}},
+        )
+    }
+    previous, created, updated = {}, [], []
+    for key, (total, count) in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            row = model(user_id=key[0], month=key[1], **{key_field: key[2]})
+            created.append(row)
+        else:
+            updated.append(row)
+        previous[key] = row.total
+        row.total += total
+        row.count += count
+    model.objects.bulk_create(created, batch_size=1000)
+    model.objects.bulk_update(updated, ['total', 'count'], batch_size=1000)
+    return previous
+
+
+def _budget_events(previous: dict, deltas: dict) -> list:
+    """Outbox rows for budgets crossed in the current month by this chunk."""
+    current = month_start(timezone.localdate())
+    keys = [k for k in deltas if k[1] == current]
+    if not keys:
+        return []
+    budgets = {
+        (b.user_id, b.category): b
+        for b in Budget.objects.filter(user_id__in={k[0] for k in keys}, category__in={k[2] for k in keys})
+    }
+    events = []
+    for user_id, month, category in keys:
+        budget = budgets.get((user_id, category))
+        if budget is None:
+            continue
+        before = previous[(user_id, month, category)]
+        after = before + deltas[(user_id, month, category)][0]
+        if before < budget.monthly_limit <= after:
+            payload = {'category': category, 'month': month.isoformat(), 'limit': f'{budget.monthly_limit:.2f}', 'spent': f'{after:.2f}'}
+            events.append(OutboxEvent(topic='budget.exceeded', payload=payload, user_id=user_id))
+    return events
+
+
+def fold_range(model, lo: int, hi: int) -> None:
+    rows = _spending(model, lo, hi)
+    categories = {
+        (r['user_id'], r['month'], r['category']): [r['total'], r['count']]
+        for r in rows.values('user_id', 'month', 'category').annotate(total=Sum('amount'), count=Count('id')).order_by()
+    }
+    merchants = defaultdict(lambda: [ZERO, 0])
+    for r in rows.exclude(description='').values('user_id', 'month', 'description').annotate(total=Sum('amount'), count=Count('id')).order_by():
+        merchant = normalize_merchant(r['description'])
+        if merchant:
+            merchants[(r['user_id'], r['month'], merchant)][0] += r['total']
+            merchants[(r['user_id'], r['month'], merchant)][1] += r['count']
+    previous = _upsert(MonthlySpending, 'category', categories)
+    _upsert(MerchantSpending, 'merchant', merchants)
+    OutboxEvent.objects.bulk_create(_budget_events(previous, categories))
+
+
+def refresh(chunk_size: int = 5000) -> int:
+    """Fold settled ledger rows past the cursor; returns the number of id-range chunks processed."""
+    settled = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    high = Transaction.objects.filter(created_at__lt=settled).aggregate(m=Max('id'))['m'] or 0
+    chunks = 0
+    while True:
+        with sharding.atomic():
+            cursor, _ = AggregateCursor.objects.select_for_update().get_or_create(name=CURSOR)
+            if cursor.last_id >= high:
+                return chunks
+            upper = min(cursor.last_id + chunk_size, high)
+            fold_range(Transaction, cursor.last_id, upper)
+            cursor.last_id = upper
+            cursor.save(update_fields=['last_id', 'updated_at'])
+        chunks += 1
+
+
+def rebuild(chunk_size: int = 5000) -> int:
+    """Recompute everything, including archived history, then continue incrementally."""
+    with sharding.atomic():
+        MonthlySpending.objects.all().delete()
+        MerchantSpending.objects.all().delete()
+        AggregateCursor.objects.update_or_create(name=CURSOR, defaults={'last_id': 0})
+        high = ArchivedTransaction.objects.aggregate(m=Max('id'))['m'] or 0
+        for lo in range(0, high, chunk_size):
+            fold_range(ArchivedTransaction, lo, lo + chunk_size)
+    return refresh(chunk_size)
+
+
+def insights(user, months: int = 6) -> dict:
+    current = month_start(timezone.localdate())
+    month_list = [add_months(current, -i) for i in range(months - 1, -1, -1)]
+    by_category = {category: {m: ZERO for m in month_list} for category, _ in Transaction.CATEGORY_CHOICES}
+    for row in MonthlySpending.objects.filter(user=user, month__gte=month_list[0]).values('month', 'category', 'total'):
+        by_category[row['category']][row['month']] = row['total']
+
+    previous = add_months(current, -1)
+    categories = []
+    for category, label in Transaction.CATEGORY_CHOICES:
+        series = by_category[category]
+        this, last = series[current], series.get(previous, ZERO)
+        categories.append({
+            'category': category,
+            'label': label,
+            'months': [series[m] for m in month_list],
+            'current': this,
+            'previous': last,
+            'change': this - last,
+            'change_pct': round((this - last) / last * 100, 1) if last else None,
+        })
+
+    merchants = list(
+        MerchantSpending.objects.filter(user=user, month__gte=add_months(current, -2))
+        .values('merchant')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by('-total')[:10]
+    )
+
+    budgets = []
+    for budget in Budget.objects.filter(user=user).order_by('category'):
+        spent = by_category[budget.category][current]
+        ratio = spent / budget.monthly_limit if budget.monthly_limit else Decimal(0)
+        budgets.append({
+            'category': budget.category,
+            'label': budget.get_category_display(),
+            'limit': budget.monthly_limit,
+            'spent': spent,
+            'remaining': budget.monthly_limit - spent,
+            'percent': min(int(ratio * 100), 100),
+            'status': 'over' if ratio >= 1 else 'near' if ratio >= BUDGET_WARNING else 'ok',
+        })
+
+    cursor = AggregateCursor.objects.filter(name=CURSOR).values_list('updated_at', flat=True).first()
+    return {
+        'months': month_list,
+        'categories': categories,
+        'totals': [sum((c['months'][i] for c in categories), ZERO) for i in range(len(month_list))],
+        'merchants': merchants,
+        'budgets': budgets,
+        'as_of': cursor,
+    }
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from bankx import sharding
+from transactions.archive import archive_chunk, archive_cutoff, archive_days
+
+
+class Command(BaseCommand):
+    help = 'Move transactions older than the archive horizon into the cold archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Archive rows older than this many days (default TRANSACTION_ARCHIVE_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    @sharding.per_shard
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else archive_days()
+        if days < archive_days():
+            # History only consults the archive for ranges older than the configured horizon
+            raise CommandError(f'--days must be at least TRANSACTION_ARCHIVE_DAYS ({archive_days()})')
+        cutoff = archive_cutoff(days)
+        total = 0
+        while True:
+            moved = archive_chunk(cutoff, options['chunk_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f'Archived {total} transactions...')
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} transactions older than {cutoff:%Y-%m-%d}'))
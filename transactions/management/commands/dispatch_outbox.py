@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from bankx import sharding
+from transactions.outbox import dispatch_batch, get_sinks
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending outbox events to the configured sinks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=8, help='Mark an event dead after this many failures')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when drained')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls with --loop')
+
+    def handle(self, *args, **options):
+        sinks = get_sinks()
+        total_sent = total_failed = 0
+        while True:
+            busy = False
+            for alias in sharding.active_databases():
+                with sharding.using(alias):
+                    sent, failed = dispatch_batch(sinks, options['batch_size'], options['max_attempts'])
+                total_sent += sent
+                total_failed += failed
+                busy = busy or bool(sent or failed)
+            if busy:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Dispatched {total_sent} outbox events ({total_failed} failed, will retry)'))
@@ -0,0 +1,32 @@
+import json
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run a local HTTP endpoint that prints batches posted by the outbox WebhookSink'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                for event in json.loads(body or b'{}').get('events', []):
+                    stdout.write(f"{event['id']} {event['topic']} {json.dumps(event['payload'])}")
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(f"Listening on http://127.0.0.1:{options['port']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from bankx import sharding
+from transactions.insights import rebuild, refresh
+
+
+class Command(BaseCommand):
+    help = 'Fold new ledger rows into the per-category and per-merchant spending aggregates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--rebuild', action='store_true', help='Recompute from scratch, including archived transactions')
+
+    @sharding.per_shard
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            chunks = rebuild(options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt spending insights ({chunks} incremental chunks)'))
+            return
+        chunks = refresh(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Folded {chunks} chunks into spending insights'))
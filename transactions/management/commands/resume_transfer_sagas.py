@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from bankx import sharding
+from transactions.models import TransferSaga
+from transactions.sagas import resume
+
+
+class Command(BaseCommand):
+    help = 'Finish cross-shard transfers whose credit leg has not run, refunding the sender when it cannot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=60, help='Only retry sagas idle for this many seconds')
+        parser.add_argument('--max-attempts', type=int, default=20, help='Refund the sender after this many failed credits')
+
+    @sharding.per_shard
+    def handle(self, *args, **options):
+        counts = resume(options['older_than'], options['max_attempts'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Completed {counts[TransferSaga.STATUS_COMPLETED]} transfers, refunded {counts[TransferSaga.STATUS_COMPENSATED]}; "
+            f"{counts[TransferSaga.STATUS_DEBITED]} still waiting"
+        ))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0002_loan_document'),
+        ('transactions', '0003_outboxevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountCarryForward',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archived_through', models.DateTimeField()),
+                ('deposits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deposits_count', models.PositiveIntegerField(default=0)),
+                ('withdrawals', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('withdrawals_count', models.PositiveIntegerField(default=0)),
+                ('transfers_out', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transfers_out_count', models.PositiveIntegerField(default=0)),
+                ('transfers_in', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transfers_in_count', models.PositiveIntegerField(default=0)),
+                ('categories', models.JSONField(default=dict, help_text='{category: {"total": "0.00", "count": 0}} for outgoing rows')),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='carry_forward', to='bank.account')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('deposit', 'Deposit'), ('withdraw', 'Withdraw'), ('transfer', 'Transfer')], max_length=20)),
+                ('category', models.CharField(choices=[('salary', 'Salary'), ('bills', 'Bills'), ('shopping', 'Shopping'), ('other', 'Other')], default='other', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('receipt_pdf', models.FileField(blank=True, null=True, upload_to='receipts/')),
+                ('nonce', models.CharField(max_length=64, unique=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='bank.account')),
+                ('related_account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_related_transactions', to='bank.account')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='transaction_user_id_60251a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0002_loan_document'),
+        ('transactions', '0004_accountcarryforward_archivedtransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskDecision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('deposit', 'Deposit'), ('withdraw', 'Withdraw'), ('transfer', 'Transfer')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('action', models.CharField(choices=[('review', 'Allowed, flagged for review'), ('block', 'Blocked')], max_length=20)),
+                ('rule', models.CharField(max_length=100)),
+                ('reason', models.CharField(max_length=255)),
+                ('reviewed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='risk_decisions', to='bank.account')),
+                ('recipient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='bank.account')),
+            ],
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_start_at(apps, schema_editor):
+    ScheduledTransfer = apps.get_model('transactions', 'ScheduledTransfer')
+    ScheduledTransfer.objects.filter(start_at__isnull=True).update(start_at=F('next_run'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0004_loan_document_content_type_loan_document_preview_and_more'),
+        ('transactions', '0005_riskdecision'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='business_day',
+            field=models.CharField(choices=[('none', 'Run on the exact date'), ('following', 'Next business day'), ('preceding', 'Previous business day'), ('modified_following', 'Next business day in the same month')], default='none', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='end_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='interval',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Every N days/weeks/months'),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='max_occurrences',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='month_day',
+            field=models.SmallIntegerField(blank=True, help_text='Monthly: day of month, -1 for the last day', null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='occurrence_index',
+            field=models.PositiveIntegerField(default=0, help_text='Index of the occurrence next_run refers to'),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='start_at',
+            field=models.DateTimeField(help_text='First occurrence; its time of day is kept', null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='week_of_month',
+            field=models.SmallIntegerField(blank=True, choices=[(1, 'First'), (2, 'Second'), (3, 'Third'), (4, 'Fourth'), (-1, 'Last')], help_text='Monthly: nth weekday, with weekday', null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransfer',
+            name='weekday',
+            field=models.SmallIntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledtransfer',
+            index=models.Index(fields=['is_active', 'next_run'], name='transaction_is_acti_4c43ee_idx'),
+        ),
+        migrations.RunPython(backfill_start_at, migrations.RunPython.noop),
+    ]
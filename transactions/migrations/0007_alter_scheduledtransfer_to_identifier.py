@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_scheduledtransfer_business_day_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scheduledtransfer',
+            name='to_identifier',
+            field=models.CharField(db_index=True, help_text='Recipient account number or email', max_length=255),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_alter_scheduledtransfer_to_identifier'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregateCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('salary', 'Salary'), ('bills', 'Bills'), ('shopping', 'Shopping'), ('other', 'Other')], max_length=20)),
+                ('monthly_limit', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='unique_budget')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MerchantSpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('merchant', models.CharField(max_length=100)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merchant_spending', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'merchant'), name='unique_merchant_spending')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlySpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('category', models.CharField(choices=[('salary', 'Salary'), ('bills', 'Bills'), ('shopping', 'Shopping'), ('other', 'Other')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spending', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'category'), name='unique_monthly_spending')],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+from django.db import migrations, transaction
+from django.db.utils import OperationalError
+
+ACCOUNTS = (
+    "COALESCE((SELECT account_number FROM bank_account WHERE id = new.account_id), '') || ' ' || "
+    "COALESCE((SELECT account_number FROM bank_account WHERE id = new.related_account_id), '')"
+)
+
+
+def ledger_sql(source: str, fts: str) -> list:
+    insert = f"INSERT INTO {fts}(rowid, description, accounts) VALUES (new.id, new.description, {ACCOUNTS});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(description, accounts, tokenize = 'unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN DELETE FROM {fts} WHERE rowid = old.id; END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF description, account_id, related_account_id ON {source} "
+        f"BEGIN DELETE FROM {fts} WHERE rowid = old.id; {insert} END",
+        f"INSERT INTO {fts}(rowid, description, accounts) SELECT t.id, t.description, "
+        f"COALESCE(a.account_number, '') || ' ' || COALESCE(r.account_number, '') FROM {source} t "
+        f"LEFT JOIN bank_account a ON a.id = t.account_id LEFT JOIN bank_account r ON r.id = t.related_account_id",
+    ]
+
+
+BENEFICIARY_COLUMNS = 'name, nickname, account_number, email'
+BENEFICIARY_INSERT = (
+    f"INSERT INTO beneficiary_search(rowid, {BENEFICIARY_COLUMNS}) "
+    "VALUES (new.id, new.name, new.nickname, new.account_number, new.email);"
+)
+
+SQLITE = ledger_sql('transactions_transaction', 'transaction_search') + ledger_sql(
+    'transactions_archivedtransaction', 'archived_transaction_search',
+) + [
+    f"CREATE VIRTUAL TABLE beneficiary_search USING fts5({BENEFICIARY_COLUMNS}, tokenize = 'unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER beneficiary_search_ai AFTER INSERT ON transactions_beneficiary BEGIN {BENEFICIARY_INSERT} END",
+    "CREATE TRIGGER beneficiary_search_ad AFTER DELETE ON transactions_beneficiary BEGIN DELETE FROM beneficiary_search WHERE rowid = old.id; END",
+    "CREATE TRIGGER beneficiary_search_au AFTER UPDATE ON transactions_beneficiary "
+    f"BEGIN DELETE FROM beneficiary_search WHERE rowid = old.id; {BENEFICIARY_INSERT} END",
+    f"INSERT INTO beneficiary_search(rowid, {BENEFICIARY_COLUMNS}) SELECT id, {BENEFICIARY_COLUMNS} FROM transactions_beneficiary",
+]
+
+SQLITE_REVERSE = [
+    'DROP TABLE IF EXISTS transaction_search',
+    'DROP TABLE IF EXISTS archived_transaction_search',
+    'DROP TABLE IF EXISTS beneficiary_search',
+] + [
+    f'DROP TRIGGER IF EXISTS {fts}_{suffix}'
+    for fts in ('transaction_search', 'archived_transaction_search', 'beneficiary_search')
+    for suffix in ('ai', 'ad', 'au')
+]
+
+POSTGRES = [
+    "CREATE INDEX transaction_description_tsv ON transactions_transaction USING gin (to_tsvector('simple', description))",
+    "CREATE INDEX archived_description_tsv ON transactions_archivedtransaction USING gin (to_tsvector('simple', description))",
+    "CREATE INDEX beneficiary_search_tsv ON transactions_beneficiary USING gin "
+    "(to_tsvector('simple', name || ' ' || nickname || ' ' || account_number || ' ' || email))",
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS transaction_description_tsv',
+    'DROP INDEX IF EXISTS archived_description_tsv',
+    'DROP INDEX IF EXISTS beneficiary_search_tsv',
+]
+
+
+def _execute(schema_editor, statements: list) -> None:
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES)
+    elif vendor == 'sqlite':
+        try:
+            # Builds without FTS5 keep working on the icontains fallback in transactions/search.py
+            with transaction.atomic(using=schema_editor.connection.alias):
+                _execute(schema_editor, SQLITE)
+        except OperationalError:
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0005_account_interest_accrued_through_interestaccrual'),
+        ('transactions', '0008_aggregatecursor_budget_merchantspending_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
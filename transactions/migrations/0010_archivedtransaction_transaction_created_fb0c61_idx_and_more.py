@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0006_account_bank_accoun_created_47ff1a_idx'),
+        ('transactions', '0009_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['created_at'], name='transaction_created_fb0c61_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at'], name='transaction_created_67ce7b_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0006_account_bank_accoun_created_47ff1a_idx'),
+        ('transactions', '0010_archivedtransaction_transaction_created_fb0c61_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='scheduledtransfer',
+            name='transaction_is_acti_4c43ee_idx',
+        ),
+        migrations.AddIndex(
+            model_name='scheduledtransfer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_run'], name='scheduled_due_idx'),
+        ),
+    ]
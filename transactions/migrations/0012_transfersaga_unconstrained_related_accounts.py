@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0007_shardbucket_accountlocator'),
+        ('transactions', '0011_scheduledtransfer_partial_due_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedtransaction',
+            name='related_account',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_related_transactions', to='bank.account'),
+        ),
+        migrations.AlterField(
+            model_name='riskdecision',
+            name='recipient',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='bank.account'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='related_account',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='related_transactions', to='bank.account'),
+        ),
+        migrations.CreateModel(
+            name='TransferSaga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_account_id', models.BigIntegerField(help_text='Global account id; resolved through bank.AccountLocator')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('debited', 'Debited, awaiting credit'), ('completed', 'Completed'), ('compensated', 'Refunded to sender')], default='debited', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('debit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='saga', to='transactions.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='transaction_status_658500_idx')],
+            },
+        ),
+    ]
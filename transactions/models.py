@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from bank.models import Account
 
 
@@ -26,7 +27,8 @@ class Transaction(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions')
-    related_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='related_transactions')
+    # Unconstrained: with sharding the recipient account may live on another database
+    related_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='related_transactions', db_constraint=False)
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPE_CHOICES)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default=CATEGORY_OTHER)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
@@ -35,6 +37,10 @@ class Transaction(models.Model):
     receipt_pdf = models.FileField(upload_to='receipts/', null=True, blank=True)
     nonce = models.CharField(max_length=64, unique=True, help_text='Idempotency token to prevent duplicate transactions')
 
+    class Meta:
+        # Admin date hierarchy and archiving range over created_at
+        indexes = [models.Index(fields=['created_at'])]
+
     def __str__(self) -> str:
         return f"{self.get_transaction_type_display()} {self.amount} on {self.created_at:%Y-%m-%d}"
 
@@ -62,20 +68,222 @@ class ScheduledTransfer(models.Model):
         (FREQ_WEEKLY, 'Weekly'),
         (FREQ_MONTHLY, 'Monthly'),
     ]
+    ADJUST_NONE = 'none'
+    ADJUST_FOLLOWING = 'following'
+    ADJUST_PRECEDING = 'preceding'
+    ADJUST_MODIFIED_FOLLOWING = 'modified_following'
+    ADJUST_CHOICES = [
+        (ADJUST_NONE, 'Run on the exact date'),
+        (ADJUST_FOLLOWING, 'Next business day'),
+        (ADJUST_PRECEDING, 'Previous business day'),
+        (ADJUST_MODIFIED_FOLLOWING, 'Next business day in the same month'),
+    ]
+    WEEK_OF_MONTH_CHOICES = [(1, 'First'), (2, 'Second'), (3, 'Third'), (4, 'Fourth'), (-1, 'Last')]
+    WEEKDAY_CHOICES = [(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scheduled_transfers')
     from_account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='scheduled_outgoing')
-    to_identifier = models.CharField(max_length=255, help_text='Recipient account number or email')
+    to_identifier = models.CharField(max_length=255, db_index=True, help_text='Recipient account number or email')
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     category = models.CharField(max_length=20, choices=Transaction.CATEGORY_CHOICES, default=Transaction.CATEGORY_OTHER)
     description = models.CharField(max_length=255, blank=True)
     frequency = models.CharField(max_length=20, choices=FREQ_CHOICES, default=FREQ_MONTHLY)
+    # Recurrence rule, evaluated by transactions/recurrence.py. Occurrence k is
+    # computed directly from start_at, so nothing drifts between runs.
+    start_at = models.DateTimeField(null=True, help_text='First occurrence; its time of day is kept')
+    interval = models.PositiveSmallIntegerField(default=1, help_text='Every N days/weeks/months')
+    month_day = models.SmallIntegerField(null=True, blank=True, help_text='Monthly: day of month, -1 for the last day')
+    week_of_month = models.SmallIntegerField(null=True, blank=True, choices=WEEK_OF_MONTH_CHOICES, help_text='Monthly: nth weekday, with weekday')
+    weekday = models.SmallIntegerField(null=True, blank=True, choices=WEEKDAY_CHOICES)
+    business_day = models.CharField(max_length=20, choices=ADJUST_CHOICES, default=ADJUST_NONE)
+    end_date = models.DateField(null=True, blank=True)
+    max_occurrences = models.PositiveIntegerField(null=True, blank=True)
+    occurrence_index = models.PositiveIntegerField(default=0, help_text='Index of the occurrence next_run refers to')
     next_run = models.DateTimeField()
     last_run = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Partial rather than (is_active, next_run): Django compiles is_active=True to a
+        # bare "is_active" term, which SQLite cannot match against a composite index
+        indexes = [models.Index(fields=['next_run'], condition=models.Q(is_active=True), name='scheduled_due_idx')]
+
     def __str__(self) -> str:
         return f"Scheduled {self.amount} {self.frequency}"
 
-# Create your models here.
+    def clean(self):
+        from .recurrence import validate
+        validate(self)
+
+
+class ArchivedTransaction(models.Model):
+    """Cold copy of a :class:`Transaction` moved out by ``archive_transactions``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_transactions')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='archived_transactions')
+    related_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_related_transactions', db_constraint=False)
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    category = models.CharField(max_length=20, choices=Transaction.CATEGORY_CHOICES, default=Transaction.CATEGORY_OTHER)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField()
+    receipt_pdf = models.FileField(upload_to='receipts/', null=True, blank=True)
+    nonce = models.CharField(max_length=64, unique=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at']), models.Index(fields=['created_at'])]
+
+    def __str__(self) -> str:
+        return f"{self.get_transaction_type_display()} {self.amount} on {self.created_at:%Y-%m-%d} (archived)"
+
+
+class AccountCarryForward(models.Model):
+    """Running totals of everything archived for an account, so summaries stay complete."""
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, related_name='carry_forward')
+    archived_through = models.DateTimeField()
+    deposits = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    deposits_count = models.PositiveIntegerField(default=0)
+    withdrawals = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    withdrawals_count = models.PositiveIntegerField(default=0)
+    transfers_out = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transfers_out_count = models.PositiveIntegerField(default=0)
+    transfers_in = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transfers_in_count = models.PositiveIntegerField(default=0)
+    categories = models.JSONField(default=dict, help_text='{category: {"total": "0.00", "count": 0}} for outgoing rows')
+
+    def __str__(self) -> str:
+        return f"CarryForward({self.account.account_number} through {self.archived_through:%Y-%m-%d})"
+
+
+class RiskDecision(models.Model):
+    ACTION_REVIEW = 'review'
+    ACTION_BLOCK = 'block'
+    ACTION_CHOICES = [
+        (ACTION_REVIEW, 'Allowed, flagged for review'),
+        (ACTION_BLOCK, 'Blocked'),
+    ]
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='risk_decisions')
+    recipient = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False)
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    rule = models.CharField(max_length=100)
+    reason = models.CharField(max_length=255)
+    reviewed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.action} {self.amount} on {self.account.account_number} ({self.rule})"
+
+
+class OutboxEvent(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbox_events')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self) -> str:
+        return f"{self.topic} #{self.pk} ({self.status})"
+
+
+class MonthlySpending(models.Model):
+    """Outgoing totals per user, month and category, maintained by ``refresh_spending_insights``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_spending')
+    month = models.DateField(help_text='First day of the month')
+    category = models.CharField(max_length=20, choices=Transaction.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'month', 'category'], name='unique_monthly_spending')]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} {self.month:%Y-%m} {self.category}: {self.total}"
+
+
+class MerchantSpending(models.Model):
+    """Outgoing totals per user, month and normalised description."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='merchant_spending')
+    month = models.DateField(help_text='First day of the month')
+    merchant = models.CharField(max_length=100)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'month', 'merchant'], name='unique_merchant_spending')]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} {self.month:%Y-%m} {self.merchant}: {self.total}"
+
+
+class Budget(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
+    category = models.CharField(max_length=20, choices=Transaction.CATEGORY_CHOICES)
+    monthly_limit = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'category'], name='unique_budget')]
+
+    def __str__(self) -> str:
+        return f"Budget({self.user_id}, {self.category}, {self.monthly_limit})"
+
+
+class AggregateCursor(models.Model):
+    """Highest ledger id folded into a materialised aggregate."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} @ {self.last_id}"
+
+
+class TransferSaga(models.Model):
+    """A transfer between customers on different shards (see transactions/sagas.py).
+
+    Lives on the sender's shard and is written in the same local transaction as
+    the debit; the credit leg runs on the recipient's shard afterwards.
+    """
+    STATUS_DEBITED = 'debited'
+    STATUS_COMPLETED = 'completed'
+    STATUS_COMPENSATED = 'compensated'
+    STATUS_CHOICES = [
+        (STATUS_DEBITED, 'Debited, awaiting credit'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_COMPENSATED, 'Refunded to sender'),
+    ]
+
+    # Closed sagas go with their debit when it is archived; archive_transactions keeps debits of open ones
+    debit = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='saga')
+    to_account_id = models.BigIntegerField(help_text='Global account id; resolved through bank.AccountLocator')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_DEBITED)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'updated_at'])]
+
+    def __str__(self) -> str:
+        return f"Saga #{self.pk} {self.amount} to account {self.to_account_id} ({self.status})"
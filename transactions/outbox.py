@@ -0,0 +1,148 @@
+"""Transactional outbox: events are written alongside the change that caused them
+and delivered later by ``manage.py dispatch_outbox``.
+
+Delivery is at-least-once. A batch is leased, handed to every configured sink and
+only marked sent once all sinks accept it, so a crash or a failing sink causes a
+retry (with exponential backoff) of the whole batch. Sinks must tolerate
+duplicates, e.g. by keying on the event ``id``.
+"""
+import json
+import urllib.request
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from bankx import sharding
+from .events import transaction_payload
+from .models import OutboxEvent
+
+DEFAULT_SINKS = [{'BACKEND': 'transactions.outbox.EmailSink'}]
+# Rows are hidden from other dispatchers for this long while a batch is in flight
+LEASE = timedelta(minutes=5)
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 6 * 60 * 60
+
+
+def record_event(topic: str, payload: dict, user=None) -> OutboxEvent:
+    """Must be called inside the ``atomic()`` block that performs the change."""
+    return OutboxEvent.objects.create(topic=topic, payload=payload, user=user)
+
+
+def transaction_events(t) -> list:
+    """Unsaved outbox rows for ``t``, so batch jobs can ``bulk_create`` them."""
+    payload = transaction_payload(t)
+    events = [OutboxEvent(topic='transaction.created', payload=payload, user_id=t.user_id)]
+    if t.related_account is not None and t.related_account.user_id != t.user_id:
+        events.append(OutboxEvent(topic='transaction.received', payload=payload, user_id=t.related_account.user_id))
+    return events
+
+
+def record_transaction(t) -> None:
+    OutboxEvent.objects.bulk_create(transaction_events(t))
+
+
+def record_loan(loan) -> None:
+    payload = {'id': loan.id, 'amount': f'{loan.amount:.2f}', 'status': loan.status}
+    record_event(f'loan.{loan.status}', payload, user=loan.user)
+
+
+def serialize(event: OutboxEvent) -> dict:
+    return {
+        'id': event.id,
+        'topic': event.topic,
+        'user_id': event.user_id,
+        'payload': event.payload,
+        'created_at': event.created_at.isoformat(),
+    }
+
+
+class Sink:
+    def __init__(self, **options):
+        self.options = options
+
+    def send(self, events: list) -> None:
+        raise NotImplementedError
+
+
+class EmailSink(Sink):
+    def send(self, events: list) -> None:
+        messages = []
+        for event in events:
+            if event.user is None or not event.user.email:
+                continue
+            body = '\n'.join(f'{key}: {value}' for key, value in event.payload.items())
+            messages.append((f'BankX: {event.topic}', body, settings.DEFAULT_FROM_EMAIL, [event.user.email]))
+        if messages:
+            send_mass_mail(messages, fail_silently=False)
+
+
+class WebhookSink(Sink):
+    def send(self, events: list) -> None:
+        request = urllib.request.Request(
+            self.options['URL'],
+            data=json.dumps({'events': [serialize(e) for e in events]}).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=self.options.get('TIMEOUT', 10)) as response:
+            if response.status >= 300:
+                raise OSError(f'Webhook responded with HTTP {response.status}')
+
+
+class FileSink(Sink):
+    def send(self, events: list) -> None:
+        path = Path(self.options['PATH'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('a') as fh:
+            for event in events:
+                fh.write(json.dumps(serialize(event)) + '\n')
+
+
+def get_sinks() -> list:
+    return [
+        import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+        for config in getattr(settings, 'OUTBOX_SINKS', DEFAULT_SINKS)
+    ]
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def dispatch_batch(sinks: list, batch_size: int = 100, max_attempts: int = 8) -> tuple:
+    """Deliver one batch of due events. Returns ``(sent, failed)``."""
+    now = timezone.now()
+    lease = now + LEASE
+    due = OutboxEvent.objects.filter(status=OutboxEvent.STATUS_PENDING, next_attempt_at__lte=now)
+    # Lease the batch before doing any slow I/O so no transaction is held open.
+    # Row locks keep concurrent dispatchers apart where the database has them;
+    # the update only takes rows still due, so without them a row leased by
+    # another dispatcher in the meantime is left to it.
+    with sharding.atomic():
+        ids = list(due.select_for_update(skip_locked=True).order_by('id').values_list('id', flat=True)[:batch_size])
+        if ids:
+            due.filter(id__in=ids).update(next_attempt_at=lease)
+    events = list(OutboxEvent.objects.filter(id__in=ids, next_attempt_at=lease).select_related('user').order_by('id'))
+    ids = [event.id for event in events]
+    if not ids:
+        return 0, 0
+    try:
+        for sink in sinks:
+            sink.send(events)
+    except Exception as exc:
+        failed = OutboxEvent.objects.filter(id__in=ids)
+        failed.update(attempts=F('attempts') + 1, last_error=f'{type(exc).__name__}: {exc}'[:2000])
+        for attempts in set(failed.values_list('attempts', flat=True)):
+            batch = failed.filter(attempts=attempts)
+            if attempts >= max_attempts:
+                batch.update(status=OutboxEvent.STATUS_DEAD)
+            else:
+                batch.update(next_attempt_at=timezone.now() + backoff(attempts))
+        return 0, len(ids)
+    OutboxEvent.objects.filter(id__in=ids).update(status=OutboxEvent.STATUS_SENT, sent_at=timezone.now(), last_error='')
+    return len(ids), 0
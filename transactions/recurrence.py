@@ -0,0 +1,191 @@
+"""Calendar-accurate recurrence for :class:`ScheduledTransfer`.
+
+Occurrence ``k`` of a schedule is a pure function of its rule and ``start_at``:
+the k-th day/week/month step, resolved to a day of month or nth weekday, clamped
+to the month end and shifted off weekends and ``BANK_HOLIDAYS``. Finding the next
+occurrence after a moment is an arithmetic estimate plus at most a couple of
+corrections, and forecasts merge the per-schedule streams lazily, so nothing is
+simulated step by step.
+"""
+import calendar
+import heapq
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .models import ScheduledTransfer as ST
+
+PERIOD_DAYS = {ST.FREQ_DAILY: 1, ST.FREQ_WEEKLY: 7}
+
+
+@lru_cache(maxsize=1)
+def _holidays(configured: tuple) -> frozenset:
+    return frozenset(date.fromisoformat(str(d)) for d in configured)
+
+
+def holidays() -> frozenset:
+    return _holidays(tuple(getattr(settings, 'BANK_HOLIDAYS', ())))
+
+
+def is_business_day(d: date) -> bool:
+    return d.weekday() < 5 and d not in holidays()
+
+
+def adjust(d: date, rule: str) -> date:
+    if rule == ST.ADJUST_NONE or is_business_day(d):
+        return d
+    step = -1 if rule == ST.ADJUST_PRECEDING else 1
+    shifted = d
+    while not is_business_day(shifted):
+        shifted += timedelta(days=step)
+    if rule == ST.ADJUST_MODIFIED_FOLLOWING and shifted.month != d.month:
+        return adjust(d, ST.ADJUST_PRECEDING)
+    return shifted
+
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """``n``-th ``weekday`` (0 = Monday) of the month; ``n == -1`` is the last one."""
+    days = calendar.monthrange(year, month)[1]
+    if n == -1:
+        last = date(year, month, days)
+        return last - timedelta(days=(last.weekday() - weekday) % 7)
+    first = date(year, month, 1)
+    day = 1 + (weekday - first.weekday()) % 7 + 7 * (n - 1)
+    # A fifth weekday that does not exist falls back to the last one
+    return date(year, month, day) if day <= days else nth_weekday(year, month, weekday, -1)
+
+
+def _start(s) -> datetime:
+    return timezone.localtime(s.start_at or s.next_run)
+
+
+def nominal_date(s, k: int) -> date:
+    """Unadjusted calendar date of occurrence ``k``."""
+    start = _start(s).date()
+    if s.frequency in PERIOD_DAYS:
+        return start + timedelta(days=PERIOD_DAYS[s.frequency] * s.interval * k)
+    if s.frequency == ST.FREQ_ONCE:
+        return start
+    month_index = start.month - 1 + s.interval * k
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    if s.week_of_month is not None and s.weekday is not None:
+        return nth_weekday(year, month, s.weekday, s.week_of_month)
+    days = calendar.monthrange(year, month)[1]
+    day = s.month_day or start.day
+    return date(year, month, days if day == -1 else min(day, days))
+
+
+def occurrence(s, k: int):
+    """Aware datetime of occurrence ``k``, or None once the rule has ended."""
+    if k < 0 or (s.frequency == ST.FREQ_ONCE and k > 0) or (s.max_occurrences and k >= s.max_occurrences):
+        return None
+    d = adjust(nominal_date(s, k), s.business_day)
+    if s.end_date and d > s.end_date:
+        return None
+    start = _start(s)
+    return timezone.make_aware(datetime.combine(d, start.time().replace(tzinfo=None)), start.tzinfo)
+
+
+def _estimate(s, moment: datetime) -> int:
+    start = _start(s)
+    moment = timezone.localtime(moment)
+    if s.frequency in PERIOD_DAYS:
+        return max(0, (moment.date() - start.date()).days // (PERIOD_DAYS[s.frequency] * s.interval))
+    if s.frequency == ST.FREQ_ONCE:
+        return 0
+    months = (moment.year - start.year) * 12 + moment.month - start.month
+    return max(0, months // s.interval)
+
+
+def first_after(s, moment: datetime, inclusive: bool = False):
+    """``(k, when)`` of the first occurrence after ``moment``, or None if there is none."""
+    k = _estimate(s, moment)
+    # The estimate is exact up to business-day shifts and day-of-month resolution
+    while k > 0:
+        previous = occurrence(s, k - 1)
+        if previous is None or previous < moment or (previous == moment and not inclusive):
+            break
+        k -= 1
+    while True:
+        when = occurrence(s, k)
+        if when is None:
+            if s.frequency == ST.FREQ_ONCE or s.max_occurrences or s.end_date:
+                return None
+        elif when > moment or (when == moment and inclusive):
+            return k, when
+        k += 1
+
+
+def occurrences(s, start_index: int = None, until: datetime = None):
+    """Yield ``(k, when)`` from ``start_index`` (default: the next run) in order."""
+    k = s.occurrence_index if start_index is None else start_index
+    previous = None
+    while True:
+        when = occurrence(s, k)
+        if when is None or (until is not None and when > until):
+            return
+        # Business-day adjustment can fold two nominal dates onto one
+        if when != previous:
+            yield k, when
+        previous = when
+        k += 1
+
+
+def upcoming(schedules, until: datetime, limit: int = None) -> list:
+    """Merged ``(when, schedule)`` list of pending occurrences across ``schedules`` up to ``until``."""
+    def stream(s):
+        for _, when in occurrences(s, until=until):
+            yield when, s
+
+    streams = [stream(s) for s in schedules if s.is_active]
+    merged = heapq.merge(*streams, key=lambda item: item[0])
+    return list(islice(merged, limit)) if limit else list(merged)
+
+
+def initialize(s) -> None:
+    """Set ``start_at``/``next_run`` for a new schedule from the first requested run."""
+    s.start_at = s.start_at or s.next_run
+    first = first_after(s, s.start_at, inclusive=True)
+    if first is None:
+        s.is_active = False
+        return
+    s.occurrence_index, s.next_run = first
+
+
+def advance(s, now: datetime) -> None:
+    """Move a schedule that just ran to its first occurrence after ``now``.
+
+    Missed occurrences (e.g. while the scheduler was down) are skipped rather than
+    executed back to back.
+    """
+    following = first_after(s, max(now, s.next_run))
+    if following is None:
+        s.is_active = False
+        return
+    s.occurrence_index, s.next_run = following
+
+
+def validate(s) -> None:
+    errors = {}
+    if s.interval is not None and s.interval < 1:
+        errors['interval'] = 'Must be at least 1.'
+    if s.month_day is not None and not (s.month_day == -1 or 1 <= s.month_day <= 31):
+        errors['month_day'] = 'Use 1-31, or -1 for the last day of the month.'
+    if s.week_of_month is not None and s.week_of_month not in dict(ST.WEEK_OF_MONTH_CHOICES):
+        errors['week_of_month'] = 'Use 1-4, or -1 for the last week.'
+    if s.weekday is not None and s.weekday not in dict(ST.WEEKDAY_CHOICES):
+        errors['weekday'] = 'Use 0 (Monday) to 6 (Sunday).'
+    if s.max_occurrences is not None and s.max_occurrences < 1:
+        errors['max_occurrences'] = 'Must be at least 1.'
+    if (s.week_of_month is None) != (s.weekday is None):
+        errors['weekday'] = 'Set both the week of month and the weekday, or neither.'
+    if s.frequency != ST.FREQ_MONTHLY and (s.month_day is not None or s.week_of_month is not None):
+        errors['frequency'] = 'Day-of-month and nth-weekday rules only apply to monthly schedules.'
+    if s.month_day is not None and s.week_of_month is not None:
+        errors['month_day'] = 'Choose either a day of month or an nth weekday.'
+    if errors:
+        raise ValidationError(errors)
@@ -0,0 +1,154 @@
+"""Velocity checks for outgoing money.
+
+Each account has a sliding window of its recent debits (timestamp, cents) and the
+set of recipients it has paid before, kept in the Django cache. A window is
+hydrated from the ledger once on a cache miss; afterwards evaluating the rules in
+``settings.RISK_RULES`` touches only memory. Committed debits are appended via
+``on_commit``. Concurrent processes may race on the read-modify-write of a window,
+so limits are approximate under heavy contention. Only ``review``/``block``
+outcomes are written to :class:`RiskDecision`.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from bankx import sharding
+from .models import RiskDecision, Transaction
+
+ACTION_ALLOW = 'allow'
+DEBIT_TYPES = (Transaction.TYPE_WITHDRAW, Transaction.TYPE_TRANSFER)
+
+
+def _rules() -> list:
+    return settings.RISK_RULES
+
+
+def _horizon() -> int:
+    return max((rule.get('window', 0) for rule in _rules()), default=0) or 86400
+
+
+def _cents(amount) -> int:
+    return int(Decimal(amount) * 100)
+
+
+def _key(account_id: int) -> str:
+    return f'risk:window:{account_id}'
+
+
+class Window:
+    __slots__ = ('events', 'recipients')
+
+    def __init__(self, events=None, recipients=None):
+        self.events = events or []  # [(unix_ts, cents)] oldest first
+        self.recipients = recipients or set()
+
+    def prune(self, now: float, horizon: int) -> None:
+        cutoff = now - horizon
+        drop = 0
+        while drop < len(self.events) and self.events[drop][0] < cutoff:
+            drop += 1
+        if drop:
+            del self.events[:drop]
+
+    def totals(self, now: float, seconds: int) -> tuple:
+        cutoff = now - seconds
+        count = cents = 0
+        for ts, value in reversed(self.events):
+            if ts < cutoff:
+                break
+            count += 1
+            cents += value
+        return count, cents
+
+
+def _hydrate(account_id: int, horizon: int) -> Window:
+    since = timezone.now() - timedelta(seconds=horizon)
+    debits = Transaction.objects.filter(account_id=account_id, transaction_type__in=DEBIT_TYPES, created_at__gte=since)
+    events = [(created_at.timestamp(), _cents(amount)) for created_at, amount in debits.order_by('created_at').values_list('created_at', 'amount')]
+    recipients = set(
+        Transaction.objects.filter(account_id=account_id, transaction_type=Transaction.TYPE_TRANSFER, related_account__isnull=False)
+        .values_list('related_account_id', flat=True)
+        .distinct()
+    )
+    return Window(events, recipients)
+
+
+def _load(account_id: int, now: float) -> tuple:
+    horizon = _horizon()
+    window = cache.get(_key(account_id))
+    hydrated = window is None
+    if hydrated:
+        window = _hydrate(account_id, horizon)
+    window.prune(now, horizon)
+    if hydrated:
+        cache.set(_key(account_id), window, horizon)
+    return window, hydrated
+
+
+def get_window(account_id: int, now: float = None) -> Window:
+    return _load(account_id, now or time.time())[0]
+
+
+def _match(rule: dict, window: Window, now: float, cents: int, recipient_id) -> str:
+    if rule.get('new_recipient'):
+        if recipient_id is not None and recipient_id not in window.recipients and cents >= _cents(rule.get('min_amount', 0)):
+            return 'first payment to this recipient'
+        return ''
+    count, total = window.totals(now, rule['window'])
+    if 'max_count' in rule and count + 1 > rule['max_count']:
+        return f"more than {rule['max_count']} debits in {rule['window']}s"
+    if 'max_amount' in rule and total + cents > _cents(rule['max_amount']):
+        return f"more than {rule['max_amount']} debited in {rule['window']}s"
+    return ''
+
+
+def evaluate(account_id: int, amount, recipient_id=None) -> tuple:
+    """Returns ``(action, rule_name, reason)``; the strictest matching rule wins."""
+    now = time.time()
+    window = get_window(account_id, now)
+    cents = _cents(amount)
+    outcome = (ACTION_ALLOW, '', '')
+    for rule in _rules():
+        reason = _match(rule, window, now, cents, recipient_id)
+        if reason:
+            outcome = (rule['action'], rule['name'], reason)
+            if rule['action'] == RiskDecision.ACTION_BLOCK:
+                break
+    return outcome
+
+
+def check(account, amount, transaction_type: str, recipient=None):
+    """Evaluate the rules for a pending debit. Records and returns a non-allow decision, else ``None``."""
+    recipient_id = recipient.pk if recipient is not None else None
+    action, rule, reason = evaluate(account.pk, amount, recipient_id)
+    if action == ACTION_ALLOW:
+        return None
+    return RiskDecision.objects.create(
+        account_id=account.pk,
+        recipient_id=recipient_id,
+        transaction_type=transaction_type,
+        amount=amount,
+        action=action,
+        rule=rule,
+        reason=reason,
+    )
+
+
+def observe(account_id: int, amount, recipient_id=None) -> None:
+    """Add a committed debit to the account's window."""
+    def update():
+        now = time.time()
+        window, hydrated = _load(account_id, now)
+        if hydrated:
+            # Freshly read from the ledger, which already contains this debit
+            return
+        window.events.append((now, _cents(amount)))
+        if recipient_id is not None:
+            window.recipients.add(recipient_id)
+        cache.set(_key(account_id), window, _horizon())
+
+    sharding.on_commit(update)
@@ -0,0 +1,179 @@
+"""Transfers between customers on different shards.
+
+No database transaction spans two shards, so a cross-shard transfer runs as a
+saga of local transactions. Each step is idempotent:
+
+1. Debit, on the sender's shard: lock and debit the sender, write the transfer
+   row and a ``TransferSaga`` in ``debited`` state in one transaction.
+2. Credit, on the recipient's shard, once the debit has committed: credit the
+   recipient and write a deposit "Transfer from <number>". Its nonce is derived
+   from the debit's, so a repeated credit fails on the unique nonce instead of
+   paying twice. The saga becomes ``completed``.
+3. Compensation, on the sender's shard, when the recipient cannot be credited
+   (the account is gone): refund the sender with a deposit. The saga becomes
+   ``compensated``.
+
+A credit that fails for a transient reason (shard unreachable, bucket being
+moved) leaves the saga ``debited``. ``manage.py resume_transfer_sagas`` retries
+it and compensates after ``--max-attempts``. The sender sees the transfer at
+once; the recipient sees the money when the credit leg has run.
+"""
+import uuid
+from datetime import timedelta
+
+from django.db import DatabaseError, IntegrityError
+from django.utils import timezone
+
+from bank.models import Account
+from bankx import sharding
+from . import risk
+from .events import publish_transaction, transaction_payload
+from .models import OutboxEvent, Transaction, TransferSaga
+from .outbox import transaction_events
+from .services import TransactionError
+from .utils import generate_transaction_receipt_pdf
+
+
+def _nonce(saga: TransferSaga, step: str) -> str:
+    return f'{saga.debit.nonce}-{step}'
+
+
+def _deposit(user_id: int, account: Account, amount, category: str, description: str, nonce: str) -> Transaction:
+    account.balance += amount
+    account.save(update_fields=['balance'])
+    t = Transaction.objects.create(
+        user_id=user_id,
+        account=account,
+        transaction_type=Transaction.TYPE_DEPOSIT,
+        category=category,
+        amount=amount,
+        description=description,
+        nonce=nonce,
+    )
+    t.receipt_pdf.save(f"receipt_{t.id}.pdf", generate_transaction_receipt_pdf(t))
+    return t
+
+
+def start_transfer(user, from_account: Account, to_account: Account, amount, category: str, description: str) -> Transaction:
+    """Debit leg, on the current (sender's) shard. The credit leg runs when it commits."""
+    with sharding.atomic():
+        from_account = Account.objects.select_for_update().get(pk=from_account.pk)
+        if from_account.balance < amount:
+            raise TransactionError('Insufficient balance.')
+        from_account.balance -= amount
+        from_account.save(update_fields=['balance'])
+        risk.observe(from_account.pk, amount, to_account.pk)
+        t = Transaction.objects.create(
+            user=user,
+            account=from_account,
+            related_account=to_account,
+            transaction_type=Transaction.TYPE_TRANSFER,
+            category=category,
+            amount=amount,
+            description=description or '',
+            nonce=str(uuid.uuid4()),
+        )
+        t.receipt_pdf.save(f"receipt_{t.id}.pdf", generate_transaction_receipt_pdf(t))
+        # The recipient is told by the credit leg, once the money is theirs
+        OutboxEvent.objects.bulk_create(transaction_events(t)[:1])
+        publish_transaction(t, related=False)
+        saga = TransferSaga.objects.create(debit=t, to_account_id=to_account.pk, amount=amount)
+        # Robust: a failing credit leg must not turn the committed debit into an error page
+        sharding.on_commit(lambda: complete(saga), robust=True)
+    return t
+
+
+def _mark(saga: TransferSaga, status: str, error: str = '') -> str:
+    saga.status = status
+    saga.last_error = error
+    if status == TransferSaga.STATUS_DEBITED:
+        saga.attempts += 1
+    try:
+        saga.save(update_fields=['status', 'last_error', 'attempts', 'updated_at'])
+    except DatabaseError:
+        # The next resume_transfer_sagas run finds the credit by its nonce
+        pass
+    return status
+
+
+def complete(saga: TransferSaga) -> str:
+    """Credit leg. Returns the saga's new status."""
+    owner = sharding.account_owner(saga.to_account_id)
+    if owner is None:
+        return compensate(saga, 'The recipient account no longer exists.')
+    try:
+        with sharding.for_user(owner), sharding.atomic():
+            to_account = Account.objects.select_for_update().filter(pk=saga.to_account_id).first()
+            if to_account is None:
+                raise Account.DoesNotExist
+            nonce = _nonce(saga, 'credit')
+            if not Transaction.objects.filter(nonce=nonce).exists():
+                credit = _deposit(
+                    to_account.user_id, to_account, saga.amount, Transaction.CATEGORY_OTHER,
+                    f'Transfer from {saga.debit.account.account_number}', nonce,
+                )
+                OutboxEvent.objects.create(topic='transaction.received', payload=transaction_payload(credit), user_id=to_account.user_id)
+                publish_transaction(credit)
+    except Account.DoesNotExist:
+        return compensate(saga, 'The recipient account no longer exists.')
+    except IntegrityError:
+        # A concurrent run wrote the credit first
+        pass
+    except DatabaseError as exc:
+        return _mark(saga, TransferSaga.STATUS_DEBITED, f'{type(exc).__name__}: {exc}')
+    return _mark(saga, TransferSaga.STATUS_COMPLETED)
+
+
+def compensate(saga: TransferSaga, reason: str) -> str:
+    """Refund the sender and close the saga."""
+    try:
+        with sharding.for_user(saga.debit.user_id), sharding.atomic():
+            locked = TransferSaga.objects.select_for_update(of=('self',)).select_related('debit').get(pk=saga.pk)
+            if locked.status != TransferSaga.STATUS_DEBITED:
+                return locked.status
+            debit = locked.debit
+            account = Account.objects.select_for_update().get(pk=debit.account_id)
+            refund = _deposit(debit.user_id, account, locked.amount, debit.category, f'Refund: {reason}', _nonce(locked, 'refund'))
+            OutboxEvent.objects.bulk_create(transaction_events(refund))
+            publish_transaction(refund)
+            locked.status, locked.last_error = TransferSaga.STATUS_COMPENSATED, reason
+            locked.save(update_fields=['status', 'last_error', 'updated_at'])
+    except DatabaseError as exc:
+        return _mark(saga, TransferSaga.STATUS_DEBITED, f'Refund failed: {type(exc).__name__}: {exc}')
+    saga.status = TransferSaga.STATUS_COMPENSATED
+    return saga.status
+
+
+def _give_up(saga: TransferSaga) -> str:
+    """Refund the sender unless the credit turns out to have landed."""
+    owner = sharding.account_owner(saga.to_account_id)
+    landed = False
+    try:
+        if owner is not None:
+            with sharding.for_user(owner):
+                landed = Transaction.objects.filter(nonce=_nonce(saga, 'credit')).exists()
+    except DatabaseError as exc:
+        # Refunding without knowing whether the credit landed could pay twice
+        return _mark(saga, TransferSaga.STATUS_DEBITED, f'{type(exc).__name__}: {exc}')
+    if landed:
+        return _mark(saga, TransferSaga.STATUS_COMPLETED)
+    return compensate(saga, f'The transfer could not be delivered after {saga.attempts} attempts.')
+
+
+def resume(older_than: int, max_attempts: int) -> dict:
+    """Retry the stuck credit legs of the current shard. Returns counts by resulting status."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    stuck = TransferSaga.objects.filter(status=TransferSaga.STATUS_DEBITED, updated_at__lt=cutoff)
+    counts = dict.fromkeys([s for s, _ in TransferSaga.STATUS_CHOICES], 0)
+    for pk in stuck.order_by('pk').values_list('pk', flat=True):
+        # The row lock keeps concurrent runs off the same saga
+        with sharding.atomic():
+            saga = (
+                TransferSaga.objects.select_for_update(skip_locked=True, of=('self',)).select_related('debit__account')
+                .filter(pk=pk, status=TransferSaga.STATUS_DEBITED).first()
+            )
+            if saga is None:
+                continue
+            status = _give_up(saga) if saga.attempts >= max_attempts else complete(saga)
+        counts[status] += 1
+    return counts
@@ -0,0 +1,100 @@
+"""Indexed search over ledger descriptions, account numbers and beneficiaries.
+
+On SQLite the ``0009`` migration creates FTS5 tables kept in sync by triggers
+(rowid = the indexed row's id). On PostgreSQL it adds GIN ``tsvector`` indexes
+instead. Any other backend, or SQLite built without FTS5, falls back to
+``icontains``. Every word must match somewhere, and each word is treated as a
+prefix.
+"""
+import re
+import sqlite3
+from functools import lru_cache, reduce
+from operator import and_
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+MAX_TERMS = 8
+
+# Indexed model table -> FTS5 table (SQLite)
+FTS_TABLES = {
+    'transactions_transaction': 'transaction_search',
+    'transactions_archivedtransaction': 'archived_transaction_search',
+    'transactions_beneficiary': 'beneficiary_search',
+}
+
+BENEFICIARY_DOCUMENT = "name || ' ' || nickname || ' ' || account_number || ' ' || email"
+
+
+def terms(text: str) -> list:
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def _vendor(qs) -> str:
+    return connections[qs.db].vendor
+
+
+@lru_cache(maxsize=1)
+def fts5_available() -> bool:
+    """Whether the linked SQLite has FTS5, i.e. whether the migration created the tables.
+
+    Probed on a private in-memory database so it is safe to call from async views.
+    """
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE probe USING fts5(body)')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def _fts_table(qs):
+    if _vendor(qs) != 'sqlite' or not fts5_available():
+        return None
+    return FTS_TABLES.get(qs.model._meta.db_table)
+
+
+def _fts_match(qs, words: list):
+    table = _fts_table(qs)
+    query = ' '.join(f'"{w}"*' for w in words)
+    return qs.filter(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [query]))
+
+
+def _tsquery(qs, document: str, words: list) -> Q:
+    table = qs.model._meta.db_table
+    query = ' & '.join(f'{w}:*' for w in words)
+    return Q(pk__in=RawSQL(f"SELECT id FROM {table} WHERE to_tsvector('simple', {document}) @@ to_tsquery('simple', %s)", [query]))
+
+
+def search_transactions(qs, text: str):
+    """Filter a :class:`Transaction` or :class:`ArchivedTransaction` queryset by description and account numbers."""
+    words = terms(text)
+    if not words:
+        return qs
+    if _fts_table(qs):
+        return _fts_match(qs, words)
+    numbers = [w for w in words if w.isdigit()]
+    accounts = [Q(account__account_number__startswith=n) | Q(related_account__account_number__startswith=n) for n in numbers]
+    if _vendor(qs) == 'postgresql':
+        text_words = [w for w in words if not w.isdigit()]
+        if text_words:
+            accounts.append(_tsquery(qs, 'description', text_words))
+        return qs.filter(reduce(and_, accounts))
+    return qs.filter(reduce(and_, [
+        Q(description__icontains=w) | Q(account__account_number__startswith=w) | Q(related_account__account_number__startswith=w)
+        for w in words
+    ]))
+
+
+def search_beneficiaries(qs, text: str):
+    words = terms(text)
+    if not words:
+        return qs
+    if _fts_table(qs):
+        return _fts_match(qs, words)
+    if _vendor(qs) == 'postgresql':
+        return qs.filter(_tsquery(qs, BENEFICIARY_DOCUMENT, words))
+    return qs.filter(reduce(and_, [
+        Q(name__icontains=w) | Q(nickname__icontains=w) | Q(account_number__startswith=w) | Q(email__icontains=w)
+        for w in words
+    ]))
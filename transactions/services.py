@@ -0,0 +1,111 @@
+from decimal import Decimal
+import uuid
+
+from bank.models import Account, AccountLocator
+from bankx import sharding
+from .events import publish_transaction
+from . import risk
+from .models import RiskDecision, Transaction
+from .outbox import record_transaction
+from .utils import generate_transaction_receipt_pdf
+
+
+class TransactionError(Exception):
+    """Raised when a money movement is refused (insufficient funds, bad recipient...)."""
+
+
+class RiskBlocked(TransactionError):
+    def __init__(self, message: str, decision: RiskDecision):
+        super().__init__(message)
+        self.decision = decision
+
+    def record(self) -> None:
+        """Write the decision again after an enclosing transaction rolled it back."""
+        self.decision.pk = None
+        self.decision._state.adding = True
+        self.decision.save()
+
+
+def _risk_check(account: Account, amount: Decimal, transaction_type: str, recipient=None) -> None:
+    decision = risk.check(account, amount, transaction_type, recipient)
+    if decision is not None and decision.action == RiskDecision.ACTION_BLOCK:
+        raise RiskBlocked('Transaction declined by risk controls.', decision)
+
+
+def resolve_recipient(identifier: str):
+    identifier = identifier.strip()
+    if sharding.shards():
+        # The recipient may live on any shard; the global locator says which
+        lookup = {'account_number': identifier} if identifier.isdigit() else {'user__email__iexact': identifier}
+        locator = AccountLocator.objects.filter(**lookup).order_by('pk').first()
+        if locator is None:
+            return None
+        return Account.objects.using(sharding.shard_for_user(locator.user_id)).filter(pk=locator.pk).first()
+    if identifier.isdigit():
+        return Account.objects.filter(account_number=identifier).first()
+    return Account.objects.filter(user__email__iexact=identifier).first()
+
+
+def _lock(account: Account) -> Account:
+    return Account.objects.select_for_update().get(pk=account.pk)
+
+
+def _record(user, account, transaction_type, amount, category, description, related_account=None) -> Transaction:
+    t = Transaction.objects.create(
+        user=user,
+        account=account,
+        related_account=related_account,
+        transaction_type=transaction_type,
+        category=category,
+        amount=amount,
+        description=description or '',
+        nonce=str(uuid.uuid4()),
+    )
+    t.receipt_pdf.save(f"receipt_{t.id}.pdf", generate_transaction_receipt_pdf(t))
+    record_transaction(t)
+    publish_transaction(t)
+    return t
+
+
+def deposit(user, account: Account, amount: Decimal, category: str = Transaction.CATEGORY_OTHER, description: str = '') -> Transaction:
+    with sharding.atomic():
+        account = _lock(account)
+        account.balance += amount
+        account.save(update_fields=['balance'])
+        return _record(user, account, Transaction.TYPE_DEPOSIT, amount, category, description)
+
+
+def withdraw(user, account: Account, amount: Decimal, category: str = Transaction.CATEGORY_OTHER, description: str = '') -> Transaction:
+    # Checked outside the atomic block so a blocked decision is still recorded
+    _risk_check(account, amount, Transaction.TYPE_WITHDRAW)
+    with sharding.atomic():
+        account = _lock(account)
+        if account.balance < amount:
+            raise TransactionError('Insufficient balance.')
+        account.balance -= amount
+        account.save(update_fields=['balance'])
+        risk.observe(account.pk, amount)
+        return _record(user, account, Transaction.TYPE_WITHDRAW, amount, category, description)
+
+
+def transfer(user, from_account: Account, to_account, amount: Decimal, category: str = Transaction.CATEGORY_OTHER, description: str = '') -> Transaction:
+    if to_account is None:
+        raise TransactionError('Recipient not found.')
+    if from_account.pk == to_account.pk:
+        raise TransactionError('Cannot transfer to the same account.')
+    _risk_check(from_account, amount, Transaction.TYPE_TRANSFER, to_account)
+    if sharding.home(from_account) != sharding.home(to_account):
+        from .sagas import start_transfer
+        return start_transfer(user, from_account, to_account, amount, category, description)
+    with sharding.atomic():
+        # Lock in primary-key order so concurrent opposite transfers cannot deadlock
+        locked = {a.pk: a for a in Account.objects.select_for_update().filter(pk__in=[from_account.pk, to_account.pk]).order_by('pk')}
+        from_account, to_account = locked[from_account.pk], locked[to_account.pk]
+        if from_account.balance < amount:
+            raise TransactionError('Insufficient balance.')
+        from_account.balance -= amount
+        to_account.balance += amount
+        from_account.save(update_fields=['balance'])
+        to_account.save(update_fields=['balance'])
+        risk.observe(from_account.pk, amount, to_account.pk)
+        return _record(user, from_account, Transaction.TYPE_TRANSFER, amount, category, description, related_account=to_account)
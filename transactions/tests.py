@@ -1,3 +1,336 @@
-from django.test import TestCase
+"""Query-count and query-plan regression tests for the hot ledger paths.
 
-# Create your tests here.
+Each test drives a real view or command against a small bank generated by
+``bank.seeding``. It pins the number of queries and runs ``EXPLAIN QUERY PLAN``
+on every statement that reads the ledger, failing if any of them scans the
+table instead of searching an index. When a change adds a query on purpose,
+update the count in the same commit and say why.
+"""
+import json
+import re
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import islice
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.core.exceptions import ValidationError
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from api.models import ApiToken
+from bank import rebalance, seeding
+from bank.models import Account, ShardBucket
+from bankx import sharding
+from . import recurrence, sagas, services
+from .models import RiskDecision, ScheduledTransfer, Transaction, TransferSaga
+
+SEED = 48
+USERS = 30
+MEDIA_ROOT = tempfile.mkdtemp(prefix='bankx-test-media-')
+
+
+def plan_rows(sql: str) -> list:
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are read with SQLite EXPLAIN QUERY PLAN')
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class HotQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        plan = seeding.plan(USERS, USERS * 100, SEED, 120, 'pw', 1000)
+        seeding.seed_users(plan, 0, USERS)
+        seeding.seed_activity(plan, 0, USERS)
+        seeding.finalize(plan)
+        cls.user = User.objects.get(username=seeding.username(SEED, 0))
+        cls.account = Account.objects.filter(user=cls.user).order_by('-balance').first()
+        cls.recipient = Account.objects.get(pk=seeding.account_id(plan, 1))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertNoFullScans(self, queries, tables=('transactions_transaction',)):
+        """Fail if any captured SELECT scans one of ``tables`` (under its own name or a Django alias)."""
+        checked = 0
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            names = {t for t in tables if f'"{t}"' in sql}
+            for table in names.copy():
+                names.update(re.findall(rf'"{table}" (\w+)', sql))
+            if not names:
+                continue
+            checked += 1
+            for line in plan_rows(sql):
+                match = re.match(r'SCAN (\w+)', line)
+                if match and match.group(1) in names:
+                    self.fail(f'Full scan ({line}) in:\n{sql}')
+        return checked
+
+    def capture(self, fn):
+        with CaptureQueriesContext(connection) as ctx:
+            response = fn()
+        return response, ctx.captured_queries
+
+    def test_history(self):
+        url = reverse('history')
+        with self.assertNumQueries(5):
+            response, queries = self.capture(lambda: self.client.get(url))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.assertNoFullScans(queries), 0)
+        # Rows come from the fragment cache until the ledger changes
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_history_filters_and_search(self):
+        params = {
+            'q': 'grocer',
+            'transaction_type': Transaction.TYPE_WITHDRAW,
+            'category': Transaction.CATEGORY_SHOPPING,
+            'start_date': (timezone.localdate() - timedelta(days=30)).isoformat(),
+        }
+        with self.assertNumQueries(4):
+            response, queries = self.capture(lambda: self.client.get(reverse('history'), params))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.assertNoFullScans(queries), 0)
+
+    def test_dashboard(self):
+        url = reverse('dashboard')
+        with self.assertNumQueries(11):
+            response, queries = self.capture(lambda: self.client.get(url))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.assertNoFullScans(queries), 0)
+        # Summary cards come from the fragment cache; balances and schedules are still read
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+    def test_transfer(self):
+        url = reverse('transfer')
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        data = {
+            'from_account': self.account.pk,
+            'to_identifier': self.recipient.account_number,
+            'amount': '1.00',
+            'category': Transaction.CATEGORY_OTHER,
+            'description': 'Regression test',
+        }
+        with self.assertNumQueries(14):
+            response, queries = self.capture(lambda: self.client.post(url, data))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertNoFullScans(queries)
+
+    def test_run_scheduled_transfers(self):
+        due = list(ScheduledTransfer.objects.filter(user__username__startswith=f'seed{SEED}_').order_by('pk')[:2])
+        self.assertEqual(len(due), 2)
+        for s in due:
+            Account.objects.filter(pk=s.from_account_id).update(balance=Decimal('100000.00'))
+        ScheduledTransfer.objects.filter(pk__in=[s.pk for s in due]).update(next_run=timezone.now() - timedelta(hours=1))
+        out = StringIO()
+        # One query to find due schedules, then a fixed cost per transfer
+        with self.assertNumQueries(1 + 2 * 15):
+            _, queries = self.capture(lambda: call_command('run_scheduled_transfers', stdout=out))
+        self.assertIn('Processed 2 scheduled transfers', out.getvalue())
+        self.assertNoFullScans(queries, ('transactions_transaction', 'transactions_scheduledtransfer'))
+
+
+class ScheduledRiskTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.account = Account.objects.get(user=User.objects.create_user('payer', password='pw'))
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('500.00'))
+        self.recipient = Account.objects.get(user=User.objects.create_user('payee', password='pw'))
+
+    @override_settings(RISK_RULES=[{'name': 'halt', 'window': 60, 'max_count': 0, 'action': RiskDecision.ACTION_BLOCK}])
+    def test_blocked_schedule_is_recorded_and_skipped(self):
+        now = timezone.now()
+        s = ScheduledTransfer.objects.create(
+            user=self.account.user, from_account=self.account, to_identifier=self.recipient.account_number,
+            amount=Decimal('10.00'), start_at=now - timedelta(hours=1), next_run=now - timedelta(hours=1),
+        )
+        for _ in range(2):
+            call_command('run_scheduled_transfers', stdout=StringIO())
+        # Recorded once despite the enclosing transaction, and not retried on the next run
+        self.assertEqual(list(RiskDecision.objects.values_list('rule', 'action')), [('halt', RiskDecision.ACTION_BLOCK)])
+        s.refresh_from_db()
+        self.assertGreater(s.next_run, now)
+        self.assertIsNone(s.last_run)
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('500.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+
+def at(*args) -> datetime:
+    return timezone.make_aware(datetime(*args))
+
+
+class RecurrenceTests(SimpleTestCase):
+    def schedule(self, **kwargs) -> ScheduledTransfer:
+        kwargs.setdefault('next_run', kwargs.get('start_at'))
+        return ScheduledTransfer(amount=Decimal('1.00'), **kwargs)
+
+    def dates(self, s, count: int) -> list:
+        return [when.date() for _, when in islice(recurrence.occurrences(s, start_index=0), count)]
+
+    def test_nth_weekday(self):
+        self.assertEqual(recurrence.nth_weekday(2024, 3, 0, 1), date(2024, 3, 4))
+        self.assertEqual(recurrence.nth_weekday(2024, 3, 4, -1), date(2024, 3, 29))
+        # February 2024 has four Fridays; a fifth falls back to the last one
+        self.assertEqual(recurrence.nth_weekday(2024, 2, 4, 5), date(2024, 2, 23))
+
+    def test_month_end_is_clamped(self):
+        s = self.schedule(frequency=ScheduledTransfer.FREQ_MONTHLY, start_at=at(2024, 1, 31, 9))
+        self.assertEqual(self.dates(s, 4), [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+        s.month_day = -1
+        s.start_at = at(2024, 2, 10, 9)
+        self.assertEqual(self.dates(s, 2), [date(2024, 2, 29), date(2024, 3, 31)])
+
+    @override_settings(BANK_HOLIDAYS=['2024-12-25'])
+    def test_business_day_adjustment(self):
+        saturday = date(2024, 8, 31)
+        self.assertEqual(recurrence.adjust(saturday, ScheduledTransfer.ADJUST_FOLLOWING), date(2024, 9, 2))
+        self.assertEqual(recurrence.adjust(saturday, ScheduledTransfer.ADJUST_MODIFIED_FOLLOWING), date(2024, 8, 30))
+        self.assertEqual(recurrence.adjust(date(2024, 12, 25), ScheduledTransfer.ADJUST_FOLLOWING), date(2024, 12, 26))
+        self.assertEqual(recurrence.adjust(saturday, ScheduledTransfer.ADJUST_NONE), saturday)
+
+    def test_first_after_and_advance(self):
+        s = self.schedule(frequency=ScheduledTransfer.FREQ_WEEKLY, interval=2, start_at=at(2024, 1, 1, 9), max_occurrences=3)
+        self.assertEqual(recurrence.first_after(s, at(2024, 1, 20)), (2, at(2024, 1, 29, 9)))
+        self.assertEqual(recurrence.first_after(s, at(2024, 1, 15, 9)), (2, at(2024, 1, 29, 9)))
+        self.assertEqual(recurrence.first_after(s, at(2024, 1, 15, 9), inclusive=True), (1, at(2024, 1, 15, 9)))
+        recurrence.advance(s, at(2024, 1, 2))
+        self.assertEqual((s.occurrence_index, s.next_run, s.is_active), (1, at(2024, 1, 15, 9), True))
+        recurrence.advance(s, at(2024, 2, 1))
+        self.assertFalse(s.is_active)
+
+    def test_validate_rejects_out_of_range_rules(self):
+        s = self.schedule(frequency=ScheduledTransfer.FREQ_MONTHLY, interval=1, week_of_month=0, weekday=9)
+        with self.assertRaises(ValidationError) as ctx:
+            recurrence.validate(s)
+        self.assertEqual(set(ctx.exception.message_dict), {'week_of_month', 'weekday'})
+        s.week_of_month, s.weekday = -1, 4
+        recurrence.validate(s)
+
+
+class ScheduledTransferApiTests(TestCase):
+    def test_out_of_range_rule_is_a_bad_request(self):
+        user = User.objects.create_user('planner', password='pw')
+        account = Account.objects.get(user=user)
+        token = ApiToken.objects.create(user=user)
+        body = {
+            'from_account': account.account_number, 'to': '000000000000', 'amount': '5.00',
+            'next_run': '2030-01-01T09:00:00Z', 'week_of_month': 0, 'weekday': 2,
+        }
+        response = self.client.post(
+            reverse('api_scheduled_transfers'), json.dumps(body), content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token.key}',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('week_of_month', response.json()['error'])
+        self.assertFalse(ScheduledTransfer.objects.exists())
+
+
+@override_settings(SHARDS=['shard1'], SHARD_DIRECTORY_TTL=0, MEDIA_ROOT=MEDIA_ROOT)
+class CrossShardTransferTests(TestCase):
+    """Alice stays on default; Bob is moved to shard1 by rebalance."""
+    databases = {'default', 'shard1'}
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        Account.objects.filter(user=self.alice).update(balance=Decimal('100.00'))
+        self.bucket = sharding.bucket(self.bob.pk)
+        rebalance.move_bucket(self.bucket, 'shard1', [self.bob.pk], chunk_size=10, settle=0)
+        self.sender = Account.objects.get(user=self.alice)
+        self.recipient = services.resolve_recipient(Account.objects.using('shard1').get(user=self.bob).account_number)
+
+    def balance(self, account) -> Decimal:
+        return Account.objects.using(account._state.db).get(pk=account.pk).balance
+
+    def send(self, amount: str) -> TransferSaga:
+        with sharding.for_user(self.alice.pk), self.captureOnCommitCallbacks(using='default', execute=True):
+            debit = services.transfer(self.alice, self.sender, self.recipient, Decimal(amount))
+        return TransferSaga.objects.get(debit=debit)
+
+    def moving(self, value: str) -> None:
+        ShardBucket.objects.filter(bucket=self.bucket).update(moving_to=value)
+
+    def test_rebalance_moves_the_customer(self):
+        self.assertEqual(sharding.shard_for_user(self.bob.pk), 'shard1')
+        self.assertEqual(self.recipient._state.db, 'shard1')
+        self.assertFalse(Account.objects.using('default').filter(user=self.bob).exists())
+        self.assertEqual(ShardBucket.objects.get(bucket=self.bucket).moving_to, '')
+
+    def test_credit_leg_completes(self):
+        saga = self.send('10.00')
+        self.assertEqual(saga.status, TransferSaga.STATUS_COMPLETED)
+        self.assertEqual(self.balance(self.sender), Decimal('90.00'))
+        self.assertEqual(self.balance(self.recipient), Decimal('10.00'))
+        credit = Transaction.objects.using('shard1').get(nonce=f'{saga.debit.nonce}-credit')
+        self.assertEqual((credit.account_id, credit.transaction_type), (self.recipient.pk, Transaction.TYPE_DEPOSIT))
+
+    def test_writes_to_a_moving_bucket_are_refused(self):
+        self.moving('shard1')
+        with sharding.for_user(self.bob.pk), self.assertRaises(sharding.BucketMoving):
+            services.deposit(self.bob, self.recipient, Decimal('1.00'))
+        # Admin pages work on the whole shard, without a customer bucket
+        with sharding.using('shard1'), self.assertRaises(sharding.BucketMoving):
+            account = Account.objects.get(pk=self.recipient.pk)
+            account.balance = Decimal('5.00')
+            account.save()
+        self.assertEqual(self.balance(self.recipient), Decimal('0.00'))
+
+    def test_resume_retries_a_stuck_credit_once(self):
+        self.moving('shard1')
+        saga = self.send('10.00')
+        self.assertEqual((saga.status, saga.attempts), (TransferSaga.STATUS_DEBITED, 1))
+        self.assertEqual(self.balance(self.recipient), Decimal('0.00'))
+        self.moving('')
+        for _ in range(2):
+            with sharding.using('default'):
+                sagas.resume(older_than=0, max_attempts=5)
+        saga.refresh_from_db()
+        self.assertEqual(saga.status, TransferSaga.STATUS_COMPLETED)
+        self.assertEqual(self.balance(self.recipient), Decimal('10.00'))
+
+    def test_compensates_when_the_recipient_is_gone(self):
+        self.moving('shard1')
+        saga = self.send('10.00')
+        self.moving('')
+        with sharding.for_user(self.bob.pk):
+            Account.objects.get(pk=self.recipient.pk).delete()
+        with sharding.using('default'):
+            counts = sagas.resume(older_than=0, max_attempts=5)
+        self.assertEqual(counts[TransferSaga.STATUS_COMPENSATED], 1)
+        saga.refresh_from_db()
+        self.assertEqual(saga.status, TransferSaga.STATUS_COMPENSATED)
+        self.assertEqual(self.balance(self.sender), Decimal('100.00'))
+        self.assertTrue(Transaction.objects.filter(nonce=f'{saga.debit.nonce}-refund', amount=Decimal('10.00')).exists())
+
+    def test_admin_shard_override_only_on_admin_pages(self):
+        self.bob.is_staff = True
+        factory = RequestFactory()
+        for path, expected in (('/manage/loans/?shard=default', ('default', None)), ('/transactions/deposit/', ('shard1', self.bucket))):
+            request = factory.get(path)
+            request.user, request.session = self.bob, {}
+            if path.startswith('/transactions/'):
+                request.session[sharding.SESSION_KEY] = 'default'
+            self.assertEqual(sharding.ShardMiddleware._target(request), expected)
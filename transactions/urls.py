@@ -1,15 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     path('deposit/', views.deposit_view, name='deposit'),
     path('withdraw/', views.withdraw_view, name='withdraw'),
     path('transfer/', views.transfer_view, name='transfer'),
-    path('history/', views.history_view, name='history'),
-    path('beneficiaries/', views.beneficiaries_view, name='beneficiaries'),
+    path('history/', read_views.history_view, name='history'),
+    path('events/', read_views.event_stream_view, name='event_stream'),
+    path('beneficiaries/', read_views.beneficiaries_view, name='beneficiaries'),
     path('beneficiaries/add/', views.add_beneficiary_view, name='add_beneficiary'),
     path('beneficiaries/<int:pk>/delete/', views.delete_beneficiary_view, name='delete_beneficiary'),
     path('scheduled/', views.scheduled_transfers_view, name='scheduled_transfers'),
     path('scheduled/add/', views.add_scheduled_transfer_view, name='add_scheduled_transfer'),
+    path('scheduled/upcoming/', views.upcoming_payments_view, name='upcoming_payments'),
+    path('insights/', views.insights_view, name='insights'),
 ]
 
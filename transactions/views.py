@@ -1,19 +1,27 @@
+from datetime import timedelta
 from decimal import Decimal
-import uuid
+from itertools import islice
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import transaction as db_transaction
+from django.http import HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
 from django import forms
 
+from bank.caching import ledger_version
+from bank.forms import CachedModelChoiceField, owned
 from bank.models import Account
-from .models import Transaction, Beneficiary, ScheduledTransfer
-from .utils import generate_transaction_receipt_pdf
+from bankx.routers import replica_reads
+from . import insights, recurrence, search, services
+from .archive import merge_history, needs_archive
+from .models import ArchivedTransaction, Budget, Transaction, Beneficiary, ScheduledTransfer
+
+UPCOMING_DAYS = 90
 
 
 class DepositForm(forms.Form):
-    account = forms.ModelChoiceField(queryset=Account.objects.none())
+    account = CachedModelChoiceField(queryset=Account.objects.none())
     amount = forms.DecimalField(min_value=Decimal('0.01'), decimal_places=2, max_digits=12)
     category = forms.ChoiceField(choices=Transaction.CATEGORY_CHOICES)
     description = forms.CharField(required=False)
@@ -22,6 +30,7 @@ class DepositForm(forms.Form):
         user = kwargs.pop('user')
         super().__init__(*args, **kwargs)
         self.fields['account'].queryset = Account.objects.filter(user=user)
+        self.fields['account'].objects = owned(user, Account)
 
 
 class WithdrawForm(DepositForm):
@@ -29,8 +38,8 @@ class WithdrawForm(DepositForm):
 
 
 class TransferForm(forms.Form):
-    from_account = forms.ModelChoiceField(queryset=Account.objects.none())
-    beneficiary = forms.ModelChoiceField(queryset=Beneficiary.objects.none(), required=False)
+    from_account = CachedModelChoiceField(queryset=Account.objects.none())
+    beneficiary = CachedModelChoiceField(queryset=Beneficiary.objects.none(), required=False)
     to_identifier = forms.CharField(help_text='Recipient account number or email')
     amount = forms.DecimalField(min_value=Decimal('0.01'), decimal_places=2, max_digits=12)
     category = forms.ChoiceField(choices=Transaction.CATEGORY_CHOICES)
@@ -40,20 +49,24 @@ class TransferForm(forms.Form):
         user = kwargs.pop('user')
         super().__init__(*args, **kwargs)
         self.fields['from_account'].queryset = Account.objects.filter(user=user)
+        self.fields['from_account'].objects = owned(user, Account)
         self.fields['beneficiary'].queryset = Beneficiary.objects.filter(user=user)
+        self.fields['beneficiary'].objects = owned(user, Beneficiary)
 
 
 class TransactionFilterForm(forms.Form):
+    q = forms.CharField(required=False, max_length=100, label='Search', widget=forms.TextInput(attrs={'placeholder': 'Description or account'}))
     transaction_type = forms.ChoiceField(choices=[('', 'All')] + list(Transaction.TRANSACTION_TYPE_CHOICES), required=False)
     category = forms.ChoiceField(choices=[('', 'All')] + list(Transaction.CATEGORY_CHOICES), required=False)
     start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
     end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
-    account = forms.ModelChoiceField(queryset=Account.objects.none(), required=False)
+    account = CachedModelChoiceField(queryset=Account.objects.none(), required=False)
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user')
         super().__init__(*args, **kwargs)
         self.fields['account'].queryset = Account.objects.filter(user=user)
+        self.fields['account'].objects = owned(user, Account)
 
 
 @login_required
@@ -61,21 +74,13 @@ def deposit_view(request):
     if request.method == 'POST':
         form = DepositForm(request.POST, user=request.user)
         if form.is_valid():
-            account = form.cleaned_data['account']
-            amount = form.cleaned_data['amount']
-            with db_transaction.atomic():
-                account.balance += amount
-                account.save(update_fields=['balance'])
-                t = Transaction.objects.create(
-                    user=request.user,
-                    account=account,
-                    transaction_type=Transaction.TYPE_DEPOSIT,
-                    category=form.cleaned_data['category'],
-                    amount=amount,
-                    description=form.cleaned_data.get('description', ''),
-                    nonce=str(uuid.uuid4()),
-                )
-                t.receipt_pdf.save(f"receipt_{t.id}.pdf", generate_transaction_receipt_pdf(t))
+            services.deposit(
+                request.user,
+                form.cleaned_data['account'],
+                form.cleaned_data['amount'],
+                category=form.cleaned_data['category'],
+                description=form.cleaned_data.get('description', ''),
+            )
             messages.success(request, 'Deposit successful.')
             return redirect('dashboard')
         messages.error(request, 'Please fix the form errors.')
@@ -89,24 +94,17 @@ def withdraw_view(request):
     if request.method == 'POST':
         form = WithdrawForm(request.POST, user=request.user)
         if form.is_valid():
-            account = form.cleaned_data['account']
-            amount = form.cleaned_data['amount']
-            if account.balance < amount:
-                messages.error(request, 'Insufficient balance.')
+            try:
+                services.withdraw(
+                    request.user,
+                    form.cleaned_data['account'],
+                    form.cleaned_data['amount'],
+                    category=form.cleaned_data['category'],
+                    description=form.cleaned_data.get('description', ''),
+                )
+            except services.TransactionError as exc:
+                messages.error(request, str(exc))
             else:
-                with db_transaction.atomic():
-                    account.balance -= amount
-                    account.save(update_fields=['balance'])
-                    t = Transaction.objects.create(
-                        user=request.user,
-                        account=account,
-                        transaction_type=Transaction.TYPE_WITHDRAW,
-                        category=form.cleaned_data['category'],
-                        amount=amount,
-                        description=form.cleaned_data.get('description', ''),
-                        nonce=str(uuid.uuid4()),
-                    )
-                    t.receipt_pdf.save(f"receipt_{t.id}.pdf", generate_transaction_receipt_pdf(t))
                 messages.success(request, 'Withdrawal successful.')
                 return redirect('dashboard')
         else:
@@ -121,46 +119,24 @@ def transfer_view(request):
     if request.method == 'POST':
         form = TransferForm(request.POST, user=request.user)
         if form.is_valid():
-            from_account = form.cleaned_data['from_account']
             to_identifier = form.cleaned_data['to_identifier'].strip()
             beneficiary = form.cleaned_data.get('beneficiary')
             if beneficiary and beneficiary.account_number:
                 to_identifier = beneficiary.account_number
             elif beneficiary and beneficiary.email:
                 to_identifier = beneficiary.email
-            amount = form.cleaned_data['amount']
-
-            # Resolve recipient account by account number or email
-            to_account = None
-            if to_identifier.isdigit():
-                to_account = Account.objects.filter(account_number=to_identifier).first()
-            else:
-                to_account = Account.objects.filter(user__email__iexact=to_identifier).first()
-
-            if to_account is None:
-                messages.error(request, 'Recipient not found.')
-            elif from_account == to_account:
-                messages.error(request, 'Cannot transfer to the same account.')
-            elif from_account.balance < amount:
-                messages.error(request, 'Insufficient balance.')
+            try:
+                services.transfer(
+                    request.user,
+                    form.cleaned_data['from_account'],
+                    services.resolve_recipient(to_identifier),
+                    form.cleaned_data['amount'],
+                    category=form.cleaned_data['category'],
+                    description=form.cleaned_data.get('description', ''),
+                )
+            except services.TransactionError as exc:
+                messages.error(request, str(exc))
             else:
-                with db_transaction.atomic():
-                    from_account.balance -= amount
-                    to_account.balance += amount
-                    from_account.save(update_fields=['balance'])
-                    to_account.save(update_fields=['balance'])
-                    nonce = str(uuid.uuid4())
-                    t = Transaction.objects.create(
-                        user=request.user,
-                        account=from_account,
-                        related_account=to_account,
-                        transaction_type=Transaction.TYPE_TRANSFER,
-                        category=form.cleaned_data['category'],
-                        amount=amount,
-                        description=form.cleaned_data.get('description', ''),
-                        nonce=nonce,
-                    )
-                    t.receipt_pdf.save(f"receipt_{t.id}.pdf", generate_transaction_receipt_pdf(t))
                 messages.success(request, 'Transfer successful.')
                 return redirect('dashboard')
         else:
@@ -176,10 +152,18 @@ class BeneficiaryForm(forms.ModelForm):
         fields = ['name', 'nickname', 'account_number', 'email']
 
 
+@login_required
+def event_stream_view(request):
+    # Live updates need ASGI (async_views.event_stream_view); under WSGI a stream
+    # would hold a worker for as long as the tab is open. 204 stops EventSource retries.
+    return HttpResponse(status=204)
+
+
 @login_required
 def beneficiaries_view(request):
-    items = Beneficiary.objects.filter(user=request.user).order_by('name')
-    return render(request, 'transactions/beneficiaries.html', {'items': items})
+    q = request.GET.get('q', '')
+    items = search.search_beneficiaries(Beneficiary.objects.filter(user=request.user), q).order_by('name')
+    return render(request, 'transactions/beneficiaries.html', {'items': items, 'q': q})
 
 
 @login_required
@@ -208,25 +192,46 @@ def delete_beneficiary_view(request, pk: int):
 
 
 class ScheduledTransferForm(forms.ModelForm):
+    from_account = CachedModelChoiceField(queryset=Account.objects.none())
+
     class Meta:
         model = ScheduledTransfer
-        fields = ['from_account', 'to_identifier', 'amount', 'category', 'description', 'frequency', 'next_run', 'is_active']
+        fields = [
+            'from_account', 'to_identifier', 'amount', 'category', 'description',
+            'frequency', 'interval', 'month_day', 'week_of_month', 'weekday', 'business_day',
+            'next_run', 'end_date', 'max_occurrences', 'is_active',
+        ]
+        labels = {'next_run': 'First run'}
         widgets = {
             'next_run': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
+            'end_date': forms.DateInput(attrs={'type': 'date'}),
         }
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user')
         super().__init__(*args, **kwargs)
         self.fields['from_account'].queryset = Account.objects.filter(user=user)
+        self.fields['from_account'].objects = owned(user, Account)
 
 
 @login_required
 def scheduled_transfers_view(request):
-    items = ScheduledTransfer.objects.filter(user=request.user).order_by('next_run')
+    items = ScheduledTransfer.objects.filter(user=request.user).select_related('from_account').order_by('next_run')
     return render(request, 'transactions/scheduled.html', {'items': items})
 
 
+@login_required
+def upcoming_payments_view(request):
+    until = timezone.now() + timedelta(days=UPCOMING_DAYS)
+    schedules = ScheduledTransfer.objects.filter(user=request.user, is_active=True).select_related('from_account')
+    payments = recurrence.upcoming(schedules, until)
+    return render(request, 'transactions/upcoming.html', {
+        'payments': payments,
+        'days': UPCOMING_DAYS,
+        'total': sum((s.amount for _, s in payments), Decimal('0.00')),
+    })
+
+
 @login_required
 def add_scheduled_transfer_view(request):
     if request.method == 'POST':
@@ -234,6 +239,7 @@ def add_scheduled_transfer_view(request):
         if form.is_valid():
             st = form.save(commit=False)
             st.user = request.user
+            recurrence.initialize(st)
             st.save()
             messages.success(request, 'Scheduled transfer created.')
             return redirect('scheduled_transfers')
@@ -242,26 +248,71 @@ def add_scheduled_transfer_view(request):
     return render(request, 'transactions/add_scheduled.html', {'form': form})
 
 
+class BudgetForm(forms.Form):
+    category = forms.ChoiceField(choices=Transaction.CATEGORY_CHOICES)
+    monthly_limit = forms.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.00'), help_text='0 removes the budget')
+
+
 @login_required
-def history_view(request):
+@replica_reads
+def insights_view(request):
+    if request.method == 'POST':
+        form = BudgetForm(request.POST)
+        if form.is_valid():
+            category, limit = form.cleaned_data['category'], form.cleaned_data['monthly_limit']
+            if limit:
+                Budget.objects.update_or_create(user=request.user, category=category, defaults={'monthly_limit': limit})
+                messages.success(request, 'Budget saved.')
+            else:
+                Budget.objects.filter(user=request.user, category=category).delete()
+                messages.info(request, 'Budget removed.')
+            return redirect('insights')
+    else:
+        form = BudgetForm()
+    return render(request, 'transactions/insights.html', {'form': form, **insights.insights(request.user)})
+
+
+def _filter_history(qs, cleaned):
+    qs = search.search_transactions(qs, cleaned.get('q'))
+    ttype = cleaned.get('transaction_type')
+    if ttype:
+        qs = qs.filter(transaction_type=ttype)
+    cat = cleaned.get('category')
+    if cat:
+        qs = qs.filter(category=cat)
+    start = cleaned.get('start_date')
+    if start:
+        qs = qs.filter(created_at__date__gte=start)
+    end = cleaned.get('end_date')
+    if end:
+        qs = qs.filter(created_at__date__lte=end)
+    account = cleaned.get('account')
+    if account:
+        qs = qs.filter(account=account)
+    return qs
+
+
+def filtered_history(request):
+    """Returns the form plus hot and (only when the range needs it) archived querysets, newest first."""
     form = TransactionFilterForm(request.GET or None, user=request.user)
-    qs = Transaction.objects.filter(user=request.user).select_related('account', 'related_account').order_by('-created_at')
-    if form.is_valid():
-        ttype = form.cleaned_data.get('transaction_type')
-        if ttype:
-            qs = qs.filter(transaction_type=ttype)
-        cat = form.cleaned_data.get('category')
-        if cat:
-            qs = qs.filter(category=cat)
-        start = form.cleaned_data.get('start_date')
-        if start:
-            qs = qs.filter(created_at__date__gte=start)
-        end = form.cleaned_data.get('end_date')
-        if end:
-            qs = qs.filter(created_at__date__lte=end)
-        account = form.cleaned_data.get('account')
-        if account:
-            qs = qs.filter(account=account)
+    cleaned = form.cleaned_data if form.is_valid() else {}
+    qs = _filter_history(
+        Transaction.objects.filter(user=request.user).select_related('account', 'related_account').order_by('-created_at'),
+        cleaned,
+    )
+    archived = None
+    if needs_archive(cleaned.get('start_date')):
+        archived = _filter_history(
+            ArchivedTransaction.objects.filter(user=request.user).select_related('account', 'related_account').order_by('-created_at'),
+            cleaned,
+        )
+    return form, qs, archived
+
+
+@login_required
+@replica_reads
+def history_view(request):
+    form, qs, archived = filtered_history(request)
     export = request.GET.get('export')
     if export == 'csv':
         import csv
@@ -270,7 +321,7 @@ def history_view(request):
         response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
         writer = csv.writer(response)
         writer.writerow(['Date', 'Type', 'Category', 'Account', 'Related', 'Amount', 'Description'])
-        for t in qs:
+        for t in merge_history(qs.iterator(), archived.iterator() if archived is not None else None):
             writer.writerow([t.created_at.strftime('%Y-%m-%d %H:%M'), t.get_transaction_type_display(), t.get_category_display(), t.account.account_number, t.related_account.account_number if t.related_account else '', str(t.amount), t.description])
         return response
     if export == 'pdf':
@@ -286,7 +337,7 @@ def history_view(request):
         pdf.drawString(72, y, 'BankX Statement')
         y -= 24
         pdf.setFont('Helvetica', 10)
-        for t in qs[:1000]:
+        for t in islice(merge_history(qs[:1000], archived[:1000] if archived is not None else None), 1000):
             line = f"{t.created_at:%Y-%m-%d %H:%M}  {t.get_transaction_type_display()}  ${t.amount}  {t.account.account_number}  {t.get_category_display()}  {t.description}"
             pdf.drawString(72, y, line[:110])
             y -= 14
@@ -301,4 +352,8 @@ def history_view(request):
         response['Content-Disposition'] = 'attachment; filename="statement.pdf"'
         return response
 
-    return render(request, 'transactions/history.html', {'form': form, 'transactions': qs})
+    return render(request, 'transactions/history.html', {
+        'form': form,
+        'transactions': merge_history(qs, archived),
+        'ledger_version': ledger_version(request.user.pk),
+    })
@@ -0,0 +1,66 @@
+"""Profile picture variants.
+
+Originals are never served to pages. ``manage.py process_profile_pictures`` renders
+fixed-size JPEG variants next to the original and records a short hash of the
+original's bytes as ``picture_version``; URLs embed that version so responses can
+be cached as immutable.
+"""
+import hashlib
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+# variant name -> (model field, square edge in px)
+VARIANTS = {
+    'avatar': ('avatar', 64),
+    'thumbnail': ('thumbnail', 256),
+}
+
+
+def validate_picture_size(file) -> None:
+    limit = getattr(settings, 'PROFILE_PICTURE_MAX_BYTES', DEFAULT_MAX_BYTES)
+    if file and file.size > limit:
+        raise ValidationError(f'Profile pictures must be at most {filesizeformat(limit)}.')
+
+
+def clear_variants(profile) -> None:
+    """Forget the rendered variants, e.g. after a new picture was uploaded."""
+    for field, _ in VARIANTS.values():
+        getattr(profile, field).delete(save=False)
+    profile.picture_version = ''
+    profile.picture_attempts = 0
+
+
+def _render(image, edge: int) -> bytes:
+    from PIL import ImageOps
+
+    variant = ImageOps.fit(image, (edge, edge))
+    out = BytesIO()
+    variant.save(out, 'JPEG', quality=85, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def process_profile(profile) -> None:
+    from PIL import Image, ImageOps
+
+    with profile.profile_picture.open('rb') as fh:
+        data = fh.read()
+    version = hashlib.sha256(data).hexdigest()[:12]
+    largest = max(edge for _, edge in VARIANTS.values())
+    with Image.open(BytesIO(data)) as image:
+        image.draft('RGB', (largest * 2, largest * 2))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    stem = PurePosixPath(profile.profile_picture.name).stem
+    for variant, (field, edge) in VARIANTS.items():
+        getattr(profile, field).save(f'{stem}.{version}.{variant}.jpg', ContentFile(_render(image, edge)), save=False)
+    profile.picture_version = version
+    # Only attach the variants if the picture was not replaced while rendering
+    type(profile).objects.filter(pk=profile.pk, profile_picture=profile.profile_picture.name).update(
+        picture_version=version,
+        **{field: getattr(profile, field).name for field, _ in VARIANTS.values()},
+    )
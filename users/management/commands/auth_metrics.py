@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from users import metrics
+
+
+class Command(BaseCommand):
+    help = 'Print login, API token and password reset latency by outcome'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after printing')
+
+    def handle(self, *args, **options):
+        rows = metrics.snapshot()
+        if not rows:
+            self.stdout.write('No authentication attempts recorded.')
+        else:
+            self.stdout.write(f"{'event':<16}{'outcome':<11}{'count':>8}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+            for row in rows:
+                # Percentiles are bucket upper bounds
+                p50, p95, p99 = (f'<={q:g}' for q in (row['p50_ms'], row['p95_ms'], row['p99_ms']))
+                self.stdout.write(
+                    f"{row['event']:<16}{row['outcome']:<11}{row['count']:>8}{row['mean_ms']:>10.2f}"
+                    f'{p50:>9}{p95:>9}{p99:>9}'
+                )
+        if options['reset']:
+            metrics.reset()
+            self.stdout.write('Counters cleared.')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from users.images import process_profile
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Render avatar and thumbnail variants for new profile pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500)
+        parser.add_argument('--max-attempts', type=int, default=3, help='Stop retrying a picture after this many failed renders')
+
+    def handle(self, *args, **options):
+        pending = (
+            UserProfile.objects.exclude(Q(profile_picture='') | Q(profile_picture__isnull=True))
+            .filter(picture_version='')
+            # Pictures that keep failing would otherwise fill every batch
+            .filter(picture_attempts__lt=options['max_attempts'])
+            .order_by('id')[:options['limit']]
+        )
+        processed = failed = 0
+        for profile in pending.iterator():
+            try:
+                process_profile(profile)
+                processed += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Profile {profile.pk}: {type(exc).__name__}: {exc}')
+                UserProfile.objects.filter(pk=profile.pk).update(picture_attempts=F('picture_attempts') + 1)
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} profile pictures ({failed} failed)'))
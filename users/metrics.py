@@ -0,0 +1,84 @@
+"""Latency histograms for authentication, aggregated in the Django cache.
+
+Every observation increments three counters: the count, the sum in microseconds
+and one latency bucket. All workers sharing a cache feed the same histogram.
+Read it with ``python manage.py auth_metrics``.
+"""
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+EVENTS = ('login', 'api_token', 'password_reset')
+OUTCOMES = ('success', 'failure', 'throttled')
+
+
+def _key(event: str, outcome: str, field: str) -> str:
+    return f'metrics:auth:{event}:{outcome}:{field}'
+
+
+def _incr(key: str, amount: int = 1) -> None:
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, None)
+
+
+def observe(event: str, outcome: str, seconds: float) -> None:
+    ms = seconds * 1000
+    bucket = next((str(b) for b in BUCKETS_MS if ms <= b), 'inf')
+    _incr(_key(event, outcome, 'count'))
+    _incr(_key(event, outcome, 'sum_us'), int(seconds * 1_000_000))
+    _incr(_key(event, outcome, f'le_{bucket}'))
+
+
+@contextmanager
+def timed(event: str):
+    """Time the block; set ``result['outcome']`` inside it (default ``failure``)."""
+    result = {'outcome': 'failure'}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        observe(event, result['outcome'], time.perf_counter() - start)
+
+
+def _quantile(counts: list, total: int, q: float):
+    """Upper bound of the bucket holding the ``q`` quantile."""
+    seen = 0
+    for bound, count in counts:
+        seen += count
+        if seen >= q * total:
+            return bound
+    return None
+
+
+def snapshot() -> list:
+    fields = ['count', 'sum_us'] + [f'le_{b}' for b in BUCKETS_MS] + ['le_inf']
+    keys = [_key(e, o, f) for e in EVENTS for o in OUTCOMES for f in fields]
+    values = cache.get_many(keys)
+    rows = []
+    for event in EVENTS:
+        for outcome in OUTCOMES:
+            count = values.get(_key(event, outcome, 'count'), 0)
+            if not count:
+                continue
+            buckets = [(b, values.get(_key(event, outcome, f'le_{b}'), 0)) for b in BUCKETS_MS]
+            buckets.append((float('inf'), values.get(_key(event, outcome, 'le_inf'), 0)))
+            rows.append({
+                'event': event,
+                'outcome': outcome,
+                'count': count,
+                'mean_ms': values.get(_key(event, outcome, 'sum_us'), 0) / count / 1000,
+                'p50_ms': _quantile(buckets, count, 0.5),
+                'p95_ms': _quantile(buckets, count, 0.95),
+                'p99_ms': _quantile(buckets, count, 0.99),
+            })
+    return rows
+
+
+def reset() -> None:
+    fields = ['count', 'sum_us'] + [f'le_{b}' for b in BUCKETS_MS] + ['le_inf']
+    cache.delete_many([_key(e, o, f) for e in EVENTS for o in OUTCOMES for f in fields])
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:40
+
+import users.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profiles/'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='picture_version',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profiles/'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, upload_to='profiles/', validators=[users.images.validate_picture_size]),
+        ),
+    ]
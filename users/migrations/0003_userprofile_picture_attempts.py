@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_userprofile_avatar_userprofile_picture_version_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='picture_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
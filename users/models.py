@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .images import validate_picture_size
+
 
 class UserProfile(models.Model):
     ROLE_CUSTOMER = 'customer'
@@ -12,10 +14,14 @@ class UserProfile(models.Model):
 
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone_number = models.CharField(max_length=20, blank=True)
-    profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True, validators=[validate_picture_size])
+    # Rendered by `manage.py process_profile_pictures`; see users/images.py
+    avatar = models.ImageField(upload_to='profiles/', blank=True, null=True, editable=False)
+    thumbnail = models.ImageField(upload_to='profiles/', blank=True, null=True, editable=False)
+    picture_version = models.CharField(max_length=12, blank=True, editable=False)
+    # Failed renders of the current picture; process_profile_pictures gives up after --max-attempts
+    picture_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default=ROLE_CUSTOMER)
 
     def __str__(self) -> str:
         return f"Profile({self.user.username})"
-
-# Create your models here.
@@ -0,0 +1,66 @@
+"""Password hashing on a bounded pool of threads.
+
+PBKDF2, scrypt and Argon2 all release the GIL while hashing, so work submitted
+here runs truly in parallel, but never on more than ``PASSWORD_HASH_WORKERS``
+threads per process. A login burst queues for a worker instead of running one
+full-cost hash per request thread at once. Bulk jobs (seeding, imports) hash
+their passwords in parallel on the same pool. Database access always stays on
+the calling thread.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+
+
+@lru_cache(maxsize=1)
+def hashing_pool() -> ThreadPoolExecutor:
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or min(4, os.cpu_count() or 1)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+
+
+def hash_password(raw: str) -> str:
+    return hashing_pool().submit(make_password, raw).result()
+
+
+def hash_passwords(passwords) -> list:
+    """Hash many passwords in parallel on the pool, preserving order."""
+    return list(hashing_pool().map(make_password, passwords))
+
+
+def verify_password(user, raw: str) -> bool:
+    """``user.check_password`` with the hash on the pool.
+
+    If the stored hash uses an outdated hasher or work factor, it is replaced
+    with one from the preferred hasher.
+    """
+    outdated = []
+    ok = hashing_pool().submit(check_password, raw, user.password, outdated.append).result()
+    if ok and outdated:
+        user.password = hash_password(raw)
+        user.save(update_fields=['password'])
+    return ok
+
+
+class BoundedModelBackend(ModelBackend):
+    """``ModelBackend`` whose password work goes through :func:`hashing_pool`."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            hash_password(password)
+            return None
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,70 @@
+"""Sliding-window rate limits for login and password reset, kept in the Django cache.
+
+Each (scope, identifier) pair has one counter per fixed bucket of ``window``
+seconds. The sliding count weights the previous bucket by how much of it still
+overlaps the window: two cache reads and one ``incr`` per check. There are no
+per-attempt rows to store or prune. Identifiers are hashed so usernames, emails
+and IPs never appear in cache keys. Limits are per process when the cache is
+per process; use the shared cache backend (see the prod profile) to enforce
+them across workers.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _limits() -> dict:
+    return settings.AUTH_RATE_LIMITS
+
+
+def client_ip(request) -> str:
+    """The caller's address; behind ``RATE_LIMIT_PROXY_COUNT`` trusted proxies, taken from X-Forwarded-For."""
+    proxies = settings.RATE_LIMIT_PROXY_COUNT
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _keys(scope: str, identifier: str, window: int, now: float) -> tuple:
+    digest = hashlib.blake2b(identifier.strip().lower().encode(), digest_size=12).hexdigest()
+    bucket = int(now // window)
+    return f'ratelimit:{scope}:{digest}:{bucket}', f'ratelimit:{scope}:{digest}:{bucket - 1}'
+
+
+def attempts(scope: str, identifier: str, now: float = None) -> float:
+    _, window = _limits()[scope]
+    now = time.time() if now is None else now
+    current, previous = _keys(scope, identifier, window, now)
+    counts = cache.get_many([current, previous])
+    overlap = 1 - (now % window) / window
+    return counts.get(current, 0) + counts.get(previous, 0) * overlap
+
+
+def hit(scope: str, identifier: str) -> None:
+    if not identifier:
+        return
+    _, window = _limits()[scope]
+    current, _ = _keys(scope, identifier, window, time.time())
+    # The bucket is read as "previous" for one more window, so keep it for two
+    cache.add(current, 0, window * 2)
+    try:
+        cache.incr(current)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(current, 1, window * 2)
+
+
+def retry_after(checks: dict) -> int:
+    """Seconds to wait if any ``{scope: identifier}`` is over its limit, else 0."""
+    now = time.time()
+    wait = 0
+    for scope, identifier in checks.items():
+        if not identifier:
+            continue
+        limit, window = _limits()[scope]
+        if attempts(scope, identifier, now) >= limit:
+            wait = max(wait, int(window - now % window) + 1)
+    return wait
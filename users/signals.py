@@ -3,6 +3,7 @@ from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import UserProfile
 from bank.models import Account
+from bankx import sharding
 import random
 
 
@@ -16,13 +17,14 @@ def create_profile_and_account(sender, instance: User, created: bool, **kwargs):
         UserProfile.objects.get_or_create(user=instance)
         from bank.models import Account
         account_number = generate_account_number()
-        # Ensure unique account number
-        while Account.objects.filter(account_number=account_number).exists():
+        # Ensure unique account number, across every shard
+        while sharding.account_number_taken(account_number):
             account_number = generate_account_number()
-        Account.objects.create(
-            user=instance,
-            account_number=account_number,
-            account_type=Account.TYPE_SAVINGS,
-            interest_rate=2.5,
-        )
+        with sharding.for_user(instance.pk):
+            Account.objects.create(
+                user=instance,
+                account_number=account_number,
+                account_type=Account.TYPE_SAVINGS,
+                interest_rate=2.5,
+            )
 
@@ -7,12 +7,13 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
+    path('profile/<int:user_id>/<str:variant>/<str:version>.jpg', views.profile_image_view, name='profile_image'),
     path('admin/create-user/', views.admin_create_user_view, name='admin_create_user'),
 
     # Password reset
     path(
         'password-reset/',
-        auth_views.PasswordResetView.as_view(
+        views.PasswordResetView.as_view(
             template_name='users/password_reset.html',
             email_template_name='email/password_reset_email.html',
             subject_template_name='email/password_reset_subject.txt',
@@ -1,19 +1,25 @@
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib.auth.models import User
-from django.shortcuts import render, redirect
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django import forms
 
+from . import metrics, ratelimit
+from .images import VARIANTS, clear_variants, validate_picture_size
 from .models import UserProfile
+from .passwords import hash_password
 
 
 class RegistrationForm(UserCreationForm):
     email = forms.EmailField(required=True)
     phone_number = forms.CharField(required=False)
-    profile_picture = forms.ImageField(required=False)
+    profile_picture = forms.ImageField(required=False, validators=[validate_picture_size])
 
     class Meta:
         model = User
@@ -26,6 +32,12 @@ class RegistrationForm(UserCreationForm):
             'password2',
         ]
 
+    def set_password_and_save(self, user, password_field_name='password1', commit=True):
+        user.password = hash_password(self.cleaned_data[password_field_name])
+        if commit:
+            user.save()
+        return user
+
 
 def register_view(request):
     if request.method == 'POST':
@@ -52,17 +64,45 @@ def login_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
     if request.method == 'POST':
-        form = AuthenticationForm(request, data=request.POST)
-        if form.is_valid():
-            user = form.get_user()
-            login(request, user)
-            return redirect('dashboard')
+        ip, username = ratelimit.client_ip(request), request.POST.get('username', '')
+        with metrics.timed('login') as result:
+            # Throttled attempts are rejected before any password hashing
+            wait = ratelimit.retry_after({'login:ip': ip, 'login:user': username})
+            if wait:
+                result['outcome'] = 'throttled'
+                messages.error(request, f'Too many login attempts. Try again in {wait} seconds.')
+                response = render(request, 'users/login.html', {'form': AuthenticationForm()}, status=429)
+                response['Retry-After'] = str(wait)
+                return response
+            ratelimit.hit('login:ip', ip)
+            form = AuthenticationForm(request, data=request.POST)
+            if form.is_valid():
+                result['outcome'] = 'success'
+                login(request, form.get_user())
+                return redirect('dashboard')
+            ratelimit.hit('login:user', username)
         messages.error(request, 'Invalid credentials')
     else:
         form = AuthenticationForm()
     return render(request, 'users/login.html', {'form': form})
 
 
+class PasswordResetView(auth_views.PasswordResetView):
+    """Password reset that silently stops sending mail once an IP or address is over its limit."""
+
+    def form_valid(self, form):
+        ip, email = ratelimit.client_ip(self.request), form.cleaned_data['email']
+        with metrics.timed('password_reset') as result:
+            if ratelimit.retry_after({'reset:ip': ip, 'reset:email': email}):
+                # Same response as a successful request so the limit reveals nothing
+                result['outcome'] = 'throttled'
+                return redirect(self.get_success_url())
+            ratelimit.hit('reset:ip', ip)
+            ratelimit.hit('reset:email', email)
+            result['outcome'] = 'success'
+            return super().form_valid(form)
+
+
 def logout_view(request):
     logout(request)
     messages.info(request, 'You have been logged out.')
@@ -87,6 +127,8 @@ def profile_view(request):
 
         form = ProfileForm(request.POST, request.FILES, instance=profile)
         if form.is_valid():
+            if 'profile_picture' in form.changed_data:
+                clear_variants(profile)
             form.save()
             messages.success(request, 'Profile updated.')
             return redirect('profile')
@@ -96,6 +138,27 @@ def profile_view(request):
     return render(request, 'users/profile.html', {'form': form})
 
 
+@login_required
+def profile_image_view(request, user_id: int, variant: str, version: str):
+    if variant not in VARIANTS:
+        raise Http404
+    if user_id != request.user.pk and not (request.user.is_staff or _is_bank_admin(request.user)):
+        raise Http404
+    profile = get_object_or_404(UserProfile, user_id=user_id)
+    if not profile.picture_version:
+        raise Http404
+    if version != profile.picture_version:
+        return redirect('profile_image', user_id=user_id, variant=variant, version=profile.picture_version)
+    etag = f'"{version}-{variant}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(getattr(profile, VARIANTS[variant][0]).open('rb'), content_type='image/jpeg')
+        response['ETag'] = etag
+    # The URL changes whenever the picture does
+    patch_cache_control(response, private=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    return response
+
+
 def _is_bank_admin(user) -> bool:
     try:
         if not user.is_authenticated:
@@ -116,7 +179,7 @@ class AdminCreateUserForm(forms.Form):
     role = forms.ChoiceField(choices=UserProfile.ROLE_CHOICES, initial=UserProfile.ROLE_CUSTOMER)
     password = forms.CharField(widget=forms.PasswordInput)
     confirm_password = forms.CharField(widget=forms.PasswordInput)
-    profile_picture = forms.ImageField(required=False)
+    profile_picture = forms.ImageField(required=False, validators=[validate_picture_size])
     initial_deposit = forms.DecimalField(max_digits=12, decimal_places=2, required=False, initial=0)
 
     def clean(self):
@@ -142,9 +205,8 @@ def admin_create_user_view(request):
                     email=form.cleaned_data['email'],
                     first_name=form.cleaned_data.get('first_name', ''),
                     last_name=form.cleaned_data.get('last_name', ''),
+                    password=hash_password(form.cleaned_data['password']),
                 )
-                user.set_password(form.cleaned_data['password'])
-                user.save()
                 # Ensure profile exists and update
                 profile, _ = UserProfile.objects.get_or_create(user=user)
                 profile.phone_number = form.cleaned_data.get('phone_number', '')
@@ -157,33 +219,20 @@ def admin_create_user_view(request):
                 # Initial deposit to first account (create if missing)
                 from decimal import Decimal
                 from bank.models import Account
-                from transactions.models import Transaction
-                from transactions.utils import generate_transaction_receipt_pdf
-                import uuid
+                from transactions import services
                 initial = Decimal(str(form.cleaned_data.get('initial_deposit') or 0))
                 if initial > 0:
-                    account = Account.objects.filter(user=user).order_by('created_at').first()
-                    if account is None:
-                        # Fallback: create a default savings
-                        from users.signals import generate_account_number
-                        number = generate_account_number()
-                        while Account.objects.filter(account_number=number).exists():
+                    from bankx import sharding
+                    with sharding.for_user(user.pk):
+                        account = Account.objects.filter(user=user).order_by('created_at').first()
+                        if account is None:
+                            # Fallback: create a default savings
+                            from users.signals import generate_account_number
                             number = generate_account_number()
-                        account = Account.objects.create(user=user, account_number=number, account_type=Account.TYPE_SAVINGS, interest_rate=2.5)
-                    from django.db import transaction as dbtx
-                    with dbtx.atomic():
-                        account.balance += initial
-                        account.save(update_fields=['balance'])
-                        t = Transaction.objects.create(
-                            user=user,
-                            account=account,
-                            transaction_type=Transaction.TYPE_DEPOSIT,
-                            category=Transaction.CATEGORY_OTHER,
-                            amount=initial,
-                            description='Initial deposit (user creation)',
-                            nonce=str(uuid.uuid4()),
-                        )
-                        t.receipt_pdf.save(f'receipt_{t.id}.pdf', generate_transaction_receipt_pdf(t))
+                            while sharding.account_number_taken(number):
+                                number = generate_account_number()
+                            account = Account.objects.create(user=user, account_number=number, account_type=Account.TYPE_SAVINGS, interest_rate=2.5)
+                        services.deposit(user, account, initial, description='Initial deposit (user creation)')
 
                 messages.success(request, f"User '{user.username}' created successfully")
                 return redirect('admin_create_user')